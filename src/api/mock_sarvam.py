@@ -0,0 +1,123 @@
+"""Local stand-in for the Sarvam translate endpoint, plus a latency report against it.
+
+``MockSarvamServer`` answers ``POST /translate`` with a deterministic fake
+translation after a configurable delay, failing a share of requests with 503
+so the client's retries are exercised. Run from ``src`` with
+``python -m api.mock_sarvam`` to replay a call's worth of utterances through
+the sync and async clients and print p50/p99 latency.
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from api.sarvam import SarvamClient, AsyncSarvamClient
+
+SCRIPTED = [
+    "Thank you for calling, how can I help you today?",
+    "Could you please confirm your account number?",
+    "Please hold while I check that for you.",
+]
+
+
+def fake_translate(text, target_language):
+    return "\n".join(f"[{target_language}] {line}" for line in text.split("\n"))
+
+
+class MockSarvamServer:
+    def __init__(self, latency=0.05, jitter=0.02, failure_rate=0.0, host="127.0.0.1", port=0):
+        """Serve fake translations on a background thread; ``port`` 0 picks a free one."""
+        self.latency = latency
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        self.requests = 0
+        self.failures = 0
+        mock = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # keep-alive, so the client pool is actually reused
+            disable_nagle_algorithm = True  # headers and body go out as separate writes
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                mock.requests += 1
+                time.sleep(max(0.0, random.gauss(mock.latency, mock.jitter)))
+                if random.random() < mock.failure_rate:
+                    mock.failures += 1
+                    self._reply(503, {"error": "overloaded"})
+                    return
+                self._reply(200, {"translated_text": fake_translate(body["text"], body["target_language"])})
+
+            def _reply(self, status, payload):
+                data = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        self.url = f"http://{host}:{self.server.server_address[1]}/translate"
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def utterances(count, scripted_share, seed=0):
+    rng = random.Random(seed)
+    return [
+        rng.choice(SCRIPTED) if rng.random() < scripted_share else f"customer utterance {i} about order {rng.randint(1, 10**6)}"
+        for i in range(count)
+    ]
+
+
+def report(label, client, wall, count, server):
+    stats = client.latency.percentiles()
+    print(f"{label:<28} {count / wall:>8.0f} utt/s  requests={server.requests:<5} "
+          f"p50={stats.get('p50_ms', 0):.1f} ms  p99={stats.get('p99_ms', 0):.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--utterances", type=int, default=300)
+    parser.add_argument("--latency", type=float, default=0.05, help="mock server response time in seconds")
+    parser.add_argument("--failure-rate", type=float, default=0.05)
+    parser.add_argument("--scripted-share", type=float, default=0.3)
+    parser.add_argument("--concurrency", type=int, default=8)
+    args = parser.parse_args()
+
+    texts = utterances(args.utterances, args.scripted_share)
+
+    server = MockSarvamServer(args.latency, failure_rate=args.failure_rate).start()
+    client = SarvamClient("test-key", server.url, backoff=0.01)
+    start = time.perf_counter()
+    for text in texts:
+        client.translate(text)
+    report("sync, cached, one by one", client, time.perf_counter() - start, len(texts), server)
+    server.stop()
+
+    server = MockSarvamServer(args.latency, failure_rate=args.failure_rate).start()
+    client = SarvamClient("test-key", server.url, backoff=0.01, pool_size=args.concurrency)
+    async_client = AsyncSarvamClient(client, max_concurrency=args.concurrency)
+    start = time.perf_counter()
+    asyncio.run(async_client.translate_many(texts))
+    report("async, coalesced + cached", client, time.perf_counter() - start, len(texts), server)
+    print(f"(mock server failed {server.failures} requests with 503; retried by the client)")
+    server.stop()
+
+
+if __name__ == "__main__":
+    main()
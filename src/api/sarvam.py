@@ -1,26 +1,280 @@
-def get_translation(text, api_key):
-    import requests
-
-    url = "https://api.sarvam.com/translate"  # Replace with the actual Sarvam API endpoint
-    headers = {
-        "Authorization": f"Bearer {api_key}",
-        "Content-Type": "application/json"
-    }
-    payload = {
-        "text": text,
-        "target_language": "en"  # Specify the target language as needed
-    }
-
-    response = requests.post(url, headers=headers, json=payload)
-
-    if response.status_code == 200:
-        return response.json()  # Return the JSON response from the API
-    else:
-        raise Exception(f"Error: {response.status_code} - {response.text}")
+import asyncio
+import random
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict, deque
+
+DEFAULT_URL = "https://api.sarvam.com/translate"  # Replace with the actual Sarvam API endpoint
+
+# Status codes worth another attempt; anything else is the caller's problem
+_RETRY_STATUSES = {429, 500, 502, 503, 504}
+# Numbers each coalesced utterance on its own line; the markers must come back intact and in order
+_BATCH_MARKER = "<<{}>>"
+_BATCH_MARKER_RE = re.compile(r"<<(\d+)>>")
+
+
+class SarvamError(Exception):
+    pass
+
+
+class TranslationCache:
+    def __init__(self, max_items=2048, path=None):
+        """In-memory LRU of translations, backed by an optional SQLite file.
+
+        Scripted agent phrases come back on every call; with ``path`` set they
+        also survive restarts.
+        """
+        self.max_items = max_items
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        if path:
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS translations "
+                "(text TEXT, target TEXT, translated TEXT, PRIMARY KEY (text, target))"
+            )
+            self._db.commit()
+
+    def get(self, text, target_language):
+        key = (text, target_language)
+        with self._lock:
+            if key in self._items:
+                self._items.move_to_end(key)
+                return self._items[key]
+            if self._db is None:
+                return None
+            row = self._db.execute(
+                "SELECT translated FROM translations WHERE text = ? AND target = ?", key
+            ).fetchone()
+            if row is not None:
+                self._remember(key, row[0])
+            return row[0] if row else None
+
+    def put(self, text, target_language, translated):
+        key = (text, target_language)
+        with self._lock:
+            self._remember(key, translated)
+            if self._db is not None:
+                self._db.execute("INSERT OR REPLACE INTO translations VALUES (?, ?, ?)", (*key, translated))
+                self._db.commit()
+
+    def _remember(self, key, translated):
+        self._items[key] = translated
+        self._items.move_to_end(key)
+        if len(self._items) > self.max_items:
+            self._items.popitem(last=False)
+
+
+class LatencyTracker:
+    def __init__(self, window=5000):
+        self._samples = deque(maxlen=window)
+
+    def record(self, seconds):
+        self._samples.append(seconds)
+
+    def percentiles(self):
+        """Return p50/p99 request latency in milliseconds over the recent window."""
+        if not self._samples:
+            return {}
+        ordered = sorted(self._samples)
+        pick = lambda q: ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000
+        return {"p50_ms": pick(0.50), "p99_ms": pick(0.99), "count": len(ordered)}
+
+
+class SarvamClient:
+    def __init__(self, api_key, url=DEFAULT_URL, target_language="en", timeout=(3.05, 10), retries=3,
+                 backoff=0.25, pool_size=10, cache=None, max_batch_chars=1000):
+        """Translation client with a keep-alive connection pool, retries and caching.
+
+        Args:
+            api_key: Sarvam API key
+            url: Translation endpoint
+            target_language: Default target language
+            timeout: (connect, read) timeout in seconds per attempt
+            retries: Extra attempts after a timeout, connection error, 429 or 5xx
+            backoff: Base delay; attempt n waits a random time up to backoff * 2**n
+            pool_size: Connections kept alive to the API host
+            cache: TranslationCache to use, or None for a private in-memory one
+            max_batch_chars: Longest combined text sent when coalescing utterances
+        """
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        self.url = url
+        self.target_language = target_language
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.max_batch_chars = max_batch_chars
+        self.cache = cache if cache is not None else TranslationCache()
+        self.latency = LatencyTracker()
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers.update({
+            "Authorization": f"Bearer {api_key}",
+            "Content-Type": "application/json",
+        })
+        self._requests = requests
+
+    def request(self, text, target_language=None):
+        """POST one translation request, retrying transient failures; returns the JSON body."""
+        payload = {"text": text, "target_language": target_language or self.target_language}
+        for attempt in range(self.retries + 1):
+            start = time.perf_counter()
+            retry_after = None
+            try:
+                response = self.session.post(self.url, json=payload, timeout=self.timeout)
+            except (self._requests.ConnectionError, self._requests.Timeout) as e:
+                error = SarvamError(f"Error: {e}")
+            else:
+                self.latency.record(time.perf_counter() - start)
+                if response.status_code == 200:
+                    return response.json()
+                error = SarvamError(f"Error: {response.status_code} - {response.text}")
+                if response.status_code not in _RETRY_STATUSES:
+                    raise error
+                retry_after = response.headers.get("Retry-After")
+            if attempt == self.retries:
+                raise error
+            time.sleep(self._delay(attempt, retry_after))
+
+    def _delay(self, attempt, retry_after=None):
+        # Full jitter keeps many clients that failed together from retrying together
+        delay = random.uniform(0, self.backoff * 2 ** attempt)
+        if retry_after and retry_after.isdigit():
+            delay = max(delay, min(float(retry_after), 30.0))
+        return delay
+
+    def translate(self, text, target_language=None):
+        return self.translate_many([text], target_language)[0]
+
+    def translate_many(self, texts, target_language=None):
+        """Translate a list of utterances, answering repeats from the cache.
+
+        The rest are coalesced into as few requests as ``max_batch_chars``
+        allows. Each utterance is flattened to one line behind a numbered
+        marker; a batch whose answer doesn't carry the same markers back in
+        order is retried one utterance at a time.
+        """
+        target = target_language or self.target_language
+        results = [self.cache.get(text, target) for text in texts]
+        missing = [i for i, result in enumerate(results) if result is None]
+        fetched = {}
+        for batch in self._batches([texts[i] for i in missing]):
+            for text, result in zip(batch, self._translate_batch(batch, target)):
+                fetched[text] = result
+                self.cache.put(text, target, result)
+        for i in missing:
+            results[i] = fetched[texts[i]]
+        return results
+
+    def _batches(self, texts):
+        batch, size = [], 0
+        for text in dict.fromkeys(texts):
+            alone = _BATCH_MARKER_RE.search(text) is not None
+            if batch and (size + len(text) > self.max_batch_chars or alone):
+                yield batch
+                batch, size = [], 0
+            batch.append(text)
+            size += len(text) + 8
+            if alone:
+                # Looks like a marker itself, so it couldn't be split back out of a joined answer
+                yield batch
+                batch, size = [], 0
+        if batch:
+            yield batch
+
+    def _translate_batch(self, batch, target):
+        if len(batch) == 1:
+            return [manage_response(self.request(batch[0], target))]
+        joined = "\n".join(f"{_BATCH_MARKER.format(i)} {' '.join(text.split())}" for i, text in enumerate(batch))
+        parts = _BATCH_MARKER_RE.split(manage_response(self.request(joined, target)))
+        # [text before the first marker, "0", translation 0, "1", translation 1, ...]
+        if not parts[0].strip() and parts[1::2] == [str(i) for i in range(len(batch))]:
+            return [part.strip() for part in parts[2::2]]
+        return [manage_response(self.request(text, target)) for text in batch]
+
+    def close(self):
+        self.session.close()
+
+
+class AsyncSarvamClient:
+    def __init__(self, client, max_concurrency=8, coalesce_window=0.02, max_batch_items=16):
+        """Asyncio front end for a SarvamClient.
+
+        Calls to ``translate`` made within ``coalesce_window`` seconds of each
+        other are sent as one request, and at most ``max_concurrency`` requests
+        are in flight at once. Requests run on worker threads over the
+        client's pooled session, so size its ``pool_size`` to match.
+        """
+        self.client = client
+        self.coalesce_window = coalesce_window
+        self.max_batch_items = max_batch_items
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._pending = {}
+        # The loop only keeps weak references to tasks; hold sends here until they finish
+        self._sending = set()
+
+    async def translate(self, text, target_language=None):
+        target = target_language or self.client.target_language
+        cached = self.client.cache.get(text, target)
+        if cached is not None:
+            return cached
+        batch = self._pending.get(target)
+        if batch is None:
+            batch = self._pending[target] = []
+            asyncio.get_running_loop().call_later(self.coalesce_window, self._flush, target, batch)
+        future = asyncio.get_running_loop().create_future()
+        batch.append((text, future))
+        if len(batch) >= self.max_batch_items:
+            self._flush(target, batch)
+        return await future
+
+    async def translate_many(self, texts, target_language=None):
+        return await asyncio.gather(*(self.translate(text, target_language) for text in texts))
+
+    def _flush(self, target, batch):
+        if self._pending.get(target) is not batch:
+            return  # already sent when it filled up
+        del self._pending[target]
+        task = asyncio.ensure_future(self._send(target, batch))
+        self._sending.add(task)
+        task.add_done_callback(self._sending.discard)
+
+    async def _send(self, target, batch):
+        async with self._semaphore:
+            try:
+                results = await asyncio.to_thread(self.client.translate_many, [t for t, _ in batch], target)
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                return
+        for (_, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+
+
+_default_clients = {}
+_default_clients_lock = threading.Lock()
+
+
+def get_translation(text, api_key, target_language="en", url=DEFAULT_URL):
+    # One pooled client per key and endpoint, so repeated calls reuse connections and its cache
+    with _default_clients_lock:
+        client = _default_clients.get((api_key, url))
+        if client is None:
+            client = _default_clients[(api_key, url)] = SarvamClient(api_key, url)
+    return {"translated_text": client.translate(text, target_language)}
 
 def manage_response(api_response):
     # Process the API response and return structured data
     if 'translated_text' in api_response:
         return api_response['translated_text']
     else:
-        raise ValueError("Invalid response format from Sarvam API")
\ No newline at end of file
+        raise ValueError("Invalid response format from Sarvam API")
@@ -4,12 +4,24 @@ load_dotenv()
 SARVAM_API_KEY = os.getenv("SARVAM_API_KEY")
 SARVAM_API_URL = os.getenv("SARVAM_API_URL")
 
+import statistics
 import streamlit as st
 from components.sidebar import sidebar
-from components.assistant import render_assistant
-from services.realtime import start_realtime_processing
+from components.assistant import render_assistant, initialize_assistant
+from services.realtime import start_realtime_processing, drain_transcript
 from components.transcript import TranscriptDisplay
 
+@st.fragment(run_every=0.1)
+def live_transcript():
+    # Polled ten times a second; only this fragment reruns, and new lines are appended to the page
+    new_items = drain_transcript()
+    if new_items:
+        delays = [delay for _, delay in new_items]
+        st.session_state.transcript_delays = (st.session_state.get("transcript_delays", []) + delays)[-500:]
+    st.session_state.transcript_display.display_transcript()
+    if st.session_state.get("transcript_delays"):
+        st.caption(f"Text to screen p50: {1000 * statistics.median(st.session_state.transcript_delays):.0f} ms")
+
 def main():
     st.title("Real-Time Call Centre Assistant")
     
@@ -17,6 +29,7 @@ def main():
     
     if "transcript_display" not in st.session_state:
         st.session_state.transcript_display = TranscriptDisplay()
+    initialize_assistant()
     
     st.subheader("Call Audio")
     audio_value = st.audio_input("Record a voice message", key="audio_recorder")
@@ -28,9 +41,9 @@ def main():
     
     if st.button("Start Call", key="start_call_button"):
         st.session_state.transcript_display.clear_transcript()
-        start_realtime_processing()
+        start_realtime_processing(SARVAM_API_KEY, SARVAM_API_URL)
     
-    st.session_state.transcript_display.display_transcript()
+    live_transcript()
     
     render_assistant()
     
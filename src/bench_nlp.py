@@ -0,0 +1,81 @@
+"""Throughput benchmark for NLPProcessor: utterances/sec per pipeline configuration.
+
+Run from ``src``: ``python bench_nlp.py --utterances 5000``. The stream mixes
+unique customer utterances with a share of repeated agent phrases, so the
+cached runs show what the LRU cache saves on a realistic call.
+"""
+
+import argparse
+import random
+import time
+from services.nlp import NLPProcessor, ANALYSIS_FIELDS
+
+AGENT_PHRASES = [
+    "Thank you for calling, how can I help you today?",
+    "Could you please confirm your account number?",
+    "Let me check that for you right away.",
+    "Is there anything else I can help you with?",
+    "Please hold while I transfer you to the billing team.",
+]
+CUSTOMER_TEMPLATES = [
+    "I was charged {amount} dollars on {day} for an order I never placed.",
+    "My name is {name} and I am calling from {city} about my internet connection.",
+    "Can you send the replacement to {city} before {day}?",
+    "{name} told me the refund of {amount} dollars would arrive by {day}.",
+]
+NAMES = ["Priya Sharma", "John Miller", "Ana Garcia", "Wei Chen", "Fatima Khan"]
+CITIES = ["Mumbai", "Chicago", "Madrid", "Toronto", "Sydney"]
+DAYS = ["Monday", "March 3rd", "last Friday", "the 15th", "yesterday"]
+
+
+def utterance_stream(count, repeat_share, seed=0):
+    rng = random.Random(seed)
+    for _ in range(count):
+        if rng.random() < repeat_share:
+            yield rng.choice(AGENT_PHRASES)
+        else:
+            yield rng.choice(CUSTOMER_TEMPLATES).format(
+                amount=rng.randint(5, 500), day=rng.choice(DAYS), name=rng.choice(NAMES), city=rng.choice(CITIES)
+            )
+
+
+def measure(run, texts):
+    start = time.perf_counter()
+    count = sum(1 for _ in run(texts))
+    return count / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--utterances", type=int, default=2000)
+    parser.add_argument("--repeat-share", type=float, default=0.3, help="fraction of repeated agent phrases")
+    parser.add_argument("--batch-sizes", default="16,64,256")
+    parser.add_argument("--n-process", type=int, default=1)
+    args = parser.parse_args()
+
+    texts = list(utterance_stream(args.utterances, args.repeat_share))
+    uncached = NLPProcessor(cache_size=0)
+
+    def one_at_a_time(batch):
+        # What analyze_text did before: the full pipeline, one call per utterance
+        for text in batch:
+            doc = uncached.nlp(text)
+            yield [(ent.text, ent.label_) for ent in doc.ents], [t.text for t in doc], [s.text for s in doc.sents]
+
+    print(f"{'configuration':<48}{'utt/s':>10}")
+    print(f"{'one at a time, full pipeline':<48}{measure(one_at_a_time, texts):>10.0f}")
+    for batch_size in (int(b) for b in args.batch_sizes.split(",")):
+        for fields in (ANALYSIS_FIELDS, ("entities",)):
+            run = lambda batch: uncached.analyze_many(batch, fields, batch_size, args.n_process)
+            label = f"pipe batch={batch_size} fields={'+'.join(fields)}"
+            print(f"{label:<48}{measure(run, texts):>10.0f}")
+
+    cached = NLPProcessor()
+    run = lambda batch: cached.analyze_many(batch, ("entities",), 64, args.n_process)
+    rate = measure(run, texts)
+    hit_rate = cached.cache_hits / max(1, cached.cache_hits + cached.cache_misses)
+    print(f"{'pipe batch=64 entities, LRU cache':<48}{rate:>10.0f}  ({hit_rate:.0%} hits)")
+
+
+if __name__ == "__main__":
+    main()
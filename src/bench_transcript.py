@@ -0,0 +1,57 @@
+"""Rerun-time benchmark for TranscriptDisplay: full redraw against incremental rendering.
+
+Run from ``src``: ``python bench_transcript.py --segments 10000``. Each mode
+gets a call of ``--segments`` finalized segments, then the script is rerun
+through Streamlit's app test harness with a few new segments arriving before
+each rerun, as the live fragment sees them.
+"""
+
+import argparse
+import statistics
+import time
+from streamlit.testing.v1 import AppTest
+
+
+def transcript_app(mode, segments, per_rerun):
+    import streamlit as st
+    from components.transcript import TranscriptDisplay
+
+    if "transcript_display" not in st.session_state:
+        display = TranscriptDisplay(spill=False, render_mode=mode)
+        for i in range(segments):
+            display.add_to_transcript(f"Segment {i}: the customer asked about the refund for order {i * 7919 % 100000}.")
+        st.session_state.transcript_display = display
+    display = st.session_state.transcript_display
+    for _ in range(per_rerun):
+        display.add_to_transcript(f"Segment {len(display.transcript)}: a new line arrived.")
+    display.display_transcript()
+
+
+def measure(mode, segments, reruns, per_rerun):
+    app = AppTest.from_function(transcript_app, args=(mode, segments, per_rerun), default_timeout=600)
+    app.run()  # builds the call
+    timings = []
+    for _ in range(reruns):
+        start = time.perf_counter()
+        app.run()
+        timings.append(time.perf_counter() - start)
+    if app.exception:
+        raise RuntimeError(app.exception[0].message)
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--segments", type=int, default=10000)
+    parser.add_argument("--reruns", type=int, default=20)
+    parser.add_argument("--per-rerun", type=int, default=2, help="segments arriving between reruns")
+    args = parser.parse_args()
+
+    print(f"{'mode':<14}{'p50 ms':>10}{'max ms':>10}   after {args.segments} segments")
+    for mode in ("full", "incremental"):
+        timings = measure(mode, args.segments, args.reruns, args.per_rerun)
+        print(f"{mode:<14}{1000 * statistics.median(timings):>10.1f}{1000 * max(timings):>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
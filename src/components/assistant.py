@@ -5,30 +5,68 @@ class Assistant:
     def __init__(self):
         self.suggestions = []
         self.relevant_info = ""
+        self.keywords = []
+        self.stage_stats = {}
 
     def update_suggestions(self, new_suggestions):
         self.suggestions = new_suggestions
 
     def display_suggestions(self):
         if self.suggestions:
-            st.sidebar.header("Suggestions")
+            st.header("Suggestions")
             for suggestion in self.suggestions:
-                st.sidebar.write(f"- {suggestion}")
+                st.write(f"- {suggestion}")
+
+    def update_keywords(self, keywords):
+        self.keywords = keywords
+
+    def display_keywords(self):
+        if self.keywords:
+            st.header("Keywords")
+            st.write(", ".join(self.keywords))
 
     def update_relevant_info(self, info):
         self.relevant_info = info
 
     def display_relevant_info(self):
         if self.relevant_info:
-            st.sidebar.header("Relevant Information")
-            st.sidebar.write(self.relevant_info)
+            st.header("Relevant Information")
+            st.write(self.relevant_info)
+
+    def apply_response(self, response):
+        """Take in an AssistantResponse; stages that missed their deadline leave the previous values."""
+        suggestion = response.suggestion_response
+        if suggestion.suggestions:
+            self.update_suggestions(suggestion.suggestions)
+        if suggestion.keywords:
+            self.update_keywords(suggestion.keywords)
+        if response.translation_response is not None:
+            self.update_relevant_info(f"Translation: {response.translation_response.translated_text}")
+
+    def display_stage_stats(self):
+        if self.stage_stats:
+            st.caption(" · ".join(
+                f"{stage} p50 {stats['p50_ms']:.0f} ms" + (f" ({stats['timeouts']} late)" if stats["timeouts"] else "")
+                + (f" ({stats['skipped']} skipped)" if stats["skipped"] else "")
+                for stage, stats in self.stage_stats.items() if stats["p50_ms"] is not None
+            ))
 
 def initialize_assistant():
     if 'assistant' not in st_session:
         st_session.assistant = Assistant()
 
-def render_assistant():
-    initialize_assistant()
+@st.fragment(run_every=1)
+def assistant_panel():
+    # Reruns on its own so the sidebar follows every utterance without redrawing the page
     assistant = st_session.assistant
+    if "pipeline" in st_session:
+        assistant.stage_stats = st_session.pipeline.stage_stats()
     assistant.display_suggestions()
-    assistant.display_relevant_info()
\ No newline at end of file
+    assistant.display_keywords()
+    assistant.display_relevant_info()
+    assistant.display_stage_stats()
+
+def render_assistant():
+    initialize_assistant()
+    with st.sidebar:
+        assistant_panel()
\ No newline at end of file
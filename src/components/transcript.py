@@ -1,19 +1,90 @@
+from collections import OrderedDict
 import streamlit as st
+from models.segments import SegmentStore
+
+RENDER_MODES = ("incremental", "full")
+
+
+def _line(segment):
+    return f"**{segment.speaker}:** {segment.transcript}" if segment.speaker else segment.transcript
+
 
 class TranscriptDisplay:
-    def __init__(self):
-        self.transcript = []
+    def __init__(self, max_in_memory=2000, spill=True, render_mode="incremental", page_size=50, cached_pages=8):
+        """Live transcript for one call.
+
+        In ``incremental`` mode only the current page of ``page_size``
+        segments is drawn live, as one element whose text is extended as
+        segments arrive; finished pages collapse behind a page picker and are
+        joined once, when first viewed. A rerun therefore costs the same after
+        ten segments as after ten thousand. ``full`` draws every in-memory
+        segment on each rerun, as the display originally did.
+        """
+        if render_mode not in RENDER_MODES:
+            raise ValueError(f"Unknown render mode {render_mode!r}, expected one of {RENDER_MODES}")
+        # Older segments of a long shift go to a temporary file instead of staying in memory
+        self.transcript = SegmentStore(max_in_memory, temporary=spill)
+        self.render_mode = render_mode
+        self.page_size = page_size
+        self.cached_pages = cached_pages
+        self._reset_pages()
 
     def add_to_transcript(self, text):
+        """Append a line of text or a TranscriptResponse."""
         self.transcript.append(text)
+        if len(self.transcript) - self._page_start > self.page_size:
+            # The live page is full: it becomes history and a new one starts with this segment
+            self._page_start += self.page_size
+            self._page_text = ""
+        segment = _line(self.transcript.last())
+        self._page_text = f"{self._page_text} {segment}" if self._page_text else segment
 
     def clear_transcript(self):
-        self.transcript = []
+        self.transcript.clear()
+        self._reset_pages()
+
+    def close(self):
+        """Delete the spill file now rather than when the session is garbage collected."""
+        self.transcript.close()
+        self._reset_pages()
 
     def display_transcript(self):
-        if self.transcript:
+        if len(self.transcript):
             st.subheader("Live Call Transcript")
-            for line in self.transcript:
-                st.write(line)
+            if self.render_mode == "full":
+                self._display_full()
+            else:
+                self._display_incremental()
         else:
-            st.write("No transcript available.")
\ No newline at end of file
+            st.write("No transcript available.")
+
+    def _display_full(self):
+        if self.transcript.spilled:
+            st.caption(f"{self.transcript.spilled} earlier segments stored on disk")
+        for segment in self.transcript.recent():
+            st.write(_line(segment))
+
+    def _display_incremental(self):
+        finished = self._page_start // self.page_size
+        if finished:
+            with st.expander(f"Earlier in this call ({self._page_start} segments)"):
+                page = st.number_input("Page", min_value=1, max_value=finished, value=finished, key="transcript_page")
+                st.markdown(self._page(int(page) - 1))
+        st.markdown(self._page_text)
+
+    def _page(self, index):
+        # Finished pages never change, so each is joined at most once while it stays cached
+        if index in self._pages:
+            self._pages.move_to_end(index)
+            return self._pages[index]
+        start = index * self.page_size
+        text = " ".join(_line(segment) for segment in self.transcript.segments(start, start + self.page_size))
+        self._pages[index] = text
+        if len(self._pages) > self.cached_pages:
+            self._pages.popitem(last=False)
+        return text
+
+    def _reset_pages(self):
+        self._page_start = 0
+        self._page_text = ""
+        self._pages = OrderedDict()
@@ -1,23 +1,41 @@
+from dataclasses import dataclass, field
+from typing import Optional
+
+
+@dataclass(frozen=True, slots=True)
 class TranscriptResponse:
-    def __init__(self, transcript: str, confidence: float):
-        self.transcript = transcript
-        self.confidence = confidence
+    transcript: str
+    # Mean word probability; None when the decode didn't report word probabilities
+    confidence: Optional[float]
+    # Seconds from the start of the call, when known
+    start: Optional[float] = None
+    end: Optional[float] = None
+    # Channel the words came from on a stereo call, e.g. "agent" or "customer"
+    speaker: Optional[str] = None
+
+    @classmethod
+    def from_event(cls, event):
+        """Convert a final voice_transcriber TranscriptEvent, keeping its confidence, timing and channel."""
+        return cls(event.text.strip(), event.confidence, event.start, event.end, event.channel)
 
 
+@dataclass(frozen=True, slots=True)
 class TranslationResponse:
-    def __init__(self, translated_text: str, source_language: str, target_language: str):
-        self.translated_text = translated_text
-        self.source_language = source_language
-        self.target_language = target_language
+    translated_text: str
+    source_language: str
+    target_language: str
 
 
+@dataclass(frozen=True, slots=True)
 class SuggestionResponse:
-    def __init__(self, suggestions: list):
-        self.suggestions = suggestions
+    suggestions: list
+    keywords: list = field(default_factory=list)
+    entities: list = field(default_factory=list)
 
 
+@dataclass(frozen=True, slots=True)
 class AssistantResponse:
-    def __init__(self, transcript_response: TranscriptResponse, translation_response: TranslationResponse, suggestion_response: SuggestionResponse):
-        self.transcript_response = transcript_response
-        self.translation_response = translation_response
-        self.suggestion_response = suggestion_response
\ No newline at end of file
+    transcript_response: TranscriptResponse
+    translation_response: TranslationResponse
+    suggestion_response: SuggestionResponse
+    stage_latencies: dict = field(default_factory=dict)
\ No newline at end of file
@@ -0,0 +1,95 @@
+import json
+import os
+import tempfile
+from collections import deque
+from dataclasses import asdict
+from itertools import islice
+from models.response import TranscriptResponse
+
+
+class SegmentStore:
+    def __init__(self, max_in_memory=2000, spill_path=None, temporary=False):
+        """Append-only store of transcript segments for a whole shift.
+
+        With ``spill_path`` set, once more than ``max_in_memory`` segments are
+        held the older half is appended to that file as JSON lines, so memory
+        stays bounded however long the call runs. Iteration and ``text`` read
+        the spilled segments back in order before the in-memory ones.
+
+        With ``temporary`` instead, the store spills into a temporary
+        directory of its own, deleted by ``close`` or once the store is
+        garbage collected, e.g. when a Streamlit session ends.
+        """
+        self.max_in_memory = max_in_memory
+        self._spill_dir = None
+        if temporary and spill_path is None:
+            self._spill_dir = tempfile.TemporaryDirectory(prefix="transcript-")
+            spill_path = os.path.join(self._spill_dir.name, "segments.jsonl")
+        self.spill_path = spill_path
+        self._recent = deque()
+        self._spilled = 0
+        if spill_path and os.path.exists(spill_path):
+            os.remove(spill_path)
+
+    def append(self, segment):
+        if isinstance(segment, str):
+            segment = TranscriptResponse(segment, confidence=1.0)
+        self._recent.append(segment)
+        if self.spill_path and len(self._recent) > self.max_in_memory:
+            self._spill(len(self._recent) // 2)
+
+    def __len__(self):
+        return self._spilled + len(self._recent)
+
+    def __iter__(self):
+        if self._spilled:
+            with open(self.spill_path, encoding="utf-8") as f:
+                for line in f:
+                    yield TranscriptResponse(**json.loads(line))
+        yield from list(self._recent)
+
+    @property
+    def spilled(self):
+        return self._spilled
+
+    def recent(self, n=None):
+        """Return the newest ``n`` in-memory segments (all of them by default), oldest first."""
+        segments = list(self._recent)
+        return segments if n is None else segments[-n:]
+
+    def last(self):
+        """Return the newest segment without copying the in-memory ones; IndexError when empty."""
+        return self._recent[-1]
+
+    def segments(self, start, stop):
+        """Return segments ``start`` to ``stop`` (by position in the call), reading spilled ones back from disk."""
+        found = []
+        if start < self._spilled:
+            with open(self.spill_path, encoding="utf-8") as f:
+                for line in islice(f, start, min(stop, self._spilled)):
+                    found.append(TranscriptResponse(**json.loads(line)))
+        recent = islice(self._recent, max(0, start - self._spilled), max(0, stop - self._spilled))
+        return found + list(recent)
+
+    def text(self, separator=" "):
+        # One join over a generator: linear in the total text, however many segments there are
+        return separator.join(segment.transcript for segment in self)
+
+    def clear(self):
+        self._recent.clear()
+        self._spilled = 0
+        if self.spill_path and os.path.exists(self.spill_path):
+            os.remove(self.spill_path)
+
+    def close(self):
+        """Drop every segment and delete the temporary spill directory, if the store owns one."""
+        self.clear()
+        if self._spill_dir is not None:
+            self._spill_dir.cleanup()
+            self._spill_dir = None
+            self.spill_path = None
+
+    def _spill(self, count):
+        with open(self.spill_path, "a", encoding="utf-8") as f:
+            f.writelines(json.dumps(asdict(self._recent.popleft())) + "\n" for _ in range(count))
+        self._spilled += count
@@ -0,0 +1,112 @@
+# Incremental keyword extraction over a running call transcript
+import argparse
+import heapq
+from collections import Counter
+import numpy as np
+
+N_FEATURES = 2 ** 20
+
+
+def _hashing_vectorizer(n_features):
+    from sklearn.feature_extraction.text import HashingVectorizer
+    return HashingVectorizer(n_features=n_features, stop_words="english", alternate_sign=False, norm=None)
+
+
+def build_idf_table(documents, n_features=N_FEATURES):
+    """Smoothed IDF per hash bucket from a corpus, as sklearn's TfidfTransformer computes it.
+
+    No vocabulary is kept: the table is indexed by the same hash the engine
+    uses, so it can be precomputed once from any corpus and shipped as an array.
+    """
+    counts = _hashing_vectorizer(n_features).transform(documents)
+    df = np.bincount(counts.indices, minlength=n_features)
+    return (np.log((1 + counts.shape[0]) / (1 + df)) + 1).astype(np.float32)
+
+
+def save_idf_table(path, idf):
+    np.save(path, idf)
+
+
+def load_idf_table(path):
+    return np.load(path)
+
+
+class KeywordEngine:
+    def __init__(self, idf=None, n_features=N_FEATURES):
+        """Keep per-call term counts up to date as finalized segments arrive.
+
+        Terms are hashed into ``n_features`` buckets, so nothing is refit as
+        the call grows; each segment costs time proportional to its own
+        length. Scores are count x IDF (just the count without an IDF table).
+        Since a term's score only ever grows, candidates sit in a max-heap and
+        outdated entries are skipped lazily, making ``top_k`` O(k log n).
+        """
+        if idf is not None and len(idf) != n_features:
+            raise ValueError(f"IDF table has {len(idf)} buckets, expected {n_features}")
+        from sklearn.feature_extraction import FeatureHasher
+        self.n_features = n_features
+        self.idf = idf
+        self._analyze = _hashing_vectorizer(n_features).build_analyzer()
+        # Same hashing as HashingVectorizer, applied to one term per row to learn each term's bucket
+        self._hasher = FeatureHasher(n_features=n_features, input_type="string", alternate_sign=False)
+        self.reset()
+
+    def reset(self):
+        """Forget the current call."""
+        self.counts = {}
+        self.terms = {}
+        self.total = 0
+        self._heap = []
+
+    def add_segment(self, text):
+        tokens = Counter(self._analyze(text))
+        if not tokens:
+            return
+        terms = list(tokens)
+        buckets = self._hasher.transform([[term] for term in terms]).tocsr().indices
+        for term, bucket in zip(terms, buckets):
+            bucket = int(bucket)
+            count = self.counts.get(bucket, 0) + tokens[term]
+            self.counts[bucket] = count
+            # Colliding terms share a bucket; the first one seen names it
+            self.terms.setdefault(bucket, term)
+            heapq.heappush(self._heap, (-self._score(bucket, count), bucket))
+        self.total += sum(tokens.values())
+        if len(self._heap) > 4 * len(self.counts) + 64:
+            self._compact()
+
+    def top_k(self, k=10):
+        """Return up to ``k`` ``(term, score)`` pairs, highest first; scores are normalized by call length."""
+        found = []
+        seen = set()
+        while self._heap and len(found) < k:
+            neg_score, bucket = heapq.heappop(self._heap)
+            if bucket in seen or -neg_score != self._score(bucket, self.counts[bucket]):
+                continue  # an older score for a term that has since grown
+            seen.add(bucket)
+            found.append((neg_score, bucket))
+        for entry in found:
+            heapq.heappush(self._heap, entry)
+        return [(self.terms[bucket], -neg_score / self.total) for neg_score, bucket in found]
+
+    def _score(self, bucket, count):
+        return count * float(self.idf[bucket]) if self.idf is not None else float(count)
+
+    def _compact(self):
+        self._heap = [(-self._score(b, c), b) for b, c in self.counts.items()]
+        heapq.heapify(self._heap)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build a hashed IDF table from a corpus, one document per line")
+    parser.add_argument("corpus")
+    parser.add_argument("output", help="destination .npy file")
+    args = parser.parse_args()
+    with open(args.corpus, encoding="utf-8") as f:
+        idf = build_idf_table(line for line in f if line.strip())
+    save_idf_table(args.output, idf)
+    print(f"Wrote IDF table for {N_FEATURES} buckets to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
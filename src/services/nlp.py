@@ -1,30 +1,305 @@
 # Audio processing service
-import soundfile as sf
+import mmap
+import struct
+from collections import OrderedDict, deque
+from math import gcd
 import numpy as np
 
+# (format tag, bits per sample) -> sample dtype of a PCM/float WAV data chunk
+_WAV_DTYPES = {(1, 8): "u1", (1, 16): "<i2", (1, 32): "<i4", (3, 32): "<f4", (3, 64): "<f8"}
+
+
+def _wav_layout(f):
+    """Return (dtype, channels, sample_rate, data_offset, data_bytes) from a RIFF/WAVE header."""
+    riff, _, wave = struct.unpack("<4sI4s", f.read(12))
+    if riff != b"RIFF" or wave != b"WAVE":
+        raise ValueError("Not a WAV file")
+    fmt = None
+    while True:
+        header = f.read(8)
+        if len(header) < 8:
+            raise ValueError("WAV file has no data chunk")
+        chunk_id, size = struct.unpack("<4sI", header)
+        if chunk_id == b"fmt ":
+            body = f.read(size)
+            tag, channels, rate, _, _, bits = struct.unpack("<HHIIHH", body[:16])
+            if tag == 0xFFFE:
+                # WAVE_FORMAT_EXTENSIBLE keeps the real format tag at the start of the sub-format GUID
+                tag = struct.unpack("<H", body[24:26])[0]
+            fmt = (tag, bits, channels, rate)
+        elif chunk_id == b"data":
+            if fmt is None:
+                raise ValueError("WAV data chunk before fmt chunk")
+            dtype = _WAV_DTYPES.get(fmt[:2])
+            if dtype is None:
+                raise ValueError(f"Unsupported WAV sample format {fmt[:2]}")
+            return np.dtype(dtype), fmt[2], fmt[3], f.tell(), size
+        else:
+            f.seek(size + (size & 1), 1)
+
+
+def _to_float(samples):
+    if samples.dtype.kind == "f":
+        return samples.astype(np.float32, copy=False)
+    if samples.dtype == np.uint8:
+        return (samples.astype(np.float32) - 128) / 128
+    return samples.astype(np.float32) / -np.iinfo(samples.dtype).min
+
+
+def _to_mono_float(frames):
+    """Scale samples to float32 in [-1, 1) and average ``(samples, channels)`` frames down to mono."""
+    samples = _to_float(frames)
+    if samples.ndim == 2:
+        samples = samples[:, 0] if samples.shape[1] == 1 else samples.mean(axis=1, dtype=np.float32)
+    return samples
+
+
+class _BlockResampler:
+    """Resample an indexable signal block by block with scipy's polyphase filter.
+
+    Each block is filtered together with enough neighbouring input that the
+    result matches resampling the whole signal at once, so blocks can be
+    produced lazily and concatenated.
+    """
+
+    def __init__(self, in_rate, out_rate):
+        g = gcd(int(in_rate), int(out_rate))
+        self.up = int(out_rate) // g
+        self.down = int(in_rate) // g
+        # resample_poly's default filter reaches 10 * max(up, down) taps either side at the upsampled rate
+        reach = 10 * max(self.up, self.down) // self.up + 1
+        self.context = -(-reach // self.down) * self.down
+
+    def output_length(self, num_inputs):
+        return -(-num_inputs * self.up // self.down)
+
+    def resample(self, frames, start, stop):
+        """Resample input frames [start, stop), downmixed to mono; ``start`` must be a multiple of ``down``."""
+        from scipy.signal import resample_poly
+        lo = max(0, start - self.context)
+        hi = min(len(frames), stop + self.context)
+        chunk = _to_mono_float(frames[lo:hi])
+        out = resample_poly(chunk, self.up, self.down)
+        first = (start - lo) * self.up // self.down
+        return out[first:first + self.output_length(stop) - self.output_length(start)].astype(np.float32)
+
+
 class AudioProcessor:
     def __init__(self, sample_rate=16000):
         self.sample_rate = sample_rate
 
     def load_audio(self, file_path):
-        data, _ = sf.read(file_path)
-        return data
+        """Read a whole file as float32 mono at ``sample_rate``."""
+        # Imported on first use so importing this module stays cheap
+        import soundfile as sf
+        data, file_rate = sf.read(file_path, dtype="float32")
+        if file_rate != self.sample_rate:
+            resampler = _BlockResampler(file_rate, self.sample_rate)
+            return resampler.resample(data, 0, len(data))
+        return _to_mono_float(data)
+
+    def segment_audio(self, audio_data, segment_duration=5, overlap=0.0):
+        """Lazily yield ``segment_duration``-second views of ``audio_data``, consecutive ones sharing ``overlap`` seconds."""
+        segment_samples = int(segment_duration * self.sample_rate)
+        hop = segment_samples - int(overlap * self.sample_rate)
+        if hop <= 0:
+            raise ValueError("overlap must be shorter than segment_duration")
+        for i in range(0, len(audio_data) - int(overlap * self.sample_rate), hop):
+            yield audio_data[i:i + segment_samples]
+
+    def open_audio(self, file_path, raw_sample_rate=None, raw_dtype="<i2", raw_channels=1):
+        """Memory-map a WAV file, or raw PCM when ``raw_sample_rate`` is given.
+
+        Returns ``(frames, file_rate)`` where ``frames`` is a read-only
+        ``(num_frames, channels)`` array backed directly by the file. The
+        mapping stays open for as long as any view of it is alive.
+        """
+        frames, file_rate, _, _ = self._map_audio(file_path, raw_sample_rate, raw_dtype, raw_channels)
+        return frames, file_rate
+
+    def iter_segments(self, file_path, segment_duration=5, overlap=0.0, raw_sample_rate=None,
+                      raw_dtype="<i2", raw_channels=1):
+        """Lazily yield float32 mono segments of a WAV/raw PCM file without loading it.
+
+        Segments match ``load_audio`` whatever the file's format: samples are
+        scaled to [-1, 1), channels are averaged, and audio at another rate is
+        resampled on the fly. A float32 mono file already at ``sample_rate``
+        is yielded as zero-copy views of the mapping; anything else is
+        converted one segment at a time. Pages behind the current segment are
+        released as the generator advances, so resident memory stays at a few
+        segments however long the file is.
+        """
+        segment_samples = int(segment_duration * self.sample_rate)
+        overlap_samples = int(overlap * self.sample_rate)
+        hop = segment_samples - overlap_samples
+        if hop <= 0:
+            raise ValueError("overlap must be shorter than segment_duration")
+
+        frames, file_rate, mapping, offset = self._map_audio(file_path, raw_sample_rate, raw_dtype, raw_channels)
+        release = _PageReleaser(mapping, offset, frames.strides[0])
+        if file_rate == self.sample_rate:
+            for i in range(0, len(frames) - overlap_samples, hop):
+                release(i)
+                yield _to_mono_float(frames[i:i + segment_samples])
+            return
 
-    def segment_audio(self, audio_data, segment_duration=5):
-        segment_samples = segment_duration * self.sample_rate
-        return [audio_data[i:i + segment_samples] for i in range(0, len(audio_data), segment_samples)]
+        resampler = _BlockResampler(file_rate, self.sample_rate)
+        # Convert about one segment of input per step, in whole filter periods
+        block = max(1, int(segment_samples * file_rate / self.sample_rate) // resampler.down) * resampler.down
+        pending = np.zeros(0, dtype=np.float32)
+        position = 0
+        emitted = False
+        while True:
+            if len(pending) >= segment_samples:
+                yield pending[:segment_samples]
+                emitted = True
+                pending = pending[hop:]
+            elif position < len(frames):
+                stop = min(position + block, len(frames))
+                pending = np.concatenate((pending, resampler.resample(frames, position, stop)))
+                release(position - resampler.context)
+                position = stop
+            else:
+                break
+        # The tail shorter than a segment, unless it is only the overlap of the last one
+        if len(pending) > (overlap_samples if emitted else 0):
+            yield pending
+
+    def _map_audio(self, file_path, raw_sample_rate, raw_dtype, raw_channels):
+        with open(file_path, "rb") as f:
+            if raw_sample_rate is None:
+                dtype, channels, file_rate, offset, size = _wav_layout(f)
+            else:
+                dtype, channels, file_rate, offset, size = np.dtype(raw_dtype), raw_channels, raw_sample_rate, 0, None
+            mapping = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        # Streaming writers leave the data size at 0 or 0xFFFFFFFF; trust the file length instead
+        available = len(mapping) - offset
+        if not size or size > available:
+            size = available
+        frame_bytes = dtype.itemsize * channels
+        frames = np.frombuffer(mapping, dtype=dtype, count=size // frame_bytes * channels, offset=offset)
+        if hasattr(mmap, "MADV_SEQUENTIAL"):
+            mapping.madvise(mmap.MADV_SEQUENTIAL)
+        return frames.reshape(-1, channels), file_rate, mapping, offset
+
+
+class _PageReleaser:
+    """Drop file-backed pages of a read-only mapping once the reader has moved past them.
+
+    Released pages are simply re-read from disk if touched again, so views
+    handed out earlier stay valid.
+    """
+
+    def __init__(self, mapping, offset, frame_bytes):
+        self.mapping = mapping
+        self.offset = offset
+        self.frame_bytes = frame_bytes
+        self.released = 0
+
+    def __call__(self, before_frame):
+        if not hasattr(mmap, "MADV_DONTNEED") or before_frame <= 0:
+            return
+        end = (self.offset + before_frame * self.frame_bytes) // mmap.PAGESIZE * mmap.PAGESIZE
+        if end > self.released:
+            self.mapping.madvise(mmap.MADV_DONTNEED, self.released, end - self.released)
+            self.released = end
 
 # Natural language processing
-import spacy
+ANALYSIS_FIELDS = ("entities", "tokens", "sentences")
+
+# Pipeline components each output field depends on; the rest are disabled for the call
+_FIELD_COMPONENTS = {
+    "entities": ("ner",),
+    "tokens": (),
+    # Whichever of these the pipeline has sets sentence boundaries
+    "sentences": ("parser", "senter", "sentencizer"),
+}
+
+
+def normalize_utterance(text):
+    # Whitespace only: casing and punctuation change what the pipeline finds
+    return " ".join(text.split())
+
 
 class NLPProcessor:
-    def __init__(self):
-        self.nlp = spacy.load("en_core_web_sm")
-
-    def analyze_text(self, text):
-        doc = self.nlp(text)
-        return {
-            "entities": [(ent.text, ent.label_) for ent in doc.ents],
-            "tokens": [token.text for token in doc],
-            "sentences": [sent.text for sent in doc.sents]
-        }
\ No newline at end of file
+    def __init__(self, model="en_core_web_sm", cache_size=4096):
+        """Run spaCy over utterances, only as far as the requested fields need.
+
+        Results are cached per normalized utterance and field set, so repeated
+        phrases (greetings, hold messages) skip the pipeline. Cached results
+        are shared between callers and should be treated as read-only.
+        """
+        import spacy
+        self.nlp = spacy.load(model)
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    def analyze_text(self, text, fields=ANALYSIS_FIELDS):
+        return next(self.analyze_many([text], fields))
+
+    def analyze_many(self, texts, fields=ANALYSIS_FIELDS, batch_size=64, n_process=1):
+        """Lazily yield one analysis per utterance in ``texts``, in order.
+
+        Utterances that miss the cache are streamed through ``nlp.pipe`` in
+        batches of ``batch_size`` across ``n_process`` processes.
+        """
+        fields = tuple(f for f in ANALYSIS_FIELDS if f in fields)
+        disable = self._disabled_components(fields)
+        # Input order: (cache key, cached result or None for utterances sent to the pipeline)
+        pending = deque()
+
+        def misses():
+            for text in texts:
+                key = (normalize_utterance(text), fields)
+                cached = self._cache_get(key)
+                pending.append((key, cached))
+                if cached is None:
+                    yield key[0]
+
+        for doc in self.nlp.pipe(misses(), batch_size=batch_size, n_process=n_process, disable=disable):
+            while pending[0][1] is not None:
+                yield pending.popleft()[1]
+            key, _ = pending.popleft()
+            result = self._extract(doc, fields)
+            self._cache_put(key, result)
+            yield result
+        while pending:
+            yield pending.popleft()[1]
+
+    def _disabled_components(self, fields):
+        needed = {name for f in fields for name in _FIELD_COMPONENTS[f] if name in self.nlp.pipe_names}
+        # Components that listen to a shared tok2vec layer need it to run as well
+        if "tok2vec" in self.nlp.pipe_names:
+            listeners = getattr(self.nlp.get_pipe("tok2vec"), "listening_components", [])
+            if needed & set(listeners):
+                needed.add("tok2vec")
+        return [name for name in self.nlp.pipe_names if name not in needed]
+
+    @staticmethod
+    def _extract(doc, fields):
+        result = {}
+        if "entities" in fields:
+            result["entities"] = [(ent.text, ent.label_) for ent in doc.ents]
+        if "tokens" in fields:
+            result["tokens"] = [token.text for token in doc]
+        if "sentences" in fields:
+            result["sentences"] = [sent.text for sent in doc.sents]
+        return result
+
+    def _cache_get(self, key):
+        result = self._cache.get(key)
+        if result is None:
+            self.cache_misses += 1
+            return None
+        self._cache.move_to_end(key)
+        self.cache_hits += 1
+        return result
+
+    def _cache_put(self, key, result):
+        if self.cache_size <= 0:
+            return
+        self._cache[key] = result
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
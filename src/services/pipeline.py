@@ -0,0 +1,150 @@
+# Per-utterance assistant pipeline: translation, entities and keywords in parallel
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait
+from models.response import AssistantResponse, TranslationResponse, SuggestionResponse
+
+STAGES = ("translation", "entities", "keywords")
+
+_logger = logging.getLogger(__name__)
+
+
+class UtterancePipeline:
+    def __init__(self, translator=None, nlp=None, keywords=None, deadlines=None, max_in_flight=None,
+                 target_language="en", top_k=5):
+        """Fan each finalized utterance out to the assistant stages and assemble an AssistantResponse.
+
+        Stages run concurrently, each on its own threads, so a slow stage
+        can't hold up the others. Each has its own deadline, measured from
+        the ``arrived`` time passed to ``process``. A stage that misses it is
+        left out of that response. It keeps running, so a translation still
+        lands in the client's cache. A stage that already has
+        ``max_in_flight`` utterances running is skipped for the new one
+        rather than queued behind them. Stages without a backend are skipped.
+
+        Args:
+            translator: SarvamClient, or None to skip translation
+            nlp: NLPProcessor, or None to skip entity extraction
+            keywords: KeywordEngine holding this call's running counts, or None
+            deadlines: Seconds per stage, overriding the defaults
+            max_in_flight: Utterances a stage may work on at once, overriding the defaults
+            target_language: Language translations are requested in
+            top_k: Keywords reported per utterance
+        """
+        self.translator = translator
+        self.nlp = nlp
+        self.keywords = keywords
+        self.deadlines = {"translation": 1.5, "entities": 0.5, "keywords": 0.2, **(deadlines or {})}
+        # Translation waits on the network, so it gets the most room to overlap
+        self.max_in_flight = {"translation": 4, "entities": 2, "keywords": 2, **(max_in_flight or {})}
+        self.target_language = target_language
+        self.top_k = top_k
+        self.latencies = {stage: deque(maxlen=1000) for stage in STAGES}
+        self.timeouts = {stage: 0 for stage in STAGES}
+        self.skipped = {stage: 0 for stage in STAGES}
+        self._keywords_lock = threading.Lock()
+        self._in_flight = {stage: 0 for stage in STAGES}
+        self._in_flight_lock = threading.Lock()
+        # One worker per allowed utterance, so a submitted stage always starts at once
+        self._executors = {
+            stage: ThreadPoolExecutor(max_workers=self.max_in_flight[stage], thread_name_prefix=f"assistant-{stage}")
+            for stage in STAGES
+        }
+
+    def process(self, transcript_response, arrived=None):
+        """Run the stages for one utterance; ``arrived`` is its ``time.monotonic()`` arrival, default now."""
+        text = transcript_response.transcript
+        runners = {
+            "translation": self._translate if self.translator is not None else None,
+            "entities": self._entities if self.nlp is not None else None,
+            "keywords": self._keywords if self.keywords is not None else None,
+        }
+        start = time.monotonic() if arrived is None else arrived
+        futures = {}
+        for stage, run in runners.items():
+            if run is not None:
+                future = self._submit(stage, run, text)
+                if future is not None:
+                    futures[stage] = future
+
+        results = {}
+        stage_latencies = {}
+        # Wait for the stages in deadline order so each one gets its full budget
+        for stage in sorted(futures, key=self.deadlines.get):
+            remaining = start + self.deadlines[stage] - time.monotonic()
+            done, _ = wait([futures[stage]], timeout=max(0.0, remaining))
+            if not done:
+                self.timeouts[stage] += 1
+                continue
+            try:
+                results[stage], stage_latencies[stage] = futures[stage].result()
+            except Exception as e:
+                _logger.warning("Assistant stage %s failed: %s", stage, e)
+
+        keywords = results.get("keywords", [])
+        entities = results.get("entities", [])
+        return AssistantResponse(
+            transcript_response,
+            results.get("translation"),
+            SuggestionResponse(self._suggestions(entities, keywords), keywords=keywords, entities=entities),
+            stage_latencies=stage_latencies,
+        )
+
+    def stage_stats(self):
+        """Return p50/p95 latency in milliseconds, missed deadlines and skipped utterances per stage."""
+        stats = {}
+        for stage, values in self.latencies.items():
+            if not values and not self.timeouts[stage] and not self.skipped[stage]:
+                continue
+            ordered = sorted(values)
+            pick = lambda q: ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000 if ordered else None
+            stats[stage] = {"p50_ms": pick(0.50), "p95_ms": pick(0.95), "timeouts": self.timeouts[stage],
+                            "skipped": self.skipped[stage]}
+        return stats
+
+    def close(self):
+        for executor in self._executors.values():
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def _submit(self, stage, run, text):
+        with self._in_flight_lock:
+            if self._in_flight[stage] >= self.max_in_flight[stage]:
+                self.skipped[stage] += 1
+                return None
+            self._in_flight[stage] += 1
+        future = self._executors[stage].submit(self._timed, stage, run, text)
+        future.add_done_callback(lambda _: self._release(stage))
+        return future
+
+    def _release(self, stage):
+        with self._in_flight_lock:
+            self._in_flight[stage] -= 1
+
+    def _timed(self, stage, run, text):
+        start = time.perf_counter()
+        result = run(text)
+        elapsed = time.perf_counter() - start
+        self.latencies[stage].append(elapsed)
+        return result, elapsed
+
+    def _translate(self, text):
+        translated = self.translator.translate(text, self.target_language)
+        return TranslationResponse(translated, "auto", self.target_language)
+
+    def _entities(self, text):
+        return self.nlp.analyze_text(text, fields=("entities",))["entities"]
+
+    def _keywords(self, text):
+        # Counts are per call; overlapping utterances must not interleave their updates
+        with self._keywords_lock:
+            self.keywords.add_segment(text)
+            return [term for term, _ in self.keywords.top_k(self.top_k)]
+
+    @staticmethod
+    def _suggestions(entities, keywords):
+        suggestions = [f"Confirm the {label.lower()} mentioned: {value}" for value, label in dict(entities).items()]
+        if keywords:
+            suggestions.append(f"Call topics so far: {', '.join(keywords)}")
+        return suggestions
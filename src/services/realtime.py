@@ -1,7 +1,14 @@
+import os
 import time
+import queue
 import threading
 import streamlit as st
 import random  # For demo purposes only
+from api.sarvam import SarvamClient, DEFAULT_URL
+from models.response import TranscriptResponse
+from services.keywords import KeywordEngine, load_idf_table
+from services.nlp import NLPProcessor
+from services.pipeline import UtterancePipeline
 
 def process_audio_chunk():
     """
@@ -28,33 +35,84 @@ def process_audio_chunk():
     
     return random.choice(sample_phrases)
 
-def update_transcript(stop_event):
-    """Background thread function to update transcript continuously"""
+def next_utterance(stop_event, utterances):
+    """Return the next finalized TranscriptResponse, or None once stopped.
+
+    With an ``utterances`` queue, the speech-to-text side puts
+    TranscriptResponses or voice_transcriber TranscriptEvents on it.
+    Responses are passed through as they are; final events are converted
+    with ``TranscriptResponse.from_event``, keeping their confidence, timing
+    and channel, and partial events are skipped. Without a queue, demo
+    phrases stand in for speech-to-text.
+    """
+    if utterances is None:
+        # Pause between demo phrases; wakes immediately when stopped
+        if stop_event.wait(2):
+            return None
+        return TranscriptResponse(process_audio_chunk(), confidence=1.0)
     while not stop_event.is_set():
-        new_text = process_audio_chunk()
-        
-        # Add to transcript display
-        if "transcript_display" in st.session_state:
-            st.session_state.transcript_display.add_to_transcript(new_text)
-            # Force streamlit to update (this is a hack - in production you'd need a better solution)
-            st.experimental_rerun()
-        
-        # Pause between updates
-        time.sleep(2)
+        try:
+            item = utterances.get(timeout=0.25)
+        except queue.Empty:
+            continue
+        if isinstance(item, TranscriptResponse):
+            return item
+        if item.is_final:
+            return TranscriptResponse.from_event(item)
+    return None
+
+def update_transcript(stop_event, transcript_queue, pipeline, utterances=None):
+    """Background thread function to update transcript continuously.
+
+    Session state isn't available off the script thread, so each finalized
+    utterance is handed over through ``transcript_queue`` along with the
+    time it was produced; the page polls it from a fragment timer and redraws
+    only the transcript fragment. The assistant response for the utterance
+    follows as a second item once the pipeline has assembled it.
+    """
+    while True:
+        utterance = next_utterance(stop_event, utterances)
+        if utterance is None:
+            return
+        arrived = time.monotonic()
+        transcript_queue.put(("transcript", arrived, utterance))
+
+        response = pipeline.process(utterance, arrived)
+        transcript_queue.put(("assistant", time.monotonic(), response))
 
-def start_realtime_processing():
+@st.cache_resource
+def load_nlp():
+    # One spaCy pipeline per server process; entity extraction is skipped if it can't load
+    try:
+        return NLPProcessor()
+    except Exception as e:
+        print(f"NLP stage disabled: {e}")
+        return None
+
+def build_pipeline(api_key=None, api_url=None):
+    translator = SarvamClient(api_key, api_url or DEFAULT_URL) if api_key else None
+    idf_path = os.getenv("KEYWORD_IDF_TABLE")
+    keywords = KeywordEngine(load_idf_table(idf_path) if idf_path else None)
+    return UtterancePipeline(translator=translator, nlp=load_nlp(), keywords=keywords)
+
+def start_realtime_processing(api_key=None, api_url=None, utterances=None):
     """
     Start the real-time audio processing in a background thread.
+
+    ``utterances`` is a queue.Queue the speech-to-text side fills with
+    TranscriptResponses or TranscriptEvents; without it, demo phrases are used.
     """
     if "processing_thread" in st.session_state and st.session_state.processing_thread.is_alive():
         # Already running
         return
     
-    # Create stop event and thread
+    # Create stop event and thread; a fresh pipeline per call keeps keyword counts per call
     st.session_state.stop_event = threading.Event()
+    st.session_state.transcript_queue = queue.Queue()
+    st.session_state.pipeline = build_pipeline(api_key, api_url)
     st.session_state.processing_thread = threading.Thread(
         target=update_transcript,
-        args=(st.session_state.stop_event,)
+        args=(st.session_state.stop_event, st.session_state.transcript_queue, st.session_state.pipeline, utterances)
     )
     
     # Start processing
@@ -70,4 +128,29 @@ def stop_realtime_processing():
     if "stop_event" in st.session_state and "processing_thread" in st.session_state:
         st.session_state.stop_event.set()
         st.session_state.processing_thread.join(timeout=1.0)
-        st.info("Real-time processing stopped.")
\ No newline at end of file
+        if "pipeline" in st.session_state:
+            st.session_state.pipeline.close()
+        st.info("Real-time processing stopped.")
+
+def drain_transcript():
+    """
+    Move queued transcript text into the display and assistant responses
+    into the assistant without waiting; the page calls this from a fragment
+    timer, so an empty queue just means nothing new since the last poll.
+    Returns ``(text, delay)`` for each new utterance, where ``delay`` is the
+    seconds it spent between being produced and being picked up for display.
+    """
+    transcript_queue = st.session_state.get("transcript_queue")
+    if transcript_queue is None:
+        return []
+    new_items = []
+    while True:
+        try:
+            kind, produced_at, payload = transcript_queue.get_nowait()
+        except queue.Empty:
+            return new_items
+        if kind == "transcript":
+            st.session_state.transcript_display.add_to_transcript(payload)
+            new_items.append((payload.transcript, time.monotonic() - produced_at))
+        else:
+            st.session_state.assistant.apply_response(payload)
@@ -1,10 +1,18 @@
+import logging
+
 def format_transcript(transcript):
     return transcript.strip().capitalize()
 
+_logger = logging.getLogger(__name__)
+_configured = False
+
 def log_event(event_message):
-    import logging
-    logging.basicConfig(level=logging.INFO)
-    logging.info(event_message)
+    global _configured
+    if not _configured:
+        # Once, not per event; basicConfig leaves an existing logging setup alone
+        logging.basicConfig(level=logging.INFO)
+        _configured = True
+    _logger.info(event_message)
 
 def validate_input(input_data):
     if not input_data or not isinstance(input_data, str):
@@ -0,0 +1,136 @@
+"""Vectorized G.711 decoding and streaming polyphase resampling for telephony audio."""
+
+from math import gcd
+import numpy as np
+from config import SAMPLE_RATE, RESAMPLER_TAPS_PER_PHASE
+
+
+def _mulaw_table():
+    u = ~np.arange(256, dtype=np.int32) & 0xFF
+    exponent = (u >> 4) & 0x07
+    magnitude = ((((u & 0x0F) << 3) + 0x84) << exponent) - 0x84
+    return (np.where(u & 0x80, -magnitude, magnitude) / 32768.0).astype(np.float32)
+
+
+def _alaw_table():
+    a = np.arange(256, dtype=np.int32) ^ 0x55
+    exponent = (a >> 4) & 0x07
+    mantissa = (a & 0x0F) << 4
+    magnitude = np.where(exponent == 0, mantissa + 8, (mantissa + 0x108) << np.maximum(exponent - 1, 0))
+    return (np.where(a & 0x80, magnitude, -magnitude) / 32768.0).astype(np.float32)
+
+
+# One float32 per possible code byte, so decoding is a single fancy-indexing gather.
+ULAW_TABLE = _mulaw_table()
+ALAW_TABLE = _alaw_table()
+
+
+def decode_g711(data, encoding="mulaw"):
+    """Decode μ-law or A-law bytes to float32 samples in [-1, 1)."""
+    table = ULAW_TABLE if encoding == "mulaw" else ALAW_TABLE
+    return table[np.frombuffer(data, dtype=np.uint8)]
+
+
+def encode_g711(samples, encoding="mulaw"):
+    """Encode float32 samples in [-1, 1) to μ-law or A-law bytes, taking the nearest code for each."""
+    table = ULAW_TABLE if encoding == "mulaw" else ALAW_TABLE
+    order = np.argsort(table, kind="stable")
+    levels = table[order]
+    upper = np.clip(np.searchsorted(levels, samples), 1, len(levels) - 1)
+    take_lower = samples - levels[upper - 1] < levels[upper] - samples
+    return order[upper - take_lower].astype(np.uint8).tobytes()
+
+
+class PolyphaseResampler:
+    def __init__(self, in_rate, out_rate, taps_per_phase=RESAMPLER_TAPS_PER_PHASE):
+        """Rational-ratio resampler that keeps its filter state across chunks.
+
+        The anti-aliasing FIR is a Kaiser-windowed sinc split into ``up``
+        phases. For small decimation factors (8 kHz -> 16 kHz, 48 kHz ->
+        16 kHz) each phase is one ``np.convolve`` over the chunk; otherwise
+        every output's input window is gathered in one vectorized step. The
+        last ``taps_per_phase - 1`` input samples plus the output phase carry
+        over, so splitting a stream into chunks gives the same result as
+        resampling it whole.
+
+        Args:
+            in_rate: Input sample rate in Hz
+            out_rate: Output sample rate in Hz
+            taps_per_phase: Filter taps applied per output sample
+        """
+        g = gcd(int(in_rate), int(out_rate))
+        self.up = int(out_rate) // g
+        self.down = int(in_rate) // g
+        self.taps = taps_per_phase
+
+        length = self.up * taps_per_phase
+        cutoff = 0.5 / max(self.up, self.down)
+        t = np.arange(length) - (length - 1) / 2
+        h = 2 * cutoff * np.sinc(2 * cutoff * t) * np.kaiser(length, 8.0)
+        h *= self.up / h.sum()
+        # phases[p, k] multiplies the k-th newest input sample for output phase p
+        self.phases = h.reshape(taps_per_phase, self.up).T.astype(np.float32)
+        self._offsets = np.arange(taps_per_phase)
+
+        self.reset()
+
+    def reset(self):
+        self._history = np.zeros(self.taps - 1, dtype=np.float32)
+        self._next_out = 0
+        self._consumed = 0
+
+    def process(self, samples):
+        samples = np.asarray(samples, dtype=np.float32)
+        if self.up == self.down:
+            return samples
+        extended = np.concatenate((self._history, samples))
+        total_in = self._consumed + len(samples)
+        # Every output whose newest input sample has now arrived
+        end_out = -(-total_in * self.up // self.down)
+        positions = np.arange(self._next_out, end_out) * self.down
+        newest = positions // self.up - self._consumed + len(self._history)
+        if self.down <= 4:
+            output = self._convolve(extended, positions, newest)
+        else:
+            windows = extended[newest[:, None] - self._offsets]
+            output = np.einsum("ij,ij->i", windows, self.phases[positions % self.up])
+
+        self._history = extended[len(extended) - len(self._history):]
+        # Rebase the counters by whole input periods so they stay small on long calls.
+        periods = total_in // self.down
+        self._consumed = total_in - periods * self.down
+        self._next_out = end_out - periods * self.up
+        return output
+
+    def _convolve(self, extended, positions, newest):
+        # Outputs r, r + up, r + 2*up, ... share a phase and step through the input by `down`.
+        output = np.empty(len(positions), dtype=np.float32)
+        for r in range(min(self.up, len(positions))):
+            filtered = np.convolve(extended, self.phases[positions[r] % self.up], mode="valid")
+            start = newest[r] - (self.taps - 1)
+            count = len(output[r::self.up])
+            output[r::self.up] = filtered[start:start + count * self.down:self.down]
+        return output
+
+
+class AudioConverter:
+    def __init__(self, encoding="mulaw", in_rate=8000, out_rate=SAMPLE_RATE):
+        """Turn raw call audio bytes into float32 at the transcriber's sample rate.
+
+        Args:
+            encoding: "mulaw", "alaw", or "pcm16" (little-endian)
+            in_rate: Sample rate of the incoming audio
+            out_rate: Sample rate handed to the transcriber
+        """
+        if encoding not in ("mulaw", "alaw", "pcm16"):
+            raise ValueError(f"Unknown audio encoding: {encoding}")
+        self.encoding = encoding
+        self.resampler = PolyphaseResampler(in_rate, out_rate)
+
+    def convert(self, data):
+        """Convert a whole batch of frames in one call; state carries to the next batch."""
+        if self.encoding == "pcm16":
+            samples = np.frombuffer(data, dtype="<i2", count=len(data) // 2).astype(np.float32) / 32768.0
+        else:
+            samples = decode_g711(data, self.encoding)
+        return self.resampler.process(samples)
@@ -0,0 +1,250 @@
+"""Offline batch transcription of a directory of recordings to JSONL and SRT.
+
+Each file is read from disk in blocks with soundfile, resampled, and split
+into speech segments by the streaming VAD, so memory stays flat however long
+the recording is. Segments from all files go to one decode backend; with the
+default "batch" backend they share a BatchScheduler and are decoded in
+batches. Completed files are appended to ``manifest.jsonl`` in the output
+directory and skipped when the run is repeated, so an interrupted run resumes
+where it stopped.
+
+    python batch_transcribe.py recordings/ transcripts/ --cores 8
+
+The summary reports audio-hours transcribed per wall-clock hour for the cores
+the run was allowed to use.
+"""
+
+import argparse
+import json
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+import numpy as np
+from config import (
+    MODEL_SIZE, SAMPLE_RATE, OFFLINE_BACKEND, OFFLINE_FILE_WORKERS, OFFLINE_BLOCK_SECONDS,
+    OFFLINE_MAX_IN_FLIGHT, OFFLINE_EXTENSIONS,
+)
+from audio_convert import PolyphaseResampler
+from executor import create_backend
+from model_pool import BatchScheduler
+from vad import StreamingVAD
+
+# The VAD has already removed silence; Whisper's own filter would only repeat the work.
+DECODE_OPTIONS = dict(beam_size=5, language="en", vad_filter=False)
+
+
+def find_recordings(root, extensions=OFFLINE_EXTENSIONS):
+    """Return recording paths under ``root`` relative to it, in a stable order."""
+    found = []
+    for directory, _, files in os.walk(root):
+        for name in files:
+            if name.lower().endswith(extensions):
+                found.append(os.path.relpath(os.path.join(directory, name), root))
+    return sorted(found)
+
+
+def format_srt_time(seconds):
+    millis = int(round(seconds * 1000))
+    hours, millis = divmod(millis, 3_600_000)
+    minutes, millis = divmod(millis, 60_000)
+    secs, millis = divmod(millis, 1000)
+    return f"{hours:02d}:{minutes:02d}:{secs:02d},{millis:03d}"
+
+
+def _write_atomic(path, text):
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp, path)
+
+
+def write_outputs(base_path, file_name, records):
+    """Write ``records`` as ``base_path.jsonl`` and ``base_path.srt``."""
+    os.makedirs(os.path.dirname(base_path) or ".", exist_ok=True)
+    _write_atomic(base_path + ".jsonl", "".join(
+        json.dumps({"file": file_name, **record}, ensure_ascii=False) + "\n" for record in records
+    ))
+    _write_atomic(base_path + ".srt", "".join(
+        f"{i}\n{format_srt_time(r['start'])} --> {format_srt_time(r['end'])}\n{r['text']}\n\n"
+        for i, r in enumerate(records, 1)
+    ))
+
+
+class Manifest:
+    def __init__(self, path):
+        """Append-only record of finished files, keyed by relative path, size and mtime."""
+        self.path = path
+        self._lock = threading.Lock()
+        self.done = {}
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        # A line cut short by an interrupted run; that file is simply redone.
+                        continue
+                    self.done[entry["file"]] = entry
+
+    def is_done(self, file_name, stat):
+        entry = self.done.get(file_name)
+        return entry is not None and entry["size"] == stat.st_size and entry["mtime"] == stat.st_mtime
+
+    def record(self, entry):
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry) + "\n")
+            self.done[entry["file"]] = entry
+
+
+def _decode_now(backend, audio, options):
+    # Backends without a queue decode on the file worker itself.
+    future = Future()
+    try:
+        future.set_result(backend.transcribe(audio, **options))
+    except Exception as e:
+        future.set_exception(e)
+    return future
+
+
+def transcribe_file(path, submit, block_seconds=OFFLINE_BLOCK_SECONDS, max_in_flight=OFFLINE_MAX_IN_FLIGHT):
+    """Stream one recording through the VAD and decoder.
+
+    Returns ``(records, audio_seconds)`` where each record has ``start``,
+    ``end`` (seconds in the file) and ``text``.
+    """
+    import soundfile as sf
+
+    info = sf.info(path)
+    resampler = PolyphaseResampler(info.samplerate, SAMPLE_RATE)
+    vad = StreamingVAD(SAMPLE_RATE)
+    in_flight = deque()
+    records = []
+    current = []
+
+    def collect_oldest():
+        offset, future = in_flight.popleft()
+        for segment in future.result():
+            text = segment.text.strip()
+            if text:
+                records.append({"start": round(offset + segment.start, 3), "end": round(offset + segment.end, 3),
+                                "text": text})
+
+    def handle(events):
+        starts = list(vad.last_segment_starts)
+        for speech, segment_ended in events:
+            current.append(speech)
+            if not segment_ended:
+                continue
+            audio = np.concatenate(current)
+            current.clear()
+            in_flight.append((starts.pop(0) / SAMPLE_RATE, submit(audio)))
+            # Bound the audio held per file while the decoder catches up
+            while len(in_flight) > max_in_flight:
+                collect_oldest()
+
+    for block in sf.blocks(path, blocksize=int(block_seconds * info.samplerate), dtype="float32", always_2d=True):
+        handle(vad.process(resampler.process(block.mean(axis=1))))
+    handle(vad.flush())
+    while in_flight:
+        collect_oldest()
+    return records, info.frames / info.samplerate
+
+
+def limit_cores(cores):
+    """Pin this process and its BLAS/OpenMP pools to the first ``cores`` CPUs (Linux)."""
+    for var in ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS"):
+        os.environ[var] = str(cores)
+    if hasattr(os, "sched_setaffinity"):
+        available = sorted(os.sched_getaffinity(0))
+        os.sched_setaffinity(0, available[:cores])
+
+
+def run(input_dir, output_dir, model_size=MODEL_SIZE, backend=OFFLINE_BACKEND, workers=OFFLINE_FILE_WORKERS):
+    os.makedirs(output_dir, exist_ok=True)
+    manifest = Manifest(os.path.join(output_dir, "manifest.jsonl"))
+    todo = []
+    for name in find_recordings(input_dir):
+        stat = os.stat(os.path.join(input_dir, name))
+        if not manifest.is_done(name, stat):
+            todo.append((name, stat))
+    print(f"{len(todo)} recordings to transcribe ({len(manifest.done)} already in the manifest)")
+
+    scheduler = None
+    if backend == "batch":
+        scheduler = BatchScheduler(model_size)
+        scheduler.start()
+
+    totals = {"audio_seconds": 0.0, "files": 0, "failed": 0}
+    totals_lock = threading.Lock()
+
+    def process(name, stat):
+        start = time.perf_counter()
+        file_backend = None
+        try:
+            if scheduler is not None:
+                submit = lambda audio: scheduler.submit(audio, **DECODE_OPTIONS)
+            else:
+                file_backend = create_backend(backend, model_size)
+                submit = lambda audio: _decode_now(file_backend, audio, DECODE_OPTIONS)
+            records, audio_seconds = transcribe_file(os.path.join(input_dir, name), submit)
+            write_outputs(os.path.join(output_dir, os.path.splitext(name)[0]), name, records)
+        except Exception as e:
+            print(f"Failed to transcribe {name}: {e}")
+            with totals_lock:
+                totals["failed"] += 1
+            return
+        finally:
+            if file_backend is not None:
+                file_backend.close()
+
+        elapsed = time.perf_counter() - start
+        manifest.record({"file": name, "size": stat.st_size, "mtime": stat.st_mtime,
+                         "audio_seconds": round(audio_seconds, 3), "segments": len(records),
+                         "wall_seconds": round(elapsed, 3)})
+        with totals_lock:
+            totals["audio_seconds"] += audio_seconds
+            totals["files"] += 1
+        print(f"{name}: {audio_seconds:.0f}s of audio in {elapsed:.1f}s ({len(records)} segments)")
+
+    start = time.perf_counter()
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            for future in [pool.submit(process, name, stat) for name, stat in todo]:
+                future.result()
+    finally:
+        if scheduler is not None:
+            scheduler.stop()
+    totals["wall_seconds"] = time.perf_counter() - start
+    return totals
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("input_dir")
+    parser.add_argument("output_dir")
+    parser.add_argument("--model-size", default=MODEL_SIZE)
+    parser.add_argument("--backend", default=OFFLINE_BACKEND, choices=["batch", "thread", "process"])
+    parser.add_argument("--workers", type=int, default=OFFLINE_FILE_WORKERS, help="files processed concurrently")
+    parser.add_argument("--cores", type=int, default=None, help="restrict the run to this many CPU cores")
+    args = parser.parse_args()
+
+    if args.cores:
+        limit_cores(args.cores)
+    cores = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else os.cpu_count()
+
+    totals = run(args.input_dir, args.output_dir, args.model_size, args.backend, args.workers)
+
+    audio_hours = totals["audio_seconds"] / 3600
+    wall_hours = totals["wall_seconds"] / 3600
+    print(f"\nTranscribed {totals['files']} files ({totals['failed']} failed), "
+          f"{audio_hours:.2f} audio-hours in {totals['wall_seconds']:.0f}s on {cores} cores")
+    if wall_hours > 0:
+        rate = audio_hours / wall_hours
+        print(f"Throughput: {rate:.1f} audio-hours per wall-clock hour ({rate / cores:.2f} per core)")
+
+
+if __name__ == "__main__":
+    main()
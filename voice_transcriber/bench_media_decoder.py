@@ -0,0 +1,71 @@
+"""Microbenchmark: media messages/sec for the fast-path decoder versus per-message json.loads."""
+
+import base64
+import json
+import time
+import numpy as np
+from config import PHONE_BATCH_FRAMES
+from media_decoder import MediaFrameDecoder, make_payload_extractor
+from audio_convert import AudioConverter
+from phone_loadgen import media_messages
+
+
+def per_message_path(lines, callback):
+    # The original PhoneCapture._process_message path, which read payloads as raw int16
+    for line in lines:
+        message = json.loads(line)
+        if message.get('event') == 'media':
+            payload = message.get('media', {}).get('payload')
+            if payload:
+                callback(np.frombuffer(base64.b64decode(payload), dtype=np.int16))
+
+
+def batched_path(lines, callback, decoder, batch_frames, converter=None):
+    for i in range(0, len(lines), batch_frames):
+        audio_data = decoder.decode_batch(lines[i:i + batch_frames])
+        if converter:
+            callback(converter.convert(audio_data))
+        else:
+            callback(np.frombuffer(audio_data, dtype=np.int16, count=len(audio_data) // 2))
+
+
+def measure(fn, lines, repeats=5):
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn(lines)
+        best = min(best, time.perf_counter() - start)
+    return len(lines) / best
+
+
+def main():
+    lines = [m.encode("ascii") for m in media_messages(0, 20000)]
+    noop = lambda audio: None
+
+    results = [("json.loads per message", measure(lambda l: per_message_path(l, noop), lines))]
+    for backend in ("msgspec", "orjson", "stdlib"):
+        try:
+            make_payload_extractor(backend)
+        except ValueError:
+            print(f"{backend}: not installed, skipped")
+            continue
+        for batch in (1, PHONE_BATCH_FRAMES):
+            decoder = MediaFrameDecoder(backend)
+            rate = measure(lambda l: batched_path(l, noop, decoder, batch), lines)
+            results.append((f"{backend}, batch={batch}", rate))
+
+    # Full phone path: parse, mu-law decode and resample to SAMPLE_RATE
+    name, _ = make_payload_extractor("auto")
+    decoder = MediaFrameDecoder(name)
+    converter = AudioConverter("mulaw", 8000)
+    rate = measure(lambda l: batched_path(l, noop, decoder, PHONE_BATCH_FRAMES, converter), lines)
+    results.append((f"{name} + mulaw/resample", rate))
+
+    baseline = results[0][1]
+    print(f"{'path':<26} {'msg/s':>12} {'speedup':>8}")
+    for name, rate in results:
+        print(f"{name:<26} {rate:>12.0f} {rate / baseline:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""Benchmark: concurrent sessions per core at a fixed p95 latency.
+
+Each simulated session submits a decode window every ``--hop`` seconds, the way
+RealtimeTranscriber does while a call is live. The number of sessions is
+raised until the p95 submit-to-result latency exceeds ``--p95-target``, once
+with every session calling the shared model directly and once through the
+BatchScheduler.
+"""
+
+import argparse
+import os
+import threading
+import time
+import numpy as np
+from config import MODEL_SIZE, SAMPLE_RATE
+from model_pool import BatchScheduler, get_registry
+
+
+def synthetic_window(seconds, seed):
+    # A few harmonics with an amplitude envelope so the encoder sees speech-like energy.
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(seconds * SAMPLE_RATE)) / SAMPLE_RATE
+    f0 = rng.uniform(100, 220)
+    audio = sum(np.sin(2 * np.pi * f0 * k * t) / k for k in range(1, 6))
+    audio *= 0.5 + 0.5 * np.sin(2 * np.pi * 3 * t) ** 2
+    return (0.1 * audio / np.abs(audio).max()).astype(np.float32)
+
+
+def run_sessions(num_sessions, duration, window, hop, decode):
+    latencies = []
+    lock = threading.Lock()
+
+    def session(seed):
+        audio = synthetic_window(window, seed)
+        next_tick = time.monotonic()
+        end = next_tick + duration
+        while time.monotonic() < end:
+            start = time.monotonic()
+            decode(audio)
+            with lock:
+                latencies.append(time.monotonic() - start)
+            next_tick += hop
+            time.sleep(max(0.0, next_tick - time.monotonic()))
+
+    threads = [threading.Thread(target=session, args=(i,)) for i in range(num_sessions)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return float(np.percentile(latencies, 95)) if latencies else float("inf")
+
+
+def max_sessions(label, decode, args):
+    best = 0
+    sessions = 1
+    while sessions <= args.max_sessions:
+        p95 = run_sessions(sessions, args.duration, args.window, args.hop, decode)
+        print(f"  {label:<12} sessions={sessions:<3} p95={p95 * 1000:8.1f} ms")
+        if p95 > args.p95_target:
+            break
+        best = sessions
+        sessions *= 2
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--model-size", default=MODEL_SIZE)
+    parser.add_argument("--window", type=float, default=2.0, help="seconds of audio per decode")
+    parser.add_argument("--hop", type=float, default=1.0, help="seconds between decodes per session")
+    parser.add_argument("--duration", type=float, default=15.0, help="seconds per measurement")
+    parser.add_argument("--p95-target", type=float, default=1.0, help="p95 latency budget in seconds")
+    parser.add_argument("--max-sessions", type=int, default=64)
+    args = parser.parse_args()
+
+    cores = os.cpu_count() or 1
+    options = dict(beam_size=1, language="en", vad_filter=False)
+    model = get_registry().acquire(args.model_size, "int8")
+
+    print(f"Measuring with {cores} cores, window={args.window}s, hop={args.hop}s, "
+          f"p95 target={args.p95_target * 1000:.0f} ms")
+    direct = max_sessions("direct", lambda audio: list(model.transcribe(audio, **options)[0]), args)
+
+    scheduler = BatchScheduler(model_size=args.model_size)
+    scheduler.start()
+    try:
+        batched = max_sessions("batched", lambda audio: scheduler.transcribe(audio, **options), args)
+        mean_batch = np.mean(scheduler.batch_sizes) if scheduler.batch_sizes else 0
+    finally:
+        scheduler.stop()
+        get_registry().release(args.model_size, "int8")
+
+    print(f"\n{'mode':<10} {'sessions':>8} {'sessions/core':>14}")
+    print(f"{'direct':<10} {direct:>8} {direct / cores:>14.2f}")
+    print(f"{'batched':<10} {batched:>8} {batched / cores:>14.2f}   (mean batch size {mean_batch:.1f})")
+
+
+if __name__ == "__main__":
+    main()
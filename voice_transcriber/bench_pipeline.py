@@ -0,0 +1,407 @@
+"""End-to-end benchmark: transcriber and phone ingest on fixture or synthetic audio, saved as JSON.
+
+Fixtures are WAV files (mono, 16-bit) in ``--fixtures``, each with a
+same-named ``.txt`` reference transcript used for WER. Recorded Twilio media
+streams (``.jsonl``, one message per line, optionally with a ``.txt``
+reference) can be given with ``--media``. Without fixtures, synthetic
+voiced audio is used and WER is left out.
+
+Stages run one after another in this process, so the CPU time and RSS
+recorded for each stage belong to that stage. They are:
+- model_load: load the decode backend.
+- transcriber: feed RealtimeTranscriber.add_audio in 64 ms chunks at ``--speed``.
+- phone: replay media JSON into PhoneCapture over loopback, transcribing what it delivers.
+
+Use the "thread" backend. The process backend's worker CPU is not visible
+here.
+
+    python bench_pipeline.py --fixtures fixtures/ --speed 4 --output run.json
+    python bench_pipeline.py --fixtures fixtures/ --speed 4 --compare run.json
+"""
+
+import argparse
+import asyncio
+import base64
+import json
+import os
+import platform
+import re
+import resource
+import sys
+import time
+from datetime import datetime, timezone
+import numpy as np
+from config import MODEL_SIZE, SAMPLE_RATE, CHUNK_SIZE, TRANSCRIBER_BACKEND, PHONE_SAMPLE_RATE, AUDIO_QUEUE_POLICY
+from audio_convert import AudioConverter, PolyphaseResampler, encode_g711
+from executor import create_backend
+from flow_control import QUEUE_POLICIES
+from phone_capture import PhoneCapture
+from server_client import load_wav, synthetic_audio
+from streaming import TranscriptEvent
+from transcriber import RealtimeTranscriber
+
+FRAME_MS = 20
+PERCENTILES = (50, 90, 95, 99)
+# Metrics where a higher value in a later run counts as a regression
+_LOWER_IS_BETTER = re.compile(r"(_s|_ms|_mb|rtf|wer|dropped)([._]p\d+)?$")
+
+
+def normalize_words(text):
+    return re.findall(r"[a-z0-9']+", text.lower())
+
+
+def word_errors(reference, hypothesis):
+    """Return ``(edits, reference_words)``: word-level Levenshtein distance and the reference length."""
+    ref, hyp = normalize_words(reference), normalize_words(hypothesis)
+    previous = list(range(len(hyp) + 1))
+    for i, word in enumerate(ref, 1):
+        current = [i] + [0] * len(hyp)
+        for j, other in enumerate(hyp, 1):
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (word != other))
+        previous = current
+    return previous[-1], len(ref)
+
+
+def percentiles_ms(seconds):
+    if not len(seconds):
+        return {}
+    values = np.percentile(np.asarray(seconds, dtype=np.float64) * 1000, PERCENTILES)
+    return {f"p{p}": round(float(v), 2) for p, v in zip(PERCENTILES, values)}
+
+
+def current_rss_mb():
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2 ** 20
+    except OSError:
+        # No procfs: fall back to the peak, which is what getrusage reports
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / 2 ** 20 if sys.platform == "darwin" else peak / 1024
+
+
+class StageProbe:
+    """Wall time, CPU time and resident memory across a ``with`` block."""
+
+    def __init__(self, results, name):
+        self.results = results
+        self.name = name
+
+    def __enter__(self):
+        self.rss = current_rss_mb()
+        self.cpu = time.process_time()
+        self.wall = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        rss = current_rss_mb()
+        self.results.setdefault(self.name, {}).update({
+            "wall_s": round(time.perf_counter() - self.wall, 3),
+            "cpu_s": round(time.process_time() - self.cpu, 3),
+            "rss_mb": round(rss, 1),
+            "rss_delta_mb": round(rss - self.rss, 1),
+        })
+
+
+class TimedBackend:
+    """Wraps a decode backend to record each decode's real-time factor."""
+
+    def __init__(self, backend, sample_rate=SAMPLE_RATE):
+        self.backend = backend
+        self.sample_rate = sample_rate
+        self.decode_seconds = 0.0
+        self.rtfs = []
+
+    def transcribe(self, audio, **options):
+        start = time.perf_counter()
+        segments = self.backend.transcribe(audio, **options)
+        elapsed = time.perf_counter() - start
+        self.decode_seconds += elapsed
+        if len(audio):
+            self.rtfs.append(elapsed * self.sample_rate / len(audio))
+        return segments
+
+    def reset(self):
+        self.decode_seconds = 0.0
+        self.rtfs = []
+
+
+def load_fixtures(directory):
+    """Yield ``(name, float32 audio at SAMPLE_RATE, reference text or None)`` per WAV file."""
+    for name in sorted(os.listdir(directory)):
+        if not name.lower().endswith(".wav"):
+            continue
+        pcm, rate = load_wav(os.path.join(directory, name))
+        audio = AudioConverter("pcm16", rate, SAMPLE_RATE).convert(pcm)
+        yield name, audio, _reference(os.path.join(directory, name))
+
+
+def _reference(path):
+    txt = os.path.splitext(path)[0] + ".txt"
+    if not os.path.exists(txt):
+        return None
+    with open(txt, encoding="utf-8") as f:
+        return f.read().strip()
+
+
+def media_lines(audio, call_index=0):
+    """Twilio-style media stream messages carrying ``audio`` as 8 kHz μ-law frames."""
+    stream_sid = f"MZ{call_index:032x}"
+    payload = encode_g711(PolyphaseResampler(SAMPLE_RATE, PHONE_SAMPLE_RATE).process(audio))
+    frame_bytes = PHONE_SAMPLE_RATE * FRAME_MS // 1000
+    lines = [json.dumps({"event": "start", "streamSid": stream_sid})]
+    for chunk, offset in enumerate(range(0, len(payload), frame_bytes)):
+        lines.append(json.dumps({
+            "event": "media", "streamSid": stream_sid,
+            "media": {"track": "inbound", "chunk": str(chunk + 1), "timestamp": str(chunk * FRAME_MS),
+                      "payload": base64.b64encode(payload[offset:offset + frame_bytes]).decode("ascii")},
+        }))
+    lines.append(json.dumps({"event": "stop", "streamSid": stream_sid}))
+    return lines
+
+
+def transcribe_stream(backend, feed, args):
+    """Run one RealtimeTranscriber while ``feed(transcriber)`` supplies its audio.
+
+    Returns the joined finals, the latencies by kind, and the seconds of audio its queue dropped.
+    """
+    transcriber = RealtimeTranscriber(args.model, streaming=args.streaming, backend=backend, vad=not args.no_vad,
+                                      audio_policy=args.audio_policy)
+    transcriber.start()
+    feed(transcriber)
+    while not transcriber.audio_queue.empty():
+        time.sleep(0.01)
+    transcriber.stop()
+
+    finals = []
+    while not transcriber.text_queue.empty():
+        item = transcriber.text_queue.get()
+        if isinstance(item, TranscriptEvent):
+            if item.is_final:
+                finals.append(item.text)
+        else:
+            finals.append(item)
+    latencies = {name: list(values) for name, values in transcriber.latencies.items()}
+    return " ".join(finals), latencies, transcriber.get_dropped_audio_seconds()
+
+
+def feed_direct(audio, speed):
+    def feed(transcriber):
+        interval = CHUNK_SIZE / SAMPLE_RATE / speed if speed > 0 else 0
+        start = time.monotonic()
+        for i, offset in enumerate(range(0, len(audio), CHUNK_SIZE)):
+            transcriber.add_audio(audio[offset:offset + CHUNK_SIZE])
+            if interval:
+                time.sleep(max(0.0, start + (i + 1) * interval - time.monotonic()))
+    return feed
+
+
+def feed_phone(lines, speed, ingest_latencies, call_stats):
+    """Replay ``lines`` into a loopback PhoneCapture whose callback feeds the transcriber."""
+    def feed(transcriber):
+        sent_at = []
+        delivered = [0]
+        samples_per_frame = SAMPLE_RATE * FRAME_MS // 1000
+
+        def on_audio(audio):
+            delivered[0] += len(audio)
+            frame = min(len(sent_at), max(1, -(-delivered[0] // samples_per_frame))) - 1
+            if frame >= 0:
+                ingest_latencies.append(time.monotonic() - sent_at[frame])
+            transcriber.add_audio(audio)
+
+        phone = PhoneCapture(audio_callback=on_audio, host="127.0.0.1", port=0,
+                             congested=lambda: transcriber.congested)
+        phone.start()
+
+        async def send():
+            _, writer = await asyncio.open_connection("127.0.0.1", phone.port)
+            interval = FRAME_MS / 1000 / speed if speed > 0 else 0
+            start = time.monotonic()
+            for i, line in enumerate(lines):
+                writer.write(line.encode("utf-8") + b"\n")
+                await writer.drain()
+                if '"media"' in line:
+                    sent_at.append(time.monotonic())
+                if interval:
+                    await asyncio.sleep(max(0.0, start + i * interval - time.monotonic()))
+            writer.close()
+            await writer.wait_closed()
+
+        asyncio.run(send())
+        # The server finishes the call once it has read the closed socket
+        deadline = time.monotonic() + 10
+        while time.monotonic() < deadline and sum(c["processed"] for c in phone.get_call_stats()) < len(lines):
+            time.sleep(0.01)
+        phone.stop()
+        call_stats.extend(phone.get_call_stats())
+    return feed
+
+
+def summarize(stage, audio_seconds, backend, latencies, errors, dropped_seconds):
+    stage["audio_s"] = round(audio_seconds, 2)
+    stage["dropped_audio_s"] = round(dropped_seconds, 2)
+    stage["rtf"] = round(backend.decode_seconds / audio_seconds, 4) if audio_seconds else None
+    if backend.rtfs:
+        p50, p95 = np.percentile(backend.rtfs, [50, 95])
+        stage["decode_rtf_p50"], stage["decode_rtf_p95"] = round(float(p50), 4), round(float(p95), 4)
+    stage["decodes"] = len(backend.rtfs)
+    for name, values in latencies.items():
+        if values:
+            stage[f"latency_{name}_ms"] = percentiles_ms(values)
+    if errors[1]:
+        stage["wer"] = round(errors[0] / errors[1], 4)
+
+
+def run(args):
+    inputs = list(load_fixtures(args.fixtures)) if args.fixtures else []
+    if not inputs and not args.media:
+        pcm, _ = synthetic_audio(args.seconds)
+        inputs = [("synthetic", np.frombuffer(pcm, dtype="<i2").astype(np.float32) / 32768.0, None)]
+
+    stages = {}
+    fixtures = []
+    with StageProbe(stages, "model_load"):
+        backend = TimedBackend(create_backend(args.backend, args.model))
+
+    try:
+        if not args.skip_transcriber:
+            latencies = {}
+            errors = [0, 0]
+            dropped = 0.0
+            with StageProbe(stages, "transcriber"):
+                for name, audio, reference in inputs:
+                    hypothesis, fixture_latencies, fixture_dropped = transcribe_stream(
+                        backend, feed_direct(audio, args.speed), args)
+                    dropped += fixture_dropped
+                    for kind, values in fixture_latencies.items():
+                        latencies.setdefault(kind, []).extend(values)
+                    fixtures.append(_fixture_result("transcriber", name, len(audio), reference, hypothesis, errors))
+            summarize(stages["transcriber"], sum(len(a) for _, a, _ in inputs) / SAMPLE_RATE, backend, latencies,
+                      errors, dropped)
+
+        if not args.skip_phone:
+            backend.reset()
+            replays = [(name, media_lines(audio, i), reference) for i, (name, audio, reference) in enumerate(inputs)]
+            for path in args.media or []:
+                with open(path, encoding="utf-8") as f:
+                    replays.append((os.path.basename(path), [line.strip() for line in f if line.strip()], _reference(path)))
+            latencies = {}
+            ingest = []
+            call_stats = []
+            errors = [0, 0]
+            audio_seconds = 0.0
+            dropped = 0.0
+            with StageProbe(stages, "phone"):
+                for name, lines, reference in replays:
+                    frames = sum('"media"' in line for line in lines)
+                    audio_seconds += frames * FRAME_MS / 1000
+                    hypothesis, fixture_latencies, fixture_dropped = transcribe_stream(
+                        backend, feed_phone(lines, args.speed, ingest, call_stats), args)
+                    dropped += fixture_dropped
+                    for kind, values in fixture_latencies.items():
+                        latencies.setdefault(kind, []).extend(values)
+                    fixtures.append(_fixture_result("phone", name, frames * FRAME_MS / 1000 * SAMPLE_RATE,
+                                                    reference, hypothesis, errors))
+            stage = stages["phone"]
+            summarize(stage, audio_seconds, backend, latencies, errors, dropped)
+            stage["ingest_latency_ms"] = percentiles_ms(ingest)
+            stage["messages"] = sum(c["received"] for c in call_stats)
+            stage["dropped"] = sum(c["dropped"] for c in call_stats)
+    finally:
+        backend.backend.close()
+
+    return {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "model": args.model,
+            "backend": args.backend,
+            "streaming": args.streaming,
+            "vad": not args.no_vad,
+            "speed": args.speed,
+            "audio_policy": args.audio_policy,
+        },
+        "stages": stages,
+        "fixtures": fixtures,
+    }
+
+
+def _fixture_result(stage, name, samples, reference, hypothesis, errors):
+    result = {"stage": stage, "name": name, "audio_s": round(samples / SAMPLE_RATE, 2), "hypothesis": hypothesis}
+    if reference is not None:
+        edits, words = word_errors(reference, hypothesis)
+        errors[0] += edits
+        errors[1] += words
+        result["wer"] = round(edits / words, 4) if words else None
+    return result
+
+
+def flatten(stages, prefix=""):
+    flat = {}
+    for key, value in stages.items():
+        if isinstance(value, dict):
+            flat.update(flatten(value, f"{prefix}{key}."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[f"{prefix}{key}"] = value
+    return flat
+
+
+def compare(baseline, current, tolerance):
+    """Print each metric against the baseline; return the names that got worse by more than ``tolerance``."""
+    old, new = flatten(baseline["stages"]), flatten(current["stages"])
+    regressions = []
+    print(f"{'metric':<44}{'baseline':>12}{'current':>12}{'change':>9}")
+    for name in sorted(old.keys() & new.keys()):
+        if old[name]:
+            change = (new[name] - old[name]) / abs(old[name])
+        else:
+            # Any growth from a zero baseline (e.g. no dropped audio) is an unbounded change
+            change = float("inf") if new[name] > 0 else 0.0
+        flag = ""
+        if _LOWER_IS_BETTER.search(name) and change > tolerance:
+            regressions.append(name)
+            flag = "  REGRESSION"
+        print(f"{name:<44}{old[name]:>12.4g}{new[name]:>12.4g}{change:>+9.1%}{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--fixtures", help="directory of .wav files with .txt reference transcripts")
+    parser.add_argument("--media", nargs="*", help="recorded media-stream .jsonl files to replay into PhoneCapture")
+    parser.add_argument("--seconds", type=float, default=30.0, help="synthetic audio length without fixtures")
+    parser.add_argument("--speed", type=float, default=1.0, help="pace multiplier, 0 feeds as fast as possible")
+    parser.add_argument("--model", default=MODEL_SIZE)
+    parser.add_argument("--backend", default=TRANSCRIBER_BACKEND, choices=["thread", "process"])
+    parser.add_argument("--streaming", action="store_true", help="LocalAgreement streaming instead of batch mode")
+    parser.add_argument("--no-vad", action="store_true")
+    parser.add_argument("--audio-policy", default=AUDIO_QUEUE_POLICY, choices=QUEUE_POLICIES,
+                        help="transcriber audio queue policy; use block with --speed 0 so nothing is shed")
+    parser.add_argument("--skip-transcriber", action="store_true")
+    parser.add_argument("--skip-phone", action="store_true")
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--compare", help="baseline results JSON to check this run against")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="relative slowdown reported as a regression")
+    args = parser.parse_args()
+
+    results = run(args)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {args.output}")
+    else:
+        print(json.dumps(results["stages"], indent=2))
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(baseline, results, args.tolerance)
+        if regressions:
+            print(f"{len(regressions)} metrics regressed by more than {args.tolerance:.0%}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,40 @@
+"""Microbenchmark: AudioRingBuffer writes versus growing an array with np.append."""
+
+import time
+import numpy as np
+from config import SAMPLE_RATE, CHUNK_SIZE
+from ring_buffer import AudioRingBuffer
+
+
+def bench_np_append(chunks):
+    buffer = np.array([], dtype=np.float32)
+    start = time.perf_counter()
+    for chunk in chunks:
+        buffer = np.append(buffer, chunk)
+    return time.perf_counter() - start
+
+
+def bench_ring_buffer(chunks, capacity):
+    buffer = AudioRingBuffer(capacity)
+    start = time.perf_counter()
+    for chunk in chunks:
+        buffer.write(chunk)
+    buffer.view()
+    return time.perf_counter() - start
+
+
+def main():
+    backlogs = [1, 5, 10, 30, 60]
+    capacity = max(backlogs) * SAMPLE_RATE
+    print(f"{'backlog (s)':>12} {'np.append (ms)':>15} {'ring (ms)':>10} {'speedup':>8}")
+    for seconds in backlogs:
+        num_chunks = seconds * SAMPLE_RATE // CHUNK_SIZE
+        chunks = [np.random.randn(CHUNK_SIZE).astype(np.float32) for _ in range(num_chunks)]
+        append_time = bench_np_append(chunks)
+        ring_time = bench_ring_buffer(chunks, capacity)
+        print(f"{seconds:>12} {append_time * 1000:>15.2f} {ring_time * 1000:>10.2f} "
+              f"{append_time / ring_time:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
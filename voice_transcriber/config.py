@@ -3,13 +3,85 @@
 # Transcription settings
 MODEL_SIZE = "base"  # Whisper model size: tiny, base, small, medium, large
 
+# Streaming decode settings
+STREAMING_AGREEMENT = 2  # LocalAgreement-n: hypotheses that must agree before a word is committed
+STREAMING_WINDOW_SECONDS = 15  # Trim the decode window past committed words once it exceeds this
+STREAMING_PROMPT_CHARS = 200  # Tail of committed text passed to Whisper as the prompt
+WORD_TIMESTAMPS = False  # Word timings and probabilities in batch mode too; such windows skip the batched decode
+
+# Stereo call settings
+STEREO_CHANNELS = ("agent", "customer")  # Speaker on the left and right channel of a stereo call recording
+
+# Adaptive decode settings
+ADAPTIVE_DECODE = True  # Step down beam size, Whisper's VAD filter, then model size while decoding falls behind
+ADAPTIVE_BACKLOG_HIGH = 2.0  # Seconds of queued audio that count as falling behind
+ADAPTIVE_BACKLOG_LOW = 0.5  # Backlog under which a more accurate tier is tried again
+ADAPTIVE_RTF_HIGH = 0.8  # Decode time over audio time that counts as too slow
+ADAPTIVE_RTF_LOW = 0.5  # A tier must have run faster than this before it is stepped back up to
+ADAPTIVE_HOLD_SECONDS = 5.0  # Calm time before stepping back up
+FALLBACK_MODELS = {"large": "medium", "medium": "small", "small": "base", "base": "tiny"}
+
+# Flow control between stages
+AUDIO_QUEUE_SECONDS = 10.0  # Audio a transcriber session buffers ahead of its decoder
+AUDIO_QUEUE_POLICY = "drop_oldest"  # "block" slows the producer, "drop_oldest" sheds old audio, "coalesce" merges the backlog into one chunk
+AUDIO_QUEUE_BLOCK_TIMEOUT = 1.0  # Longest a blocked add_audio waits before its chunk is dropped
+TEXT_QUEUE_SIZE = 256  # Results held for get_transcription
+TEXT_QUEUE_POLICY = "coalesce"  # "coalesce" lets newer results replace an unread partial; past capacity the oldest are shed
+
+# Model pool settings
+MODEL_POOL_MAX_IDLE = 2  # Unused models kept loaded so the next session starts warm
+BATCH_MAX_SIZE = 8  # Windows decoded together by the batch scheduler
+BATCH_LATENCY_BUDGET = 0.15  # Seconds a window may wait for its batch to fill
+
+# Decode backend settings
+TRANSCRIBER_BACKEND = "thread"  # "thread" decodes in-process, "process" uses the worker pool
+PROCESS_POOL_WORKERS = 4  # Worker processes, each holding one loaded model
+THREADS_PER_WORKER = 1  # CPU threads per worker; keep workers * threads <= cores
+
+# Voice activity detection settings
+VAD_ENABLED = True  # Gate audio with StreamingVAD so only speech segments reach Whisper
+VAD_BACKEND = "energy"  # "energy" (NumPy only) or "silero" (needs the silero-vad package)
+VAD_THRESHOLD = 0.5  # Speech probability that opens a segment
+VAD_FRAME_MS = 32  # Scoring frame length (512 samples at 16 kHz)
+VAD_HANGOVER_MS = 500  # Silence that closes a segment
+VAD_PAD_MS = 200  # Audio kept before and after each segment
+VAD_MIN_SPEECH_MS = 250  # Shorter bursts are dropped as noise
+VAD_MAX_SEGMENT_SECONDS = 20  # Long speech is cut into segments that fit one Whisper window
+
 # Audio settings
 SAMPLE_RATE = 16000
 CHUNK_SIZE = 1024
+MAX_WINDOW_SECONDS = 30  # Capacity of the transcriber's audio ring buffer
+RESAMPLER_TAPS_PER_PHASE = 24  # FIR taps per output sample in the polyphase resampler
+MIC_RING_SECONDS = 2.0  # Audio the microphone callback can buffer ahead of the consumer
+LEVEL_HISTORY_BLOCKS = 50  # Callback blocks averaged for the microphone level / AGC
 
 # Phone socket settings
 SOCKET_HOST = "0.0.0.0"  # Listen on all interfaces
 SOCKET_PORT = 8000
+PHONE_SERVER_MODE = "asyncio"  # "asyncio" serves all calls on one event loop, "thread" uses a thread per call
+PHONE_CALL_QUEUE_SIZE = 250  # Media messages buffered per call (~5 s of 20 ms frames)
+PHONE_OVERFLOW_POLICY = "block"  # "block" applies TCP backpressure, "drop_oldest"/"drop_newest" shed frames
+PHONE_MAX_MESSAGE_BYTES = 1 << 20  # Longest accepted newline-delimited message
+PHONE_JSON_BACKEND = "auto"  # "msgspec", "orjson", "stdlib", or "auto" for the fastest installed
+PHONE_BATCH_FRAMES = 25  # Media frames decoded per audio_callback call (~0.5 s of 20 ms frames)
+PHONE_AUDIO_ENCODING = "mulaw"  # Twilio media streams: "mulaw", "alaw" or "pcm16"
+PHONE_SAMPLE_RATE = 8000  # Sample rate of incoming call audio, resampled to SAMPLE_RATE
+PHONE_RECENT_CALLS = 1000  # Finished calls whose counters get_call_stats still reports
+
+# Transcription server settings
+SERVER_HOST = "0.0.0.0"
+SERVER_PORT = 8765
+SERVER_MAX_SESSIONS = 8  # Concurrent streams admitted; further connections get HTTP 503
+SERVER_BACKEND = "thread"  # "thread"/"process" as TRANSCRIBER_BACKEND, or "batch" for one shared BatchScheduler
+SERVER_MAX_MESSAGE_BYTES = 1 << 20  # Largest accepted WebSocket message
+
+# Offline batch transcription settings
+OFFLINE_BACKEND = "batch"  # "batch" shares one BatchScheduler, "thread"/"process" as TRANSCRIBER_BACKEND
+OFFLINE_FILE_WORKERS = 4  # Recordings read and segmented concurrently
+OFFLINE_BLOCK_SECONDS = 10  # Audio read from disk per block
+OFFLINE_MAX_IN_FLIGHT = 16  # Segments per file queued for decoding at once
+OFFLINE_EXTENSIONS = (".wav", ".flac", ".ogg", ".mp3")
 
 # Recording settings
 DEFAULT_RECORDING_DURATION = 30  # seconds
\ No newline at end of file
@@ -0,0 +1,115 @@
+"""Adaptive decode settings: give up accuracy for speed while the transcriber falls behind."""
+
+import time
+from config import (
+    ADAPTIVE_BACKLOG_HIGH, ADAPTIVE_BACKLOG_LOW, ADAPTIVE_RTF_HIGH, ADAPTIVE_RTF_LOW, ADAPTIVE_HOLD_SECONDS,
+    FALLBACK_MODELS,
+)
+
+
+class DecodeTier:
+    def __init__(self, name, beam_size, whisper_vad, fallback_model):
+        self.name = name
+        self.beam_size = beam_size
+        self.whisper_vad = whisper_vad  # faster-whisper's own VAD pass, run on every decode
+        self.fallback_model = fallback_model
+
+
+# Cheapest last; each step keeps the savings of the ones before it
+TIERS = (
+    DecodeTier("full", beam_size=5, whisper_vad=True, fallback_model=False),
+    DecodeTier("greedy", beam_size=1, whisper_vad=True, fallback_model=False),
+    DecodeTier("no_vad_filter", beam_size=1, whisper_vad=False, fallback_model=False),
+    DecodeTier("smaller_model", beam_size=1, whisper_vad=False, fallback_model=True),
+)
+
+
+def fallback_model(model_size):
+    """Return the next smaller model size, or None if there is none."""
+    return FALLBACK_MODELS.get(model_size)
+
+
+class DecodeController:
+    def __init__(self, max_tier=len(TIERS) - 1, backlog_high=ADAPTIVE_BACKLOG_HIGH, backlog_low=ADAPTIVE_BACKLOG_LOW,
+                 rtf_high=ADAPTIVE_RTF_HIGH, rtf_low=ADAPTIVE_RTF_LOW, hold_seconds=ADAPTIVE_HOLD_SECONDS,
+                 clock=time.monotonic):
+        """Pick a decode tier from the audio backlog and the measured real-time factor.
+
+        The controller steps one tier cheaper when decoding runs slower than
+        ``rtf_high`` times real time. It also steps down when the backlog is
+        over ``backlog_high`` seconds and not shrinking. Each step waits for
+        at least one decode at the current tier. It steps one tier back up
+        after the backlog has stayed under ``backlog_low`` for
+        ``hold_seconds``, provided the tier above was last measured under
+        ``rtf_low``. RTF is tracked per tier. A tier that was too slow is
+        retried once things have been calm for four hold periods, since
+        load may have dropped since it was measured.
+
+        Args:
+            max_tier: Cheapest tier allowed; lower it when the model can't be swapped
+            backlog_high: Seconds of undecoded audio that trigger a step down
+            backlog_low: Backlog under which stepping up is considered
+            rtf_high: Decode time over audio time that triggers a step down
+            rtf_low: RTF the tier above must have shown before stepping back up
+            hold_seconds: Calm time before a step up, and minimum time between step ups
+        """
+        self.max_tier = max_tier
+        self.backlog_high = backlog_high
+        self.backlog_low = backlog_low
+        self.rtf_high = rtf_high
+        self.rtf_low = rtf_low
+        self.hold_seconds = hold_seconds
+        self._clock = clock
+        self.tier = 0
+        self.changes = 0
+        self.rtf = [None] * len(TIERS)
+        self._changed_at = clock()
+        self._backlog_at_change = 0.0
+        self._decodes_since_change = 0
+        self._calm_since = None
+
+    @property
+    def current(self):
+        return TIERS[self.tier]
+
+    def record_decode(self, audio_seconds, decode_seconds):
+        """Fold one decode's real-time factor into the current tier's running average."""
+        if audio_seconds <= 0:
+            return
+        rtf = decode_seconds / audio_seconds
+        previous = self.rtf[self.tier]
+        self.rtf[self.tier] = rtf if previous is None else 0.8 * previous + 0.2 * rtf
+        self._decodes_since_change += 1
+
+    def update(self, backlog_seconds):
+        """Re-evaluate with the current backlog; returns the tier to decode with next."""
+        now = self._clock()
+        rtf = self.rtf[self.tier]
+        too_slow = rtf is not None and rtf > self.rtf_high
+        falling_behind = backlog_seconds > self.backlog_high and backlog_seconds >= self._backlog_at_change
+        if too_slow or falling_behind:
+            self._calm_since = None
+            if self.tier < self.max_tier and self._decodes_since_change:
+                self._set(self.tier + 1, now, backlog_seconds)
+            return self.current
+
+        if backlog_seconds >= self.backlog_low:
+            self._calm_since = None
+            return self.current
+        if self._calm_since is None:
+            self._calm_since = now
+        calm = now - self._calm_since
+        above = self.rtf[self.tier - 1] if self.tier else None
+        fast_enough = above is None or above < self.rtf_low or calm >= 4 * self.hold_seconds
+        if self.tier > 0 and calm >= self.hold_seconds and now - self._changed_at >= self.hold_seconds and fast_enough:
+            self._set(self.tier - 1, now, backlog_seconds)
+            if above is not None and above >= self.rtf_low:
+                self.rtf[self.tier] = None  # stale; measure it afresh
+        return self.current
+
+    def _set(self, tier, now, backlog_seconds):
+        self.tier = tier
+        self.changes += 1
+        self._changed_at = now
+        self._backlog_at_change = backlog_seconds
+        self._decodes_since_change = 0
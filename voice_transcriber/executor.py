@@ -0,0 +1,155 @@
+"""Pluggable decode backends for RealtimeTranscriber: in-thread or a pool of worker processes."""
+
+import atexit
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+from multiprocessing import shared_memory
+import numpy as np
+from config import MODEL_SIZE, SAMPLE_RATE, MAX_WINDOW_SECONDS, PROCESS_POOL_WORKERS, THREADS_PER_WORKER
+from model_pool import get_registry, warm_up, DecodedSegment, DecodedWord
+
+# State owned by each worker process, set up once by _init_worker.
+_worker_model = None
+_worker_segments = {}
+# Shared memory blocks a worker keeps mapped; blocks of finished sessions are unlinked by their owner
+_MAX_ATTACHED = 4
+
+
+def _init_worker(model_size, compute_type, threads_per_worker):
+    global _worker_model
+    # NumPy's BLAS pool was sized when this module was unpickled, so it is resized in place;
+    # the environment still reaches the OpenMP runtime CTranslate2 loads with faster_whisper.
+    from threadpoolctl import threadpool_limits
+    threadpool_limits(threads_per_worker)
+    for var in ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS"):
+        os.environ[var] = str(threads_per_worker)
+    from faster_whisper import WhisperModel
+    _worker_model = WhisperModel(
+        model_size, device="cpu", compute_type=compute_type,
+        cpu_threads=threads_per_worker, num_workers=1
+    )
+    warm_up(_worker_model)
+
+
+def _attach(name):
+    segment = _worker_segments.get(name)
+    if segment is None:
+        try:
+            segment = shared_memory.SharedMemory(name=name, track=False)
+        except TypeError:
+            # Python < 3.13: keep the worker's resource tracker from unlinking the caller's block.
+            from multiprocessing import resource_tracker
+            segment = shared_memory.SharedMemory(name=name)
+            resource_tracker.unregister(segment._name, "shared_memory")
+        # Drop the oldest mapping so blocks of finished sessions don't stay mapped
+        if len(_worker_segments) >= _MAX_ATTACHED:
+            _worker_segments.pop(next(iter(_worker_segments))).close()
+        _worker_segments[name] = segment
+    return segment
+
+
+def _decode_in_worker(shm_name, num_samples, options):
+    segment = _attach(shm_name)
+    audio = np.ndarray((num_samples,), dtype=np.float32, buffer=segment.buf)
+    segments, _ = _worker_model.transcribe(audio, **options)
+    # Plain tuples pickle cheaply; the caller rebuilds segment objects.
+    return [
+        (s.start, s.end, s.text, [(w.start, w.end, w.word, w.probability) for w in s.words] if s.words else None)
+        for s in segments
+    ]
+
+
+class ThreadBackend:
+    def __init__(self, model_size=MODEL_SIZE, compute_type="int8"):
+        """Decode on the calling thread with a model shared through the registry."""
+        self.model_size = model_size
+        self.compute_type = compute_type
+        self.model = get_registry().acquire(model_size, compute_type)
+
+    def transcribe(self, audio, **options):
+        segments, _ = self.model.transcribe(audio, **options)
+        return list(segments)
+
+    def close(self):
+        if self.model is not None:
+            get_registry().release(self.model_size, self.compute_type)
+            self.model = None
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_process_pool(model_size=MODEL_SIZE, compute_type="int8",
+                     num_workers=PROCESS_POOL_WORKERS, threads_per_worker=THREADS_PER_WORKER):
+    """Return the process-wide worker pool for a model, starting it on first use."""
+    key = (model_size, compute_type)
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            print(f"Starting {num_workers} transcription workers ({threads_per_worker} threads each)")
+            pool = ProcessPoolExecutor(
+                max_workers=num_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(model_size, compute_type, threads_per_worker),
+            )
+            _pools[key] = pool
+        return pool
+
+
+def _shutdown_pools():
+    with _pools_lock:
+        for pool in _pools.values():
+            pool.shutdown(wait=False, cancel_futures=True)
+        _pools.clear()
+
+
+atexit.register(_shutdown_pools)
+
+
+class ProcessPoolBackend:
+    def __init__(self, model_size=MODEL_SIZE, compute_type="int8", max_window_seconds=MAX_WINDOW_SECONDS,
+                 sample_rate=SAMPLE_RATE):
+        """Decode in a pool of worker processes, each holding one loaded model.
+
+        Each backend owns one shared memory block sized for the largest decode
+        window. Audio is copied into it once and workers read it in place, so
+        only the block name and options cross the process boundary.
+        """
+        self.pool = get_process_pool(model_size, compute_type)
+        self.capacity = int(max_window_seconds * sample_rate)
+        self.shm = shared_memory.SharedMemory(create=True, size=self.capacity * np.dtype(np.float32).itemsize)
+        self.shared_audio = np.ndarray((self.capacity,), dtype=np.float32, buffer=self.shm.buf)
+        self._lock = threading.Lock()
+
+    def transcribe(self, audio, **options):
+        # One in-flight window per backend: the shared block is reused for every call.
+        with self._lock:
+            audio = audio[-self.capacity:]
+            self.shared_audio[:len(audio)] = audio
+            result = self.pool.submit(_decode_in_worker, self.shm.name, len(audio), options).result()
+        return [
+            DecodedSegment(start, end, text, [DecodedWord(*w) for w in words] if words else None)
+            for start, end, text, words in result
+        ]
+
+    def close(self):
+        # Taking the lock waits for a decode still reading the block before it is unlinked
+        with self._lock:
+            if self.shm is not None:
+                self.shared_audio = None
+                self.shm.close()
+                self.shm.unlink()
+                self.shm = None
+
+
+def create_backend(kind, model_size=MODEL_SIZE, compute_type="int8"):
+    """Build a decode backend by name: "thread" or "process"."""
+    if kind == "thread":
+        return ThreadBackend(model_size, compute_type)
+    if kind == "process":
+        return ProcessPoolBackend(model_size, compute_type)
+    raise ValueError(f"Unknown transcriber backend: {kind}")
@@ -0,0 +1,149 @@
+"""Bounded hand-off queues with an explicit policy for what happens when a stage falls behind."""
+
+import queue
+import threading
+import time
+from collections import deque
+from metrics import get_metrics
+
+QUEUE_POLICIES = ("block", "drop_oldest", "coalesce")
+
+
+class BoundedQueue:
+    def __init__(self, capacity, policy="block", name="queue", cost=None, merge=None, block_timeout=None,
+                 high_watermark=0.8, low_watermark=0.5):
+        """Queue with a capacity and a policy for overload.
+
+        ``cost(item)`` weighs each item, 1 by default, and ``capacity`` is
+        measured in those units. An audio queue weighs its chunks in samples,
+        so its capacity is a length of audio. Policies:
+
+        - "block": when full, ``put`` waits for room, so the producer slows
+          down. After ``block_timeout`` seconds the new item is dropped
+          instead, so the producer is never stuck forever.
+        - "drop_oldest": when full, the oldest items are discarded to make
+          room, keeping latency bounded at the cost of old data.
+        - "coalesce": on every put, ``merge(newest_queued, item)`` folds the
+          new item into the newest queued one, e.g. a newer partial
+          transcript replacing an unread one. If merge returns None, or the
+          merged item would not fit, the item is queued on its own and the
+          oldest items are dropped as in "drop_oldest".
+
+        ``congested`` is set once the fill passes ``high_watermark`` and
+        cleared below ``low_watermark``, so producers can back off before
+        anything is dropped. Drops and blocked puts are counted on the queue
+        and in the pipeline metrics.
+
+        ``get``, ``get_nowait``, ``empty`` and ``qsize`` behave like
+        queue.Queue's, raising queue.Empty when nothing arrives in time.
+        """
+        if policy not in QUEUE_POLICIES:
+            raise ValueError(f"Unknown queue policy {policy!r}, expected one of {QUEUE_POLICIES}")
+        if policy == "coalesce" and merge is None:
+            raise ValueError("The coalesce policy needs a merge function")
+        self.capacity = capacity
+        self.policy = policy
+        self.name = name
+        self.block_timeout = block_timeout
+        self.high_watermark = high_watermark
+        self.low_watermark = low_watermark
+        self._cost = cost or (lambda item: 1)
+        self._merge = merge
+        self._items = deque()
+        self._level = 0
+        self._lock = threading.Lock()
+        self._not_empty = threading.Condition(self._lock)
+        self._not_full = threading.Condition(self._lock)
+        self.congested = threading.Event()
+        self.dropped = 0
+        self.dropped_cost = 0
+        self.blocked = 0
+        metrics = get_metrics()
+        self._dropped_metric = metrics.counter("pipeline_queue_dropped_total", "Items shed by a full queue",
+                                               queue=name, policy=policy)
+        self._blocked_metric = metrics.counter("pipeline_queue_blocked_total",
+                                               "Puts that waited on a full queue (backpressure)", queue=name)
+
+    def put(self, item, timeout=None):
+        """Add ``item`` under the queue's policy; returns False if it was dropped rather than queued."""
+        cost = self._cost(item)
+        with self._lock:
+            if self.policy == "coalesce" and self._items:
+                merged = self._merge(self._items[-1], item)
+                if merged is not None:
+                    merged_cost = self._cost(merged)
+                    if self._level - self._cost(self._items[-1]) + merged_cost <= self.capacity:
+                        self._level -= self._cost(self._items.pop())
+                        item, cost = merged, merged_cost
+            if self._level + cost > self.capacity and self._items:
+                if self.policy == "block":
+                    if not self._wait_for_room(cost, self.block_timeout if timeout is None else timeout):
+                        self._count_drop(cost)
+                        return False
+                else:
+                    self._drop_oldest(cost)
+            self._items.append(item)
+            self._level += cost
+            if self._level >= self.high_watermark * self.capacity:
+                self.congested.set()
+            self._not_empty.notify()
+            return True
+
+    def get(self, block=True, timeout=None):
+        with self._not_empty:
+            if not block:
+                if not self._items:
+                    raise queue.Empty
+            elif timeout is None:
+                while not self._items:
+                    self._not_empty.wait()
+            else:
+                deadline = time.monotonic() + timeout
+                while not self._items:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise queue.Empty
+                    self._not_empty.wait(remaining)
+            item = self._items.popleft()
+            self._level -= self._cost(item)
+            if self._level <= self.low_watermark * self.capacity:
+                self.congested.clear()
+            self._not_full.notify()
+            return item
+
+    def get_nowait(self):
+        return self.get(block=False)
+
+    def empty(self):
+        return not self._items
+
+    def qsize(self):
+        return len(self._items)
+
+    @property
+    def level(self):
+        """Queued cost, e.g. samples for an audio queue."""
+        return self._level
+
+    def _wait_for_room(self, cost, timeout):
+        self.blocked += 1
+        self._blocked_metric.inc()
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self._level + cost > self.capacity and self._items:
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                return False
+            self._not_full.wait(remaining)
+        return True
+
+    def _drop_oldest(self, cost):
+        while self._items and self._level + cost > self.capacity:
+            oldest = self._items.popleft()
+            oldest_cost = self._cost(oldest)
+            self._level -= oldest_cost
+            self._count_drop(oldest_cost)
+
+    def _count_drop(self, cost):
+        self.dropped += 1
+        self.dropped_cost += cost
+        self._dropped_metric.inc()
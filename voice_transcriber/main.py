@@ -1,65 +1,181 @@
 import streamlit as st
 import threading
 import time
+from collections import deque
 import numpy as np
 from mic_capture import MicrophoneCapture
 from transcriber import RealtimeTranscriber
-import queue
+from streaming import TranscriptEvent
+from model_pool import ModelPreloader
+from transcript_bus import TranscriptBus
+from metrics import get_metrics
+from decode_policy import TIERS
+
+# Finals per transcript page; only the newest page is redrawn as text arrives
+PAGE_LINES = 50
 
 if "recording" not in st.session_state:
     st.session_state.recording = False
-if "full_transcript" not in st.session_state:
-    st.session_state.full_transcript = ""
-if "stop_signal_queue" not in st.session_state:
-    st.session_state.stop_signal_queue = queue.Queue()
-if "text_update_queue" not in st.session_state:
-    st.session_state.text_update_queue = queue.Queue()
-
-def start_recording(device_index, model_size, stop_signal_queue, text_update_queue):
+if "final_lines" not in st.session_state:
+    # Finals of the page being written; finished pages are joined once into final_pages
+    st.session_state.final_lines = []
+if "final_pages" not in st.session_state:
+    st.session_state.final_pages = []
+if "partial_transcript" not in st.session_state:
+    st.session_state.partial_transcript = ""
+if "stop_event" not in st.session_state:
+    st.session_state.stop_event = threading.Event()
+if "subscription" not in st.session_state:
+    st.session_state.subscription = None
+if "screen_latencies" not in st.session_state:
+    # (audio arrival -> on screen, published -> on screen) per final, in seconds
+    st.session_state.screen_latencies = deque(maxlen=500)
+
+def add_final_line(text):
+    st.session_state.final_lines.append(text)
+    if len(st.session_state.final_lines) >= PAGE_LINES:
+        st.session_state.final_pages.append(" ".join(st.session_state.final_lines))
+        st.session_state.final_lines = []
+
+@st.cache_resource
+def preload_model(model_size):
+    # Loaded once per server process and kept warm; recording sessions reuse it through the registry.
+    return ModelPreloader(model_size)
+
+def start_recording(device_index, model_size, stop_event, bus, streaming=False):
     mic = None
     transcriber = None
+    dropped_chunks = 0
     try:
         mic = MicrophoneCapture(device=device_index, chunk_size=1024)
         mic.start_stream()
         actual_sample_rate = mic.get_sample_rate()
         transcriber = RealtimeTranscriber(
             model_size=model_size,
-            sample_rate=actual_sample_rate
+            sample_rate=actual_sample_rate,
+            streaming=streaming,
+            bus=bus
         )
         transcriber.start()
 
-        recording_active = True
-        while recording_active:
-            try:
-                if not stop_signal_queue.empty():
-                    stop_signal_queue.get(block=False)
-                    recording_active = False
-                    continue
-            except queue.Empty:
-                pass
-
+        # get_audio_chunk blocks until a chunk is ready; results reach the UI through the bus
+        while not stop_event.is_set():
+            if transcriber.congested:
+                # Leave the audio in the mic's ring buffer while the decoder catches up; once
+                # that is full the ring drops new audio and reports it as dropped samples
+                stop_event.wait(0.05)
+                continue
             audio_chunk = mic.get_audio_chunk(timeout=0.1)
-            if audio_chunk is not None and np.abs(audio_chunk).mean() > 10:
-                transcriber.add_audio(audio_chunk)
-
-            text = transcriber.get_transcription()
-            if text:
-                text_update_queue.put(text)
-
-            time.sleep(0.05)
+            if audio_chunk is not None and not transcriber.add_audio(audio_chunk):
+                dropped_chunks += 1
 
     except Exception as e:
-        text_update_queue.put(f"Error: {e}")
+        bus.publish(f"Error: {e}")
     finally:
         if mic:
             mic.close()
         if transcriber:
+            # Flushes the last segment to the bus
             transcriber.stop()
-        text_update_queue.put(None)
+            vad_stats = transcriber.get_vad_stats()
+            if vad_stats:
+                print(f"VAD passed {vad_stats['speech_ratio']:.0%} of {vad_stats['total_seconds']:.1f}s to Whisper")
+            if dropped_chunks:
+                print(f"Transcriber queue was full for {dropped_chunks} microphone chunks; they were not transcribed")
+        bus.close()
+
+@st.fragment(run_every=0.1)
+def live_transcript():
+    """Render the transcript, polling the bus ten times a second by rerunning only this fragment.
+
+    Streamlit can't push to the page from another thread, so the fragment
+    timer sets the refresh rate. Reading the bus never waits, so a rerun
+    costs only the rendering.
+    """
+    subscription = st.session_state.subscription
+    if subscription is not None:
+        for published_at, item in subscription.get(timeout=0):
+            if isinstance(item, TranscriptEvent):
+                if item.is_final:
+                    add_final_line(item.text)
+                    st.session_state.partial_transcript = ""
+                    if item.arrival is not None:
+                        now = time.monotonic()
+                        st.session_state.screen_latencies.append((now - item.arrival, now - published_at))
+                else:
+                    st.session_state.partial_transcript = item.text
+            else:
+                add_final_line(item)
+        if subscription.finished:
+            st.session_state.subscription = None
+            if st.session_state.recording:
+                st.session_state.recording = False
+                st.rerun(scope="app")
+
+    pages = st.session_state.final_pages
+    if pages:
+        with st.expander(f"Earlier transcript ({len(pages) * PAGE_LINES} lines)"):
+            page = st.number_input("Page", min_value=1, max_value=len(pages), value=len(pages), key="transcript_page")
+            st.markdown(pages[int(page) - 1])
+
+    with st.container(height=300, border=True):
+        st.markdown(" ".join(st.session_state.final_lines))
+        if st.session_state.partial_transcript:
+            st.markdown(f"*{st.session_state.partial_transcript}*")
+
+    if st.session_state.screen_latencies:
+        latencies = np.array(st.session_state.screen_latencies) * 1000
+        end_to_end = np.percentile(latencies[:, 0], [50, 95])
+        delivery = np.percentile(latencies[:, 1], [50, 95])
+        st.caption(
+            f"Audio to screen p50 {end_to_end[0]:.0f} ms / p95 {end_to_end[1]:.0f} ms "
+            f"(bus to screen p50 {delivery[0]:.0f} ms / p95 {delivery[1]:.0f} ms)"
+        )
+
+@st.fragment(run_every=1)
+def diagnostics_panel():
+    """Summarize the pipeline metrics; reruns on its own so it never redraws the transcript."""
+    by_name = {}
+    for (name, labels), value in get_metrics().snapshot().items():
+        by_name.setdefault(name, []).append((dict(labels), value))
+
+    def total(name, **match):
+        return sum(value for labels, value in by_name.get(name, [])
+                   if all(labels.get(k) == v for k, v in match.items()))
+
+    depths = {}
+    for labels, value in by_name.get("pipeline_queue_depth", []):
+        depths[labels["queue"]] = depths.get(labels["queue"], 0) + value
+    st.caption("Queue depth: " + (", ".join(f"{q} {d}" for q, d in sorted(depths.items())) or "idle"))
+    st.caption(f"Overflows {total('pipeline_input_overflows_total')} · "
+               f"dropped samples {total('pipeline_dropped_samples_total')} · "
+               f"dropped messages {total('pipeline_phone_messages_total', state='dropped')}")
+
+    tiers = [TIERS[int(tier)].name for _, tier in by_name.get("pipeline_decode_tier", [])]
+    if tiers:
+        st.caption("Decode tier: " + ", ".join(tiers))
+    for labels, histogram in by_name.get("pipeline_decode_rtf", []):
+        if histogram.count:
+            st.caption(f"Decode RTF p50 {histogram.quantile(0.5):.2f} / p95 {histogram.quantile(0.95):.2f} "
+                       f"over {histogram.count} decodes")
+    for labels, histogram in by_name.get("pipeline_latency_seconds", []):
+        if histogram.count:
+            st.caption(f"{labels['kind'].replace('_', ' ').capitalize()} latency p50 "
+                       f"{1000 * histogram.quantile(0.5):.0f} ms / p95 {1000 * histogram.quantile(0.95):.0f} ms")
+    for labels, seconds in by_name.get("pipeline_model_load_seconds", []):
+        st.caption(f"Model {labels['model']} loaded in {seconds:.2f}s")
+    st.caption(f"Sessions {total('pipeline_sessions_total')} · calls {total('pipeline_calls_total')} · "
+               f"audio {total('pipeline_audio_seconds_total'):.0f}s")
+    with st.expander("Prometheus metrics"):
+        st.code(get_metrics().render(), language="text")
 
 def main():
     st.title("Real-Time Voice Transcription")
 
+    with st.sidebar:
+        st.subheader("Diagnostics")
+        diagnostics_panel()
+
     model_size = st.selectbox(
         "Select model size",
         options=["tiny", "base", "small"],
@@ -67,6 +183,21 @@ def main():
         key="model_select"
     )
 
+    preloader = preload_model(model_size)
+    if not preloader.ready.is_set():
+        st.caption(f"Loading {model_size} model in the background... recording can start now.")
+    elif preloader.error:
+        st.caption(f"Model preload failed: {preloader.error}")
+    else:
+        st.caption(f"Model ready ({preloader.report()})")
+
+    streaming = st.checkbox(
+        "Streaming mode (partial + final results)",
+        value=False,
+        key="streaming_toggle",
+        disabled=st.session_state.recording
+    )
+
     try:
         mic_lister = MicrophoneCapture()
         device_list = mic_lister.get_device_list()
@@ -93,62 +224,40 @@ def main():
 
     if col1.button("Start Recording", key="start_button", disabled=st.session_state.recording):
         st.session_state.recording = True
-        st.session_state.full_transcript = ""
+        st.session_state.final_lines = []
+        st.session_state.final_pages = []
+        st.session_state.partial_transcript = ""
 
-        while not st.session_state.stop_signal_queue.empty():
-            st.session_state.stop_signal_queue.get()
-        while not st.session_state.text_update_queue.empty():
-            st.session_state.text_update_queue.get()
+        # A fresh bus and stop event per recording, so a previous session still shutting down can't leak into this one
+        st.session_state.stop_event = threading.Event()
+        bus = TranscriptBus()
+        st.session_state.subscription = bus.subscribe()
 
         threading.Thread(
             target=start_recording,
             args=(
                 device_index,
                 model_size,
-                st.session_state.stop_signal_queue,
-                st.session_state.text_update_queue,
+                st.session_state.stop_event,
+                bus,
+                streaming,
             ),
             daemon=True
         ).start()
         st.rerun()
 
     if col2.button("Stop Recording", key="stop_button", disabled=not st.session_state.recording):
-        st.session_state.stop_signal_queue.put(True)
+        st.session_state.stop_event.set()
         st.session_state.recording = False
-        time.sleep(0.5)
         st.rerun()
 
-    new_text_received = False
-    while not st.session_state.text_update_queue.empty():
-        try:
-            text_item = st.session_state.text_update_queue.get(block=False)
-            if text_item is None:
-                if st.session_state.recording:
-                     st.session_state.recording = False
-                continue
-
-            if isinstance(text_item, str):
-                st.session_state.full_transcript += text_item + " "
-                new_text_received = True
-
-        except queue.Empty:
-            break
-
     if st.session_state.recording:
         st.markdown("🔴 **Recording in progress...**")
-    elif not st.session_state.recording and st.session_state.full_transcript:
+    elif not st.session_state.recording and (st.session_state.final_lines or st.session_state.final_pages):
          st.markdown("⚪ **Recording stopped.**")
 
-    st.text_area(
-        "Transcription",
-        value=st.session_state.full_transcript,
-        height=300,
-        key="transcript_area"
-    )
-
-    if st.session_state.recording:
-        time.sleep(0.2)
-        st.rerun()
+    st.markdown("**Transcription**")
+    live_transcript()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
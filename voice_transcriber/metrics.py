@@ -0,0 +1,194 @@
+"""Process-wide pipeline metrics with Prometheus text export.
+
+Every stage records into the registry returned by ``get_metrics()``.
+Counters, gauges and histograms are updated in place under a per-metric
+lock, so recording costs under a microsecond. Values that already
+live on an object, such as queue sizes or the microphone's overflow count,
+are registered as sampled metrics instead. These are read only when the
+metrics are exported, so the hot path pays nothing for them.
+"""
+
+import threading
+from bisect import bisect_left
+
+# Seconds; covers audio-to-text latency from a fast partial to a slow final
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 0.75, 1.0, 1.5, 2.0, 3.0, 5.0, 10.0)
+# Decode time over audio time; above 1.0 the decoder is falling behind
+RTF_BUCKETS = (0.05, 0.1, 0.2, 0.3, 0.5, 0.75, 1.0, 1.5, 2.0, 4.0)
+
+
+def _label_key(labels):
+    return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+
+def _format_labels(key, extra=()):
+    pairs = list(key) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{value}"' for name, value in pairs) + "}"
+
+
+class Counter:
+    __slots__ = ("value", "_lock")
+
+    def __init__(self):
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+
+class Gauge:
+    __slots__ = ("value", "_lock")
+
+    def __init__(self):
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def set(self, value):
+        self.value = value
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+    def dec(self, amount=1):
+        self.inc(-amount)
+
+
+class Histogram:
+    __slots__ = ("buckets", "counts", "sum", "count", "_lock")
+
+    def __init__(self, buckets):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # the last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        i = bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[i] += 1
+            self.sum += value
+            self.count += 1
+
+    def quantile(self, q):
+        """Estimate the ``q`` quantile by interpolating within its bucket, as Prometheus does."""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for i, count in enumerate(self.counts):
+            if count and seen + count >= rank:
+                if i == len(self.buckets):
+                    return self.buckets[-1]  # beyond the last bound; report the bound
+                lower = self.buckets[i - 1] if i else 0.0
+                return lower + (self.buckets[i] - lower) * (rank - seen) / count
+            seen += count
+        return self.buckets[-1]
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._types = {}
+        self._help = {}
+        self._metrics = {}
+        self._sampled = {}
+
+    def counter(self, name, help="", **labels):
+        """Return the counter for ``name`` and ``labels``, creating it on first use."""
+        return self._get(name, "counter", help, labels, Counter)
+
+    def gauge(self, name, help="", **labels):
+        return self._get(name, "gauge", help, labels, Gauge)
+
+    def histogram(self, name, help="", buckets=LATENCY_BUCKETS, **labels):
+        return self._get(name, "histogram", help, labels, lambda: Histogram(buckets))
+
+    def sampled(self, name, read, kind="gauge", help="", **labels):
+        """Export ``read()`` as ``name``, called only when the metrics are rendered.
+
+        Returns a key for ``remove``; owners unregister when they shut down so
+        the registry doesn't keep them alive.
+        """
+        key = (name, _label_key(labels))
+        with self._lock:
+            self._declare(name, kind, help)
+            self._sampled[key] = read
+        return key
+
+    def remove(self, key):
+        with self._lock:
+            self._sampled.pop(key, None)
+
+    def snapshot(self):
+        """Return ``{(name, labels): value}``, with histograms as the Histogram itself."""
+        with self._lock:
+            metrics = dict(self._metrics)
+            sampled = dict(self._sampled)
+        values = {}
+        for (name, labels), metric in metrics.items():
+            values[(name, labels)] = metric if isinstance(metric, Histogram) else metric.value
+        for key, read in sampled.items():
+            try:
+                values[key] = read()
+            except Exception:
+                continue  # the owner is shutting down; skip it this time
+        return values
+
+    def render(self):
+        """Return every metric in the Prometheus text exposition format."""
+        by_name = {}
+        for (name, labels), value in sorted(self.snapshot().items(), key=lambda item: item[0]):
+            by_name.setdefault(name, []).append((labels, value))
+
+        lines = []
+        for name, samples in by_name.items():
+            if self._help.get(name):
+                lines.append(f"# HELP {name} {self._help[name]}")
+            lines.append(f"# TYPE {name} {self._types[name]}")
+            for labels, value in samples:
+                if isinstance(value, Histogram):
+                    lines += self._render_histogram(name, labels, value)
+                else:
+                    lines.append(f"{name}{_format_labels(labels)} {value}")
+        return "\n".join(lines) + "\n" if lines else ""
+
+    @staticmethod
+    def _render_histogram(name, labels, histogram):
+        lines = []
+        cumulative = 0
+        for bound, count in zip(histogram.buckets + ("+Inf",), histogram.counts):
+            cumulative += count
+            lines.append(f"{name}_bucket{_format_labels(labels, [('le', bound)])} {cumulative}")
+        lines.append(f"{name}_sum{_format_labels(labels)} {histogram.sum:.6f}")
+        lines.append(f"{name}_count{_format_labels(labels)} {histogram.count}")
+        return lines
+
+    def _get(self, name, kind, help, labels, factory):
+        key = (name, _label_key(labels))
+        metric = self._metrics.get(key)
+        if metric is not None:
+            return metric
+        with self._lock:
+            self._declare(name, kind, help)
+            return self._metrics.setdefault(key, factory())
+
+    def _declare(self, name, kind, help):
+        declared = self._types.setdefault(name, kind)
+        if declared != kind:
+            raise ValueError(f"Metric {name} is a {declared}, not a {kind}")
+        if help:
+            self._help.setdefault(name, help)
+
+
+_metrics = MetricsRegistry()
+
+
+def get_metrics():
+    """Return the process-wide metrics registry."""
+    return _metrics
@@ -1,8 +1,10 @@
 import sounddevice as sd
 import numpy as np
-import queue
 import threading
 import time
+from config import MIC_RING_SECONDS, LEVEL_HISTORY_BLOCKS
+from ring_buffer import SPSCRingBuffer
+from metrics import get_metrics
 
 class MicrophoneCapture:
     def __init__(self, device=None, sample_rate=16000, chunk_size=1024):
@@ -10,13 +12,23 @@ class MicrophoneCapture:
         self.sample_rate = sample_rate
         self.chunk_size = chunk_size
         self.stream = None
-        self.audio_queue = queue.Queue(maxsize=20)
+        self.ring = SPSCRingBuffer(int(MIC_RING_SECONDS * sample_rate))
         self.running = False
         self._lock = threading.Lock()
         self.overflow_count = 0
         self.last_overflow_report = 0
+        self._reported_overflows = 0
         self.gain_factor = 1.0
-        self.level_history = []
+        # Running block-level statistics, updated by the audio callback in O(1)
+        self._levels = np.zeros(LEVEL_HISTORY_BLOCKS, dtype=np.float64)
+        self._level_index = 0
+        self._level_count = 0
+        self._level_sum = 0.0
+        self.last_level = 0.0
+        self._scratch = np.zeros(chunk_size, dtype=np.float32)
+        self._sampled_metrics = []
+        self._underruns = get_metrics().counter("pipeline_input_underruns_total",
+                                                "Reads that timed out with no audio from the device", source="mic")
 
     def get_device_list(self):
         device_list = []
@@ -53,6 +65,7 @@ class MicrophoneCapture:
         with self._lock:
             if self.stream is not None:
                 return
+            self.ring = SPSCRingBuffer(int(MIC_RING_SECONDS * self.sample_rate))
             try:
                 self.stream = sd.InputStream(
                     device=self.device,
@@ -65,6 +78,7 @@ class MicrophoneCapture:
                 )
                 self.running = True
                 self.stream.start()
+                self._register_metrics()
                 print(f"Audio stream started (device={self.device}, chunk_size={self.chunk_size})")
                 return self.stream
             except Exception as e:
@@ -75,6 +89,7 @@ class MicrophoneCapture:
         print("Trying default device...")
         self.device = None
         self.sample_rate = self.find_supported_rate(None)
+        self.ring = SPSCRingBuffer(int(MIC_RING_SECONDS * self.sample_rate))
         self.stream = sd.InputStream(
             channels=1,
             samplerate=self.sample_rate,
@@ -85,58 +100,98 @@ class MicrophoneCapture:
         )
         self.running = True
         self.stream.start()
+        self._register_metrics()
         print("Fallback stream started with default device")
         return self.stream
 
+    def _register_metrics(self):
+        # Read from the existing counters at export time; the audio callback itself records nothing
+        metrics = get_metrics()
+        self._sampled_metrics = [
+            metrics.sampled("pipeline_input_overflows_total", lambda: self.overflow_count, kind="counter",
+                            help="Input overflows reported by the audio device", source="mic"),
+            metrics.sampled("pipeline_dropped_samples_total", lambda: self.ring.overruns, kind="counter",
+                            help="Samples dropped because a buffer was full", source="mic"),
+            metrics.sampled("pipeline_queue_depth", self.ring.available, help="Items waiting between pipeline stages",
+                            queue="mic_ring", session="mic"),
+        ]
+        metrics.counter("pipeline_calls_total", "Calls or recordings started", source="mic").inc()
+
     def _audio_callback(self, indata, frames, time_info, status):
+        # Runs on the PortAudio real-time thread: no locks, no sample allocations, no I/O.
         if status and status.input_overflow:
-            current_time = time.time()
             self.overflow_count += 1
-            if current_time - self.last_overflow_report > 5:
-                print(f"Audio input overflow occurred {self.overflow_count} times in the last 5 seconds")
-                self.overflow_count = 0
-                self.last_overflow_report = current_time
-                if self.chunk_size > 512:
-                    self.chunk_size //= 2
-                    print(f"Reducing chunk size to {self.chunk_size}")
-        
-        audio_data = np.squeeze(indata.copy())
-        audio_level = np.abs(audio_data).mean()
-        
-        self.level_history.append(audio_level)
-        if len(self.level_history) > 50:
-            self.level_history.pop(0)
-        
-        avg_level = np.mean(self.level_history)
-        
+
+        block = indata[:, 0]
+        if frames > len(self._scratch):
+            self._scratch = np.zeros(frames, dtype=np.float32)
+        scratch = self._scratch[:frames]
+        np.abs(block, out=scratch, dtype=np.float32)
+        level = float(scratch.mean())
+
+        i = self._level_index
+        self._level_sum += level - self._levels[i]
+        self._levels[i] = level
+        self._level_index = (i + 1) % len(self._levels)
+        self._level_count = min(self._level_count + 1, len(self._levels))
+        self.last_level = level
+
+        self.ring.write(block)
+
+    def average_level(self):
+        """Mean absolute level over the last LEVEL_HISTORY_BLOCKS callback blocks."""
+        if self._level_count == 0:
+            return 0.0
+        return self._level_sum / self._level_count
+
+    def _apply_gain(self, audio_data):
+        avg_level = self.average_level()
+
         target_gain = 1.0
         if avg_level > 0 and avg_level < 100:
             target_gain = min(10, 150 / (avg_level + 1e-6))
-            
+
             if abs(target_gain - self.gain_factor) > 0.5:
                 print(f"Adjusting gain: level={avg_level:.2f}, gain={target_gain:.1f}x")
-            
+
             self.gain_factor = self.gain_factor * 0.95 + target_gain * 0.05
-            audio_data = np.clip(audio_data * self.gain_factor, -32767, 32767).astype(np.int16)
-        
-        if audio_level > 100 and time.time() % 2 < 0.1:
-            print(f"Audio level: {audio_level:.1f}")
-        
-        try:
-            if not self.audio_queue.full():
-                self.audio_queue.put_nowait(audio_data)
-        except queue.Full:
-            try:
-                self.audio_queue.get_nowait()
-                self.audio_queue.put_nowait(audio_data)
-            except:
-                pass
+            scaled = audio_data.astype(np.float32)
+            scaled *= self.gain_factor
+            np.clip(scaled, -32767, 32767, out=scaled)
+            audio_data = scaled.astype(np.int16)
+
+        if self.last_level > 100 and time.time() % 2 < 0.1:
+            print(f"Audio level: {self.last_level:.1f}")
+        return audio_data
+
+    def _report_overflows(self):
+        current_time = time.time()
+        if current_time - self.last_overflow_report > 5:
+            overflows = self.overflow_count - self._reported_overflows
+            dropped = self.ring.overruns
+            if overflows or dropped:
+                print(f"Audio input overflow occurred {overflows} times in the last 5 seconds "
+                      f"({dropped} samples dropped by the ring buffer so far)")
+            self._reported_overflows = self.overflow_count
+            self.last_overflow_report = current_time
 
     def get_audio_chunk(self, timeout=0.2):
-        try:
-            return self.audio_queue.get(timeout=timeout)
-        except queue.Empty:
-            return np.zeros(self.chunk_size, dtype=np.int16)
+        """Return the next chunk_size block with AGC applied, or None if none arrives within ``timeout``.
+
+        A timeout means the device delivered nothing, so no audio is made up
+        to fill the gap.
+        """
+        deadline = time.monotonic() + timeout
+        audio_data = self.ring.read(self.chunk_size)
+        while audio_data is None:
+            if time.monotonic() >= deadline:
+                self._underruns.inc()
+                return None
+            time.sleep(0.005)
+            audio_data = self.ring.read(self.chunk_size)
+
+        self._report_overflows()
+        return self._apply_gain(audio_data)
 
     def get_sample_rate(self):
         return self.sample_rate
@@ -151,9 +206,8 @@ class MicrophoneCapture:
                 except Exception as e:
                     print(f"Error closing stream: {e}")
                 self.stream = None
-            
-        try:
-            while not self.audio_queue.empty():
-                self.audio_queue.get_nowait()
-        except:
-            pass
+            for key in self._sampled_metrics:
+                get_metrics().remove(key)
+            self._sampled_metrics = []
+
+        self.ring.clear()
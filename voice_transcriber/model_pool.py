@@ -0,0 +1,345 @@
+"""Process-wide Whisper model sharing and cross-session batched inference."""
+
+import queue
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+import numpy as np
+from config import MODEL_SIZE, SAMPLE_RATE, MODEL_POOL_MAX_IDLE, BATCH_MAX_SIZE, BATCH_LATENCY_BUDGET
+from metrics import get_metrics
+
+DEFAULT_DECODE_OPTIONS = dict(
+    beam_size=5,
+    language="en",
+    vad_filter=True,
+    vad_parameters=dict(min_silence_duration_ms=500),
+)
+
+# Whisper's encoder sees at most 30 s of audio, so longer windows can't share a batch.
+_MAX_BATCH_WINDOW = 30 * SAMPLE_RATE
+
+
+def _load_whisper(model_size, compute_type):
+    from faster_whisper import WhisperModel
+    return WhisperModel(model_size, device="cpu", compute_type=compute_type)
+
+
+class ModelRegistry:
+    def __init__(self, max_idle=MODEL_POOL_MAX_IDLE, loader=_load_whisper):
+        """Share loaded models between sessions, keyed by (model_size, compute_type).
+
+        Models are refcounted; once a model has no users it stays cached so the
+        next session starts warm, and the least recently used idle models are
+        evicted when more than ``max_idle`` of them are held.
+
+        Args:
+            max_idle: Number of unreferenced models kept loaded
+            loader: Function ``(model_size, compute_type) -> model``
+        """
+        self.max_idle = max_idle
+        self._loader = loader
+        self._lock = threading.Lock()
+        self._key_locks = {}
+        self._models = OrderedDict()
+        self._refcounts = {}
+        self.load_times = {}
+
+    def acquire(self, model_size=MODEL_SIZE, compute_type="int8"):
+        """Return a shared model, loading it on first use."""
+        key = (model_size, compute_type)
+        with self._lock:
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+
+        # Only one thread loads a given model; others wait and then share it.
+        with key_lock:
+            with self._lock:
+                if key in self._models:
+                    self._models.move_to_end(key)
+                    self._refcounts[key] += 1
+                    return self._models[key]
+
+            start = time.perf_counter()
+            model = self._loader(model_size, compute_type)
+            self.load_times[key] = time.perf_counter() - start
+            get_metrics().gauge("pipeline_model_load_seconds", "Time to load a model",
+                                model=f"{model_size}/{compute_type}").set(self.load_times[key])
+            print(f"Loaded model {model_size} ({compute_type}) in {self.load_times[key]:.2f}s")
+
+            with self._lock:
+                self._models[key] = model
+                self._refcounts[key] = 1
+                self._evict_idle()
+            return model
+
+    def release(self, model_size=MODEL_SIZE, compute_type="int8"):
+        key = (model_size, compute_type)
+        with self._lock:
+            if self._refcounts.get(key, 0) > 0:
+                self._refcounts[key] -= 1
+                self._models.move_to_end(key)
+            self._evict_idle()
+
+    def _evict_idle(self):
+        idle = [key for key in self._models if self._refcounts[key] == 0]
+        while len(idle) > self.max_idle:
+            key = idle.pop(0)
+            del self._models[key]
+            del self._refcounts[key]
+            print(f"Evicted idle model {key[0]} ({key[1]})")
+
+    def stats(self):
+        with self._lock:
+            return {f"{size}/{compute}": count for (size, compute), count in self._refcounts.items()}
+
+
+_registry = ModelRegistry()
+
+
+def get_registry():
+    """Return the process-wide model registry."""
+    return _registry
+
+
+def warm_up(model, seconds=1.0):
+    """Run one throwaway decode so first-call costs are paid before real audio arrives."""
+    audio = (0.01 * np.random.default_rng(0).standard_normal(int(seconds * SAMPLE_RATE))).astype(np.float32)
+    segments, _ = model.transcribe(audio, beam_size=1, language="en", vad_filter=False)
+    list(segments)
+
+
+class ModelPreloader:
+    def __init__(self, model_size=MODEL_SIZE, compute_type="int8", registry=None):
+        """Import, load and warm up a model on a background thread.
+
+        The preloader keeps its registry reference for its whole lifetime, so
+        the model stays loaded and sessions acquiring the same key start warm.
+        Phase timings are kept in ``timings`` for the startup report.
+        """
+        self.model_size = model_size
+        self.compute_type = compute_type
+        self.registry = registry or get_registry()
+        self.timings = {}
+        self.error = None
+        self.ready = threading.Event()
+        self.thread = threading.Thread(target=self._run)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def _run(self):
+        try:
+            start = time.perf_counter()
+            import faster_whisper  # noqa: F401
+            self.timings["import"] = time.perf_counter() - start
+
+            start = time.perf_counter()
+            model = self.registry.acquire(self.model_size, self.compute_type)
+            self.timings["load"] = time.perf_counter() - start
+
+            start = time.perf_counter()
+            warm_up(model)
+            self.timings["warm_up"] = time.perf_counter() - start
+            for phase, seconds in self.timings.items():
+                get_metrics().gauge("pipeline_model_startup_seconds", "Model preload time by phase",
+                                    model=self.model_size, phase=phase).set(seconds)
+            print(f"Model {self.model_size} ready: {self.report()}")
+        except Exception as e:
+            self.error = e
+            print(f"Error preloading model {self.model_size}: {e}")
+        finally:
+            self.ready.set()
+
+    def report(self):
+        """Return a one-line summary of the startup phases completed so far."""
+        phases = ", ".join(f"{name.replace('_', '-')} {seconds:.2f}s" for name, seconds in self.timings.items())
+        total = sum(self.timings.values())
+        return f"{phases} (total {total:.2f}s)" if phases else "not started"
+
+
+class DecodedWord:
+    """Minimal stand-in for a faster-whisper Word."""
+
+    def __init__(self, start, end, word, probability=None):
+        self.start = start
+        self.end = end
+        self.word = word
+        self.probability = probability
+
+
+class DecodedSegment:
+    """Minimal stand-in for a faster-whisper Segment decoded outside the calling thread."""
+
+    def __init__(self, start, end, text, words=None):
+        self.start = start
+        self.end = end
+        self.text = text
+        self.words = words
+
+
+class _Request:
+    def __init__(self, audio, options):
+        self.audio = audio
+        self.options = options
+        self.future = Future()
+        self.submitted = time.monotonic()
+
+    @property
+    def batchable(self):
+        return (
+            not self.options.get("word_timestamps")
+            and not self.options.get("initial_prompt")
+            and len(self.audio) <= _MAX_BATCH_WINDOW
+        )
+
+
+class BatchScheduler:
+    def __init__(self, model_size=MODEL_SIZE, compute_type="int8",
+                 max_batch_size=BATCH_MAX_SIZE, latency_budget=BATCH_LATENCY_BUDGET, registry=None):
+        """Collect ready windows from many sessions and decode them as one batch.
+
+        The first queued window opens a batch; the scheduler keeps collecting
+        until ``max_batch_size`` windows are ready or ``latency_budget`` seconds
+        have passed since that window arrived. Plain text windows go through a
+        single batched encoder/decoder call; windows that need word timestamps
+        or a prompt are decoded one by one on the same shared model.
+
+        Args:
+            model_size: Whisper model size
+            compute_type: CTranslate2 compute type
+            max_batch_size: Upper bound on windows per batch
+            latency_budget: Seconds a window may wait for the batch to fill
+            registry: Model registry to borrow the model from
+        """
+        self.model_size = model_size
+        self.compute_type = compute_type
+        self.max_batch_size = max_batch_size
+        self.latency_budget = latency_budget
+        self.registry = registry or get_registry()
+        self.model = None
+        self.running = False
+        self.thread = None
+        self._requests = queue.Queue()
+        self.batch_sizes = []
+
+    def start(self):
+        self.model = self.registry.acquire(self.model_size, self.compute_type)
+        self.running = True
+        self.thread = threading.Thread(target=self._run)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def stop(self):
+        self.running = False
+        if self.thread:
+            self.thread.join(timeout=2.0)
+        while not self._requests.empty():
+            self._requests.get_nowait().future.cancel()
+        if self.model is not None:
+            self.registry.release(self.model_size, self.compute_type)
+            self.model = None
+
+    def submit(self, audio, **options):
+        """Queue a window for decoding; the Future resolves to a list of segments."""
+        request = _Request(audio, {**DEFAULT_DECODE_OPTIONS, **options})
+        self._requests.put(request)
+        return request.future
+
+    def transcribe(self, audio, timeout=None, **options):
+        return self.submit(audio, **options).result(timeout=timeout)
+
+    def _run(self):
+        while self.running:
+            try:
+                first = self._requests.get(timeout=0.1)
+            except queue.Empty:
+                continue
+
+            batch = [first]
+            deadline = first.submitted + self.latency_budget
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._requests.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            self.batch_sizes.append(len(batch))
+            self._execute(batch)
+
+    def _execute(self, batch):
+        batched = [r for r in batch if r.batchable and r.future.set_running_or_notify_cancel()]
+        sequential = [r for r in batch if not r.batchable and r.future.set_running_or_notify_cancel()]
+
+        # Group by the options that change decoding so each group is one call.
+        groups = {}
+        for request in batched:
+            key = (request.options["beam_size"], request.options["language"], request.options["vad_filter"])
+            groups.setdefault(key, []).append(request)
+
+        for group in groups.values():
+            if len(group) == 1:
+                sequential.extend(group)
+                continue
+            try:
+                results = self._decode_batch(group)
+            except Exception as e:
+                print(f"Batched decode failed, falling back to sequential: {e}")
+                sequential.extend(group)
+                continue
+            for request, segments in zip(group, results):
+                request.future.set_result(segments)
+
+        for request in sequential:
+            try:
+                segments, _ = self.model.transcribe(request.audio, **request.options)
+                request.future.set_result(list(segments))
+            except Exception as e:
+                request.future.set_exception(e)
+
+    def _decode_batch(self, requests):
+        import ctranslate2
+        from faster_whisper.audio import pad_or_trim
+        from faster_whisper.tokenizer import Tokenizer
+        from faster_whisper.vad import VadOptions, get_speech_timestamps
+
+        options = requests[0].options
+        results = [[] for _ in requests]
+        audios = []
+        indices = []
+        for i, request in enumerate(requests):
+            audio = request.audio
+            if options["vad_filter"]:
+                vad_options = VadOptions(**options.get("vad_parameters", {}))
+                chunks = get_speech_timestamps(audio, vad_options)
+                if not chunks:
+                    continue
+                audio = np.concatenate([audio[c["start"]:c["end"]] for c in chunks])
+            audios.append(audio)
+            indices.append(i)
+
+        if not audios:
+            return results
+
+        features = np.stack([pad_or_trim(self.model.feature_extractor(audio)) for audio in audios])
+        tokenizer = Tokenizer(
+            self.model.hf_tokenizer,
+            self.model.model.is_multilingual,
+            task="transcribe",
+            language=options["language"],
+        )
+        prompt = list(tokenizer.sot_sequence) + [tokenizer.no_timestamps]
+        outputs = self.model.model.generate(
+            ctranslate2.StorageView.from_array(features.astype(np.float32)),
+            [prompt] * len(audios),
+            beam_size=options["beam_size"],
+            max_length=448,
+            suppress_blank=True,
+        )
+
+        for i, audio, output in zip(indices, audios, outputs):
+            text = tokenizer.decode(output.sequences_ids[0])
+            if text.strip():
+                results[i] = [DecodedSegment(0.0, len(requests[i].audio) / SAMPLE_RATE, text)]
+        return results
@@ -1,51 +1,253 @@
 """Module for capturing audio from phone calls using raw sockets."""
 
 import socket
-import base64
 import threading
-import json
+import time
+import asyncio
+import itertools
+from collections import deque
 import numpy as np
-from config import SOCKET_HOST, SOCKET_PORT
+from config import (
+    SOCKET_HOST, SOCKET_PORT, PHONE_SERVER_MODE, PHONE_CALL_QUEUE_SIZE,
+    PHONE_OVERFLOW_POLICY, PHONE_MAX_MESSAGE_BYTES, PHONE_JSON_BACKEND, PHONE_BATCH_FRAMES,
+    PHONE_AUDIO_ENCODING, PHONE_SAMPLE_RATE, SAMPLE_RATE, PHONE_RECENT_CALLS,
+)
+from media_decoder import MediaFrameDecoder
+from audio_convert import AudioConverter
+from metrics import get_metrics
+
+OVERFLOW_POLICIES = ("block", "drop_oldest", "drop_newest")
+
+
+class CallStats:
+    """Per-connection counters for the asyncio server."""
+
+    def __init__(self, call_id, peer):
+        self.call_id = call_id
+        self.peer = peer
+        self.received = 0
+        self.processed = 0
+        self.dropped = 0
+        self.max_queue_depth = 0
+
+    def as_dict(self):
+        return {
+            "call_id": self.call_id,
+            "peer": self.peer,
+            "received": self.received,
+            "processed": self.processed,
+            "dropped": self.dropped,
+            "max_queue_depth": self.max_queue_depth,
+        }
+
 
 class PhoneCapture:
-    def __init__(self, audio_callback=None):
+    def __init__(self, audio_callback=None, host=SOCKET_HOST, port=SOCKET_PORT, mode=PHONE_SERVER_MODE,
+                 queue_size=PHONE_CALL_QUEUE_SIZE, overflow_policy=PHONE_OVERFLOW_POLICY,
+                 json_backend=PHONE_JSON_BACKEND, batch_frames=PHONE_BATCH_FRAMES,
+                 encoding=PHONE_AUDIO_ENCODING, input_rate=PHONE_SAMPLE_RATE, output_rate=SAMPLE_RATE,
+                 congested=None):
         """Initialize phone audio capture using sockets.
-        
+
         Args:
-            audio_callback: Function to call with audio data when received
+            audio_callback: Function to call with audio data when received, as float32
+                samples at ``output_rate``. Frames are batched per connection.
+            host: Interface to listen on
+            port: TCP port to listen on
+            mode: "asyncio" serves every call on one event loop, "thread" uses a thread per call
+            queue_size: Messages buffered per call between the socket reader and the decoder (asyncio mode)
+            overflow_policy: What a full per-call queue does: "block" stops reading the socket
+                so TCP pushes back on the sender, "drop_oldest"/"drop_newest" discard messages
+            json_backend: Parser for media messages, see media_decoder.make_payload_extractor
+            batch_frames: Most media frames decoded into one audio_callback call
+            encoding: Payload encoding, "mulaw", "alaw" or "pcm16"
+            input_rate: Sample rate of the call audio
+            output_rate: Sample rate delivered to audio_callback
+            congested: Optional callable, e.g. ``lambda: transcriber.congested``; while it returns
+                True no more audio is delivered, so the per-call queue fills and ``overflow_policy``
+                decides whether the socket stops being read or messages are dropped
         """
-        self.host = SOCKET_HOST
-        self.port = SOCKET_PORT
+        if mode not in ("asyncio", "thread"):
+            raise ValueError(f"Unknown phone server mode: {mode}")
+        if overflow_policy not in OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown overflow policy: {overflow_policy}")
+        self.host = host
+        self.port = port
+        self.mode = mode
+        self.queue_size = queue_size
+        self.overflow_policy = overflow_policy
+        self.json_backend = json_backend
+        self.batch_frames = batch_frames
+        self.encoding = encoding
+        self.input_rate = input_rate
+        self.output_rate = output_rate
         self.socket = None
         self.running = False
         self.audio_callback = audio_callback
+        self.congested = congested
         self.thread = None
-    
+        self.loop = None
+        self.server = None
+        # Live calls by connection id; peers can reuse an address, so it can't be the key
+        self.calls = {}
+        self.recent_calls = deque(maxlen=PHONE_RECENT_CALLS)
+        self._call_ids = itertools.count(1)
+        self._ready = threading.Event()
+        self._stopped = None
+        self._connections = set()
+        metrics = get_metrics()
+        self._messages = {
+            state: metrics.counter("pipeline_phone_messages_total", "Media messages by outcome", state=state)
+            for state in ("received", "processed", "dropped")
+        }
+        self._active_calls = metrics.gauge("pipeline_active_calls", "Calls currently connected", source="phone")
+
     def start(self):
         """Start listening for incoming phone audio data."""
-        self.socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-        self.socket.bind((self.host, self.port))
-        self.socket.listen(5)
-        
         self.running = True
-        self.thread = threading.Thread(target=self._listen_for_connections)
-        self.thread.daemon = True
-        self.thread.start()
-        
-        print(f"Phone capture server listening on {self.host}:{self.port}")
+        if self.mode == "asyncio":
+            self.thread = threading.Thread(target=self._run_event_loop)
+            self.thread.daemon = True
+            self.thread.start()
+            self._ready.wait(timeout=5)
+        else:
+            self.socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            self.socket.bind((self.host, self.port))
+            self.socket.listen(5)
+            self.port = self.socket.getsockname()[1]
+
+            self.thread = threading.Thread(target=self._listen_for_connections)
+            self.thread.daemon = True
+            self.thread.start()
+
+        print(f"Phone capture server listening on {self.host}:{self.port} ({self.mode} mode)")
         print("To use with Twilio:")
         print(f"1. Set up ngrok: 'ngrok tcp {self.port}'")
         print("2. Configure your Twilio webhook to send audio to this server")
-    
+
     def stop(self):
         """Stop listening for phone audio."""
         self.running = False
+        if self.loop and self._stopped:
+            self.loop.call_soon_threadsafe(self._stopped.set)
         if self.socket:
             self.socket.close()
         if self.thread:
             self.thread.join(timeout=1)
-    
+
+    def get_call_stats(self):
+        """Return counters for the recently finished and the live calls of the asyncio server."""
+        return [stats.as_dict() for stats in list(self.recent_calls) + list(self.calls.values())]
+
+    def _run_event_loop(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        try:
+            self.loop.run_until_complete(self._serve())
+        finally:
+            self.loop.close()
+
+    async def _serve(self):
+        self._stopped = asyncio.Event()
+        self.server = await asyncio.start_server(
+            self._handle_stream, self.host, self.port, limit=PHONE_MAX_MESSAGE_BYTES
+        )
+        self.port = self.server.sockets[0].getsockname()[1]
+        self._ready.set()
+        async with self.server:
+            await self._stopped.wait()
+        # Close calls still in progress so no handler is left pending on the closed loop.
+        for task in list(self._connections):
+            task.cancel()
+        await asyncio.gather(*self._connections, return_exceptions=True)
+
+    async def _handle_stream(self, reader, writer):
+        """Read newline-delimited messages for one call into its bounded queue."""
+        peer = writer.get_extra_info("peername")
+        stats = CallStats(next(self._call_ids), peer)
+        self.calls[stats.call_id] = stats
+        print(f"Connection from {peer}")
+
+        task = asyncio.current_task()
+        self._connections.add(task)
+        messages = asyncio.Queue(maxsize=self.queue_size)
+        metrics = get_metrics()
+        metrics.counter("pipeline_calls_total", "Calls or recordings started", source="phone").inc()
+        self._active_calls.inc()
+        depth = metrics.sampled("pipeline_queue_depth", messages.qsize, help="Items waiting between pipeline stages",
+                                queue="phone_call", session=stats.call_id)
+        consumer = asyncio.create_task(self._consume(messages, stats))
+        try:
+            while self.running:
+                try:
+                    line = await reader.readline()
+                except (asyncio.LimitOverrunError, ValueError):
+                    print(f"Message from {peer} exceeds {PHONE_MAX_MESSAGE_BYTES} bytes, closing")
+                    break
+                if not line:
+                    break
+                stats.received += 1
+                self._messages["received"].inc()
+                await self._enqueue(messages, line, stats)
+            # Let the consumer finish whatever is still queued for this call.
+            await messages.put(None)
+            await consumer
+        except ConnectionError as e:
+            print(f"Error handling client: {e}")
+        except asyncio.CancelledError:
+            # Server shutdown; end quietly rather than surfacing the cancellation to asyncio.
+            pass
+        finally:
+            self._connections.discard(task)
+            self.recent_calls.append(self.calls.pop(stats.call_id))
+            self._active_calls.dec()
+            metrics.remove(depth)
+            consumer.cancel()
+            writer.close()
+
+    async def _enqueue(self, messages, line, stats):
+        if messages.full():
+            if self.overflow_policy == "drop_newest":
+                stats.dropped += 1
+                self._messages["dropped"].inc()
+                return
+            if self.overflow_policy == "drop_oldest":
+                messages.get_nowait()
+                stats.dropped += 1
+                self._messages["dropped"].inc()
+        # With the "block" policy this waits, so the reader stops draining the socket.
+        await messages.put(line)
+        stats.max_queue_depth = max(stats.max_queue_depth, messages.qsize())
+
+    def _new_converter(self):
+        # One per call: the resampler's filter state must not mix streams.
+        return AudioConverter(self.encoding, self.input_rate, self.output_rate)
+
+    async def _consume(self, messages, stats):
+        decoder = MediaFrameDecoder(self.json_backend)
+        converter = self._new_converter()
+        finished = False
+        while not finished:
+            # Hold off while downstream is behind; the call's queue backs up as if it were full.
+            while self.congested is not None and self.congested() and self.running:
+                await asyncio.sleep(0.01)
+            # Take whatever has queued up, so a backlog is decoded in one batch.
+            batch = [await messages.get()]
+            while len(batch) < self.batch_frames and not messages.empty():
+                batch.append(messages.get_nowait())
+            if batch[-1] is None:
+                batch.pop()
+                finished = True
+            try:
+                self._process_messages(decoder, converter, batch)
+                stats.processed += len(batch)
+                self._messages["processed"].inc(len(batch))
+            except Exception as e:
+                print(f"Error processing message: {e}")
+            # Let other calls' readers run before draining this queue again.
+            await asyncio.sleep(0)
+
     def _listen_for_connections(self):
         """Listen for incoming connections."""
         while self.running:
@@ -61,54 +263,62 @@ class PhoneCapture:
             except Exception as e:
                 if self.running:
                     print(f"Error accepting connection: {e}")
-    
+
     def _handle_client(self, client_socket):
         """Handle incoming client connection and data."""
-        buffer = b""
-        
+        buffer = bytearray()
+        decoder = MediaFrameDecoder(self.json_backend)
+        converter = self._new_converter()
+
         while self.running:
+            if self.congested is not None and self.congested():
+                # Stop reading the socket so TCP pushes back on the sender
+                time.sleep(0.01)
+                continue
             try:
                 data = client_socket.recv(4096)
                 if not data:
                     break
-                
+
                 buffer += data
-                
-                # Try to parse complete JSON messages
-                while b'\n' in buffer:
-                    message, buffer = buffer.split(b'\n', 1)
-                    try:
-                        parsed = json.loads(message)
-                        self._process_message(parsed)
-                    except json.JSONDecodeError:
-                        print("Failed to parse message as JSON")
-            
+
+                # Collect every complete JSON message, then drop them from the buffer in one go
+                lines = []
+                start = 0
+                end = buffer.find(b'\n')
+                while end != -1:
+                    lines.append(bytes(buffer[start:end]))
+                    start = end + 1
+                    end = buffer.find(b'\n', start)
+                del buffer[:start]
+
+                for i in range(0, len(lines), self.batch_frames):
+                    self._process_messages(decoder, converter, lines[i:i + self.batch_frames])
+
             except Exception as e:
                 print(f"Error handling client: {e}")
                 break
-        
+
         client_socket.close()
-    
-    def _process_message(self, message):
-        """Process a message received from the phone call."""
-        if message.get('event') == 'media':
-            payload = message.get('media', {}).get('payload')
-            if payload:
-                # Decode base64 audio data
-                audio_data = base64.b64decode(payload)
-                # Convert to numpy array
-                audio_array = np.frombuffer(audio_data, dtype=np.int16)
-                
-                # Call the callback if available
-                if self.audio_callback:
-                    self.audio_callback(audio_array)
+
+    def _process_messages(self, decoder, converter, lines):
+        """Process a batch of raw messages received from the phone call."""
+        audio_data = decoder.decode_batch(lines)
+        if not audio_data:
+            return
+        # Decode and resample the whole batch in one vectorized pass
+        audio_array = converter.convert(audio_data)
+
+        # Call the callback if available
+        if self.audio_callback:
+            self.audio_callback(audio_array)
 
 
 def simple_test():
     """Simple test for the phone capture module."""
     def audio_received(audio_data):
         print(f"Received audio chunk: {len(audio_data)} samples, max amplitude: {np.max(np.abs(audio_data))}")
-    
+
     phone = PhoneCapture(audio_callback=audio_received)
     try:
         phone.start()
@@ -118,4 +328,4 @@ def simple_test():
         phone.stop()
 
 if __name__ == "__main__":
-    simple_test()
\ No newline at end of file
+    simple_test()
@@ -0,0 +1,105 @@
+"""Load generator: replay synthetic Twilio-style media streams at N concurrent calls.
+
+By default an in-process PhoneCapture server is started on a free port with a
+counting callback, so the report covers both what the clients sent and what
+the server actually processed. Pass --host/--port to target a running server.
+"""
+
+import argparse
+import asyncio
+import base64
+import json
+import os
+import threading
+import time
+from config import SAMPLE_RATE
+from phone_capture import PhoneCapture, OVERFLOW_POLICIES
+
+FRAME_MS = 20
+FRAME_BYTES = 160  # 20 ms of 8 kHz mu-law
+
+
+def media_messages(call_index, num_frames):
+    stream_sid = f"MZ{call_index:032x}"
+    yield json.dumps({"event": "start", "streamSid": stream_sid,
+                      "start": {"mediaFormat": {"encoding": "audio/x-mulaw", "sampleRate": 8000, "channels": 1}}})
+    for chunk in range(num_frames):
+        payload = base64.b64encode(os.urandom(FRAME_BYTES)).decode("ascii")
+        yield json.dumps({"event": "media", "streamSid": stream_sid,
+                          "media": {"track": "inbound", "chunk": str(chunk + 1),
+                                    "timestamp": str(chunk * FRAME_MS), "payload": payload}})
+    yield json.dumps({"event": "stop", "streamSid": stream_sid})
+
+
+async def run_call(host, port, call_index, num_frames, speed, sent):
+    reader, writer = await asyncio.open_connection(host, port)
+    interval = FRAME_MS / 1000 / speed if speed > 0 else 0
+    start = time.monotonic()
+    for i, message in enumerate(media_messages(call_index, num_frames)):
+        writer.write(message.encode("ascii") + b"\n")
+        await writer.drain()
+        sent[call_index] += 1
+        if interval:
+            await asyncio.sleep(max(0.0, start + i * interval - time.monotonic()))
+    writer.close()
+    await writer.wait_closed()
+
+
+async def run_load(host, port, calls, num_frames, speed):
+    sent = [0] * calls
+    await asyncio.gather(*(run_call(host, port, i, num_frames, speed, sent) for i in range(calls)))
+    return sum(sent)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--calls", type=int, default=100, help="concurrent calls")
+    parser.add_argument("--seconds", type=float, default=10.0, help="audio seconds per call")
+    parser.add_argument("--speed", type=float, default=1.0, help="pace multiplier, 0 sends as fast as possible")
+    parser.add_argument("--host", default=None, help="target an external server instead of an in-process one")
+    parser.add_argument("--port", type=int, default=0, help="0 picks a free port for the in-process server")
+    parser.add_argument("--mode", default="asyncio", choices=["asyncio", "thread"])
+    parser.add_argument("--policy", default="block", choices=OVERFLOW_POLICIES)
+    args = parser.parse_args()
+
+    callbacks = [0, 0]
+    lock = threading.Lock()
+
+    def count_audio(audio):
+        with lock:
+            callbacks[0] += 1
+            callbacks[1] += len(audio)
+
+    server = None
+    host, port = args.host, args.port
+    if host is None:
+        server = PhoneCapture(audio_callback=count_audio, host="127.0.0.1", port=port,
+                              mode=args.mode, overflow_policy=args.policy)
+        server.start()
+        host = "127.0.0.1"
+        port = server.port
+
+    num_frames = int(args.seconds * 1000 / FRAME_MS)
+    start = time.perf_counter()
+    sent = asyncio.run(run_load(host, port, args.calls, num_frames, args.speed))
+    elapsed = time.perf_counter() - start
+
+    print(f"calls={args.calls} frames/call={num_frames} elapsed={elapsed:.2f}s")
+    print(f"sent:      {sent / elapsed:10.0f} msg/s  {args.calls * args.seconds / elapsed:8.1f} audio-s/s")
+    if server:
+        # Give the server a moment to drain its per-call queues before reading counters.
+        deadline = time.monotonic() + 10
+        while args.mode == "asyncio" and time.monotonic() < deadline and sum(c["processed"] for c in server.get_call_stats()) < sent:
+            time.sleep(0.05)
+        drained = time.perf_counter() - start
+        server.stop()
+        stats = server.get_call_stats()
+        processed = sum(c["processed"] for c in stats)
+        dropped = sum(c["dropped"] for c in stats)
+        if stats:
+            print(f"processed: {processed / drained:10.0f} msg/s  dropped={dropped}")
+        print(f"delivered: {callbacks[1] / SAMPLE_RATE / drained:10.1f} audio-s/s in {callbacks[0]} callbacks")
+
+
+if __name__ == "__main__":
+    main()
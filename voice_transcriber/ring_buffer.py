@@ -0,0 +1,130 @@
+"""Fixed-capacity audio ring buffer used to accumulate samples for transcription."""
+
+import numpy as np
+
+
+class AudioRingBuffer:
+    def __init__(self, capacity, dtype=np.float32):
+        """Initialize a preallocated ring buffer.
+
+        The backing store is twice the capacity so the most recent samples are
+        always contiguous and can be handed out as views without copying. When
+        the write position reaches the end, the live window is moved back to the
+        front once, which keeps writes amortized O(1) per sample.
+
+        Args:
+            capacity: Maximum number of samples kept; older samples are dropped
+            dtype: Sample dtype of the backing store
+        """
+        if capacity <= 0:
+            raise ValueError("capacity must be positive")
+        self.capacity = int(capacity)
+        self._data = np.zeros(2 * self.capacity, dtype=dtype)
+        self._start = 0
+        self._end = 0
+        self.dropped = 0
+
+    def __len__(self):
+        return self._end - self._start
+
+    def write(self, chunk):
+        """Append samples, dropping the oldest ones if capacity is exceeded."""
+        chunk = np.asarray(chunk).reshape(-1)
+        n = len(chunk)
+        if n == 0:
+            return
+        if n >= self.capacity:
+            self.dropped += len(self) + n - self.capacity
+            self._data[:self.capacity] = chunk[-self.capacity:]
+            self._start = 0
+            self._end = self.capacity
+            return
+
+        overflow = len(self) + n - self.capacity
+        if overflow > 0:
+            self._start += overflow
+            self.dropped += overflow
+
+        if self._end + n > len(self._data):
+            size = len(self)
+            self._data[:size] = self._data[self._start:self._end]
+            self._start = 0
+            self._end = size
+
+        self._data[self._end:self._end + n] = chunk
+        self._end += n
+
+    def view(self, num_samples=None):
+        """Return the newest samples as a zero-copy view.
+
+        The view is only valid until the next call to ``write``.
+        """
+        if num_samples is None or num_samples >= len(self):
+            return self._data[self._start:self._end]
+        return self._data[self._end - num_samples:self._end]
+
+    def consume(self, num_samples):
+        """Discard the oldest ``num_samples`` samples."""
+        self._start = min(self._end, self._start + max(0, int(num_samples)))
+        if self._start == self._end:
+            self._start = self._end = 0
+
+    def keep_last(self, num_samples):
+        """Discard everything except the newest ``num_samples`` samples."""
+        self.consume(len(self) - num_samples)
+
+    def clear(self):
+        self._start = self._end = 0
+
+
+class SPSCRingBuffer:
+    def __init__(self, capacity, dtype=np.int16):
+        """Single-producer/single-consumer ring buffer for real-time audio threads.
+
+        The producer only advances ``_write`` and the consumer only advances
+        ``_read``; each counter is published with a single attribute store after
+        the samples are copied, so neither side takes a lock and writes never
+        allocate. When the consumer falls behind, the producer keeps what fits
+        and counts the rest in ``overruns`` rather than touching ``_read``.
+
+        Args:
+            capacity: Number of samples the ring holds
+            dtype: Sample dtype of the backing store
+        """
+        self.capacity = int(capacity)
+        self._data = np.zeros(self.capacity, dtype=dtype)
+        self._write = 0
+        self._read = 0
+        self.overruns = 0
+
+    def available(self):
+        return self._write - self._read
+
+    def write(self, samples):
+        """Producer side: copy ``samples`` in, dropping what does not fit."""
+        n = min(len(samples), self.capacity - (self._write - self._read))
+        if n < len(samples):
+            self.overruns += len(samples) - n
+        pos = self._write % self.capacity
+        first = min(n, self.capacity - pos)
+        self._data[pos:pos + first] = samples[:first]
+        if n > first:
+            self._data[:n - first] = samples[first:n]
+        self._write += n
+
+    def read(self, num_samples):
+        """Consumer side: return the oldest ``num_samples`` samples, or None if not enough are buffered."""
+        if self._write - self._read < num_samples:
+            return None
+        pos = self._read % self.capacity
+        first = min(num_samples, self.capacity - pos)
+        if first == num_samples:
+            out = self._data[pos:pos + num_samples].copy()
+        else:
+            out = np.concatenate((self._data[pos:], self._data[:num_samples - first]))
+        self._read += num_samples
+        return out
+
+    def clear(self):
+        """Consumer side: discard everything buffered."""
+        self._read = self._write
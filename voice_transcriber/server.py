@@ -0,0 +1,255 @@
+"""Headless transcription server: stream audio over WebSocket, get transcripts back as JSON.
+
+Clients connect to ``/v1/stream`` and send binary messages of raw audio:
+
+    ws://host:8765/v1/stream?encoding=pcm16&sample_rate=16000&streaming=1
+
+``encoding`` is "pcm16" (little-endian), "mulaw" or "alaw"; audio is resampled
+to the model rate on the way in. The server answers with one JSON object per
+text message: ``{"type": "ready"}`` once the session is set up, then
+``{"type": "partial" | "final", "text", "start", "end", "latency_ms",
+"confidence"}`` as results come in, plus ``"words"`` as ``[start, end, word,
+probability]`` lists when the decode had word timestamps. Sending the text message ``{"event": "stop"}`` (or closing
+the socket) flushes the last segment, after which ``{"type": "done"}`` is sent.
+
+Plain HTTP ``GET /metrics`` returns Prometheus text, ``GET /healthz`` a
+liveness check. Connections beyond ``--max-sessions`` are refused with 503.
+"""
+
+import argparse
+import asyncio
+import json
+from collections import deque
+from urllib.parse import urlsplit, parse_qs
+import numpy as np
+from websockets.asyncio.server import serve
+from config import (
+    MODEL_SIZE, SAMPLE_RATE, SERVER_HOST, SERVER_PORT, SERVER_MAX_SESSIONS, SERVER_BACKEND,
+    SERVER_MAX_MESSAGE_BYTES,
+)
+from audio_convert import AudioConverter
+from model_pool import BatchScheduler, get_registry
+from metrics import get_metrics
+from streaming import TranscriptEvent
+from transcriber import RealtimeTranscriber
+
+
+class ServerMetrics:
+    """Counters for the /metrics endpoint, updated on the event loop thread."""
+
+    def __init__(self):
+        self.sessions_active = 0
+        self.sessions_total = 0
+        self.sessions_rejected = 0
+        self.audio_seconds = 0.0
+        self.transcripts = {TranscriptEvent.PARTIAL: 0, TranscriptEvent.FINAL: 0}
+        self.final_latencies = deque(maxlen=2000)
+
+    def render(self):
+        lines = [
+            "# TYPE transcriber_sessions_active gauge",
+            f"transcriber_sessions_active {self.sessions_active}",
+            "# TYPE transcriber_sessions_total counter",
+            f"transcriber_sessions_total {self.sessions_total}",
+            "# TYPE transcriber_sessions_rejected_total counter",
+            f"transcriber_sessions_rejected_total {self.sessions_rejected}",
+            "# TYPE transcriber_audio_seconds_total counter",
+            f"transcriber_audio_seconds_total {self.audio_seconds:.3f}",
+            "# TYPE transcriber_transcripts_total counter",
+        ]
+        lines += [f'transcriber_transcripts_total{{kind="{kind}"}} {count}' for kind, count in self.transcripts.items()]
+        lines.append("# TYPE transcriber_final_latency_seconds summary")
+        if self.final_latencies:
+            values = np.fromiter(self.final_latencies, dtype=np.float64)
+            for q, value in zip((0.5, 0.95, 0.99), np.percentile(values, [50, 95, 99])):
+                lines.append(f'transcriber_final_latency_seconds{{quantile="{q}"}} {value:.4f}')
+            lines.append(f"transcriber_final_latency_seconds_count {len(values)}")
+        models = get_registry().stats()
+        lines.append("# TYPE transcriber_models_loaded gauge")
+        lines.append(f"transcriber_models_loaded {len(models)}")
+        # Followed by what the pipeline stages record: queue depths, decode RTF, latency histograms
+        return "\n".join(lines) + "\n" + get_metrics().render()
+
+
+class _LoopPublisher:
+    # Stands in for a TranscriptBus: hands results from the transcriber thread to the session's event loop.
+    def __init__(self, loop, results):
+        self.loop = loop
+        self.results = results
+
+    def publish(self, item):
+        self.loop.call_soon_threadsafe(self.results.put_nowait, item)
+
+
+class TranscriptionServer:
+    def __init__(self, host=SERVER_HOST, port=SERVER_PORT, model_size=MODEL_SIZE, backend=SERVER_BACKEND,
+                 max_sessions=SERVER_MAX_SESSIONS):
+        """Serve WebSocket transcription sessions that share one model.
+
+        With the "thread" backend every session borrows the same model from
+        the registry, "process" shares one worker pool, and "batch" routes all
+        sessions through a single BatchScheduler so concurrent windows are
+        decoded together.
+
+        Args:
+            host: Interface to listen on
+            port: TCP port, 0 picks a free one
+            model_size: Whisper model size
+            backend: "thread", "process" or "batch"
+            max_sessions: Concurrent streams admitted before new ones are refused
+        """
+        if backend not in ("thread", "process", "batch"):
+            raise ValueError(f"Unknown server backend: {backend}")
+        self.host = host
+        self.port = port
+        self.model_size = model_size
+        self.backend = backend
+        self.max_sessions = max_sessions
+        self.metrics = ServerMetrics()
+        self.scheduler = None
+        self.server = None
+
+    async def serve_forever(self, ready=None):
+        if self.backend == "batch":
+            self.scheduler = BatchScheduler(self.model_size)
+            await asyncio.to_thread(self.scheduler.start)
+        try:
+            async with serve(self._handle, self.host, self.port, process_request=self._process_request,
+                             max_size=SERVER_MAX_MESSAGE_BYTES) as server:
+                self.server = server
+                self.port = next(iter(server.sockets)).getsockname()[1]
+                print(f"Transcription server listening on ws://{self.host}:{self.port}/v1/stream "
+                      f"({self.backend} backend, {self.max_sessions} sessions)")
+                if ready is not None:
+                    ready.set()
+                await server.serve_forever()
+        finally:
+            if self.scheduler is not None:
+                self.scheduler.stop()
+
+    def _process_request(self, connection, request):
+        path = urlsplit(request.path).path
+        if path == "/metrics":
+            return connection.respond(200, self.metrics.render())
+        if path == "/healthz":
+            return connection.respond(200, "ok\n")
+        if path != "/v1/stream":
+            return connection.respond(404, "not found\n")
+        # Refuse before the upgrade so overloaded clients get a plain 503 they can retry on.
+        if self.metrics.sessions_active >= self.max_sessions:
+            self.metrics.sessions_rejected += 1
+            return connection.respond(503, "too many sessions\n")
+        return None
+
+    async def _handle(self, connection):
+        if self.metrics.sessions_active >= self.max_sessions:
+            # Lost the race with another handshake that completed in between
+            self.metrics.sessions_rejected += 1
+            await connection.close(1013, "too many sessions")
+            return
+        self.metrics.sessions_active += 1
+        self.metrics.sessions_total += 1
+        try:
+            await self._run_session(connection)
+        finally:
+            self.metrics.sessions_active -= 1
+
+    async def _run_session(self, connection):
+        params = {k: v[-1] for k, v in parse_qs(urlsplit(connection.request.path).query).items()}
+        try:
+            encoding = params.get("encoding", "pcm16")
+            sample_rate = int(params.get("sample_rate", SAMPLE_RATE))
+            if sample_rate <= 0:
+                raise ValueError(f"sample_rate must be positive, got {sample_rate}")
+            converter = AudioConverter(encoding, sample_rate, SAMPLE_RATE)
+        except ValueError as e:
+            await connection.close(1003, str(e))
+            return
+
+        results = asyncio.Queue()
+        transcriber = RealtimeTranscriber(
+            model_size=self.model_size,
+            sample_rate=SAMPLE_RATE,
+            streaming=params.get("streaming", "0") in ("1", "true"),
+            backend=self.scheduler if self.scheduler is not None else self.backend,
+            bus=_LoopPublisher(asyncio.get_running_loop(), results),
+        )
+        transcriber.start()
+        sender = asyncio.create_task(self._send_results(connection, results))
+        await connection.send(json.dumps({"type": "ready", "sample_rate": SAMPLE_RATE}))
+        try:
+            async for message in connection:
+                if isinstance(message, str):
+                    try:
+                        if json.loads(message).get("event") == "stop":
+                            break
+                    except (ValueError, AttributeError):
+                        print(f"Ignoring malformed control message: {message[:80]!r}")
+                    continue
+                audio = converter.convert(message)
+                self.metrics.audio_seconds += len(audio) / SAMPLE_RATE
+                # Stop reading while the decoder is behind; unread frames back up to the client through TCP
+                while transcriber.congested and transcriber.running:
+                    await asyncio.sleep(0.02)
+                if transcriber.audio_queue.policy == "block":
+                    # A full queue makes the put wait; keep that wait off the event loop
+                    await asyncio.to_thread(transcriber.add_audio, audio)
+                else:
+                    transcriber.add_audio(audio)
+        finally:
+            # Flushes the open segment; joining the decode thread must not block the loop.
+            await asyncio.to_thread(transcriber.stop)
+            results.put_nowait(None)
+            await sender
+
+    async def _send_results(self, connection, results):
+        while True:
+            item = await results.get()
+            if item is None:
+                message = {"type": "done"}
+            elif isinstance(item, TranscriptEvent):
+                self.metrics.transcripts[item.kind] += 1
+                if item.is_final and item.latency is not None:
+                    self.metrics.final_latencies.append(item.latency)
+                message = {
+                    "type": item.kind,
+                    "text": item.text,
+                    "start": round(item.start, 3),
+                    "end": round(item.end, 3),
+                    "latency_ms": round(item.latency * 1000, 1) if item.latency is not None else None,
+                    "confidence": round(item.confidence, 3) if item.confidence is not None else None,
+                }
+                if item.words:
+                    message["words"] = [
+                        [round(w[0], 3), round(w[1], 3), w[2], round(w[3], 3) if w[3] is not None else None]
+                        for w in item.words
+                    ]
+            else:
+                continue
+            try:
+                await connection.send(json.dumps(message))
+            except Exception:
+                # Client went away; keep draining so the session can finish
+                pass
+            if item is None:
+                return
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default=SERVER_HOST)
+    parser.add_argument("--port", type=int, default=SERVER_PORT)
+    parser.add_argument("--model-size", default=MODEL_SIZE)
+    parser.add_argument("--backend", default=SERVER_BACKEND, choices=["thread", "process", "batch"])
+    parser.add_argument("--max-sessions", type=int, default=SERVER_MAX_SESSIONS)
+    args = parser.parse_args()
+
+    server = TranscriptionServer(args.host, args.port, args.model_size, args.backend, args.max_sessions)
+    try:
+        asyncio.run(server.serve_forever())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
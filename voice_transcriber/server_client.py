@@ -0,0 +1,109 @@
+"""Client for the transcription server: stream a WAV file or synthetic audio and print the results.
+
+Several concurrent clients can be started with --clients to load test a
+server; the report gives time-to-final latency as seen by the client and how
+many sessions the server refused.
+"""
+
+import argparse
+import asyncio
+import json
+import time
+import wave
+import numpy as np
+from websockets.asyncio.client import connect
+from websockets.exceptions import InvalidStatus
+from config import SAMPLE_RATE, SERVER_PORT
+
+
+def load_wav(path):
+    """Return ``(pcm16 bytes, sample_rate)`` for a mono 16-bit WAV file."""
+    with wave.open(path, "rb") as f:
+        if f.getsampwidth() != 2 or f.getnchannels() != 1:
+            raise ValueError("Expected a mono 16-bit WAV file")
+        return f.readframes(f.getnframes()), f.getframerate()
+
+
+def synthetic_audio(seconds, sample_rate=SAMPLE_RATE):
+    """Voiced bursts separated by pauses, as pcm16 bytes, so VAD segments close regularly."""
+    t = np.arange(int(seconds * sample_rate)) / sample_rate
+    voiced = (t % 3.0) < 2.0
+    signal = 0.2 * np.sin(2 * np.pi * 180 * t) * (1 + 0.5 * np.sin(2 * np.pi * 4 * t)) * voiced
+    signal += 0.002 * np.random.default_rng(0).standard_normal(len(t))
+    return (np.clip(signal, -1, 1) * 32767).astype("<i2").tobytes(), sample_rate
+
+
+async def stream_audio(url, pcm, sample_rate, chunk_ms=100, speed=1.0, streaming=False, on_message=None):
+    """Send ``pcm`` (16-bit little-endian) to the server in real-time sized chunks.
+
+    Returns every JSON message the server sent, each with a ``received_at``
+    monotonic timestamp added. ``speed`` 0 sends as fast as possible.
+    """
+    query = f"?encoding=pcm16&sample_rate={sample_rate}&streaming={int(streaming)}"
+    chunk_bytes = int(sample_rate * chunk_ms / 1000) * 2
+    interval = chunk_ms / 1000 / speed if speed > 0 else 0
+    messages = []
+
+    async with connect(url + query) as ws:
+        async def receive():
+            async for raw in ws:
+                message = json.loads(raw)
+                message["received_at"] = time.monotonic()
+                messages.append(message)
+                if on_message:
+                    on_message(message)
+                if message["type"] == "done":
+                    return
+
+        receiver = asyncio.create_task(receive())
+        start = time.monotonic()
+        for i, offset in enumerate(range(0, len(pcm), chunk_bytes)):
+            await ws.send(pcm[offset:offset + chunk_bytes])
+            if interval:
+                await asyncio.sleep(max(0.0, start + (i + 1) * interval - time.monotonic()))
+        await ws.send(json.dumps({"event": "stop"}))
+        await receiver
+    return messages
+
+
+async def run_clients(url, pcm, sample_rate, clients, speed, streaming, verbose):
+    def show(message):
+        if message["type"] in ("partial", "final"):
+            print(f"[{message['type']:>7}] {message['text']} ({message['latency_ms']} ms)")
+
+    async def one(index):
+        try:
+            return await stream_audio(url, pcm, sample_rate, speed=speed, streaming=streaming,
+                                      on_message=show if verbose and index == 0 else None)
+        except InvalidStatus as e:
+            if e.response.status_code == 503:
+                return None
+            raise
+
+    return await asyncio.gather(*(one(i) for i in range(clients)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", default=f"ws://127.0.0.1:{SERVER_PORT}/v1/stream")
+    parser.add_argument("--wav", default=None, help="mono 16-bit WAV file; synthetic audio when omitted")
+    parser.add_argument("--seconds", type=float, default=10.0, help="length of the synthetic audio")
+    parser.add_argument("--clients", type=int, default=1, help="concurrent sessions")
+    parser.add_argument("--speed", type=float, default=1.0, help="pace multiplier, 0 sends as fast as possible")
+    parser.add_argument("--streaming", action="store_true", help="ask for partial results")
+    args = parser.parse_args()
+
+    pcm, sample_rate = load_wav(args.wav) if args.wav else synthetic_audio(args.seconds)
+    results = asyncio.run(run_clients(args.url, pcm, sample_rate, args.clients, args.speed,
+                                      args.streaming, verbose=True))
+
+    admitted = [r for r in results if r is not None]
+    latencies = [m["latency_ms"] for r in admitted for m in r if m["type"] == "final" and m["latency_ms"] is not None]
+    print(f"\n{len(admitted)}/{args.clients} sessions admitted, {len(latencies)} finals")
+    if latencies:
+        p50, p95 = np.percentile(latencies, [50, 95])
+        print(f"Server-side time to final: p50 {p50:.0f} ms, p95 {p95:.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,210 @@
+"""Two-channel call transcription: one stream per speaker, merged into a dialogue.
+
+Call recorders and telephony media streams usually keep the agent and the
+customer on separate channels. Decoding each channel as its own stream
+attributes every word to a speaker without running diarization over mixed
+audio. The two streams share one model, and their timestamped words are
+interleaved by start time into turns.
+
+    python stereo.py call.wav --streaming
+"""
+
+import argparse
+import bisect
+import threading
+import time
+import wave
+import numpy as np
+from config import MODEL_SIZE, SAMPLE_RATE, CHUNK_SIZE, TRANSCRIBER_BACKEND, STEREO_CHANNELS
+from audio_convert import PolyphaseResampler
+from transcriber import RealtimeTranscriber
+
+
+class DialogueTurn:
+    """Consecutive words from one speaker, with their mean word probability as ``confidence``."""
+
+    __slots__ = ("speaker", "start", "end", "text", "confidence", "words")
+
+    def __init__(self, speaker, start, end, text, confidence, words):
+        self.speaker = speaker
+        self.start = start
+        self.end = end
+        self.text = text
+        self.confidence = confidence
+        self.words = words
+
+    def __repr__(self):
+        return f"DialogueTurn({self.speaker!r}, {self.text!r}, start={self.start:.2f}, end={self.end:.2f})"
+
+
+class DialogueMerger:
+    def __init__(self):
+        """Interleave final transcript events from several channels into time-ordered turns.
+
+        Words are ordered by start time across channels, and each run of
+        words from one channel becomes a turn, so crosstalk shows up as short
+        alternating turns. Events without word timestamps are placed as one
+        word spanning the event. A channel that decodes behind the other can
+        still add words before the newest turns, so the tail of the dialogue
+        settles once both channels have caught up.
+        """
+        self._lock = threading.Lock()
+        self._starts = []
+        self._words = []
+
+    def add(self, event):
+        """Add a TranscriptEvent; partials are ignored since their words may still change."""
+        if not event.is_final:
+            return
+        words = event.words or [(event.start, event.end, event.text, None)]
+        with self._lock:
+            for start, end, text, probability in words:
+                i = bisect.bisect_right(self._starts, start)
+                self._starts.insert(i, start)
+                self._words.insert(i, (start, end, text, probability, event.channel))
+
+    def turns(self):
+        with self._lock:
+            words = list(self._words)
+        turns = []
+        run = []
+        for word in words:
+            if run and word[4] != run[-1][4]:
+                turns.append(self._turn(run))
+                run = []
+            run.append(word)
+        if run:
+            turns.append(self._turn(run))
+        return turns
+
+    def text(self):
+        """Return the dialogue as one ``speaker: text`` line per turn."""
+        return "\n".join(f"{turn.speaker}: {turn.text}" for turn in self.turns())
+
+    @staticmethod
+    def _turn(run):
+        probabilities = [w[3] for w in run if w[3] is not None]
+        confidence = sum(probabilities) / len(probabilities) if probabilities else None
+        text = " ".join(w[2].strip() for w in run if w[2].strip())
+        return DialogueTurn(run[0][4], run[0][0], max(w[1] for w in run), text, confidence,
+                            [w[:4] for w in run])
+
+
+class StereoCallTranscriber:
+    def __init__(self, model_size=MODEL_SIZE, sample_rate=SAMPLE_RATE, streaming=False, backend=TRANSCRIBER_BACKEND,
+                 channels=STEREO_CHANNELS, bus=None, **options):
+        """Transcribe each channel of a call as an independent stream.
+
+        One RealtimeTranscriber runs per name in ``channels``, in channel
+        order, each with its own VAD, queues and LocalAgreement state. They
+        decode on one model: a backend object such as a BatchScheduler is
+        passed to both, and "thread" or "process" backends borrow the same
+        model or worker pool from the process-wide registry. Events are
+        tagged with their channel name, collected by a DialogueMerger, and
+        forwarded to ``bus`` when one is given. ``options`` go to every
+        RealtimeTranscriber; word timestamps are on unless ``options`` turns
+        them off, since turns are built from the words.
+        """
+        options.setdefault("word_timestamps", True)
+        self.channels = tuple(channels)
+        self.sample_rate = sample_rate
+        self.bus = bus
+        self.merger = DialogueMerger()
+        self.transcribers = {
+            name: RealtimeTranscriber(model_size, sample_rate, streaming=streaming, backend=backend, bus=self,
+                                      channel=name, **options)
+            for name in self.channels
+        }
+
+    def start(self):
+        for transcriber in self.transcribers.values():
+            transcriber.start()
+
+    def stop(self):
+        for transcriber in self.transcribers.values():
+            transcriber.stop()
+
+    def add_audio(self, frames):
+        """Queue interleaved audio shaped ``(samples, channels)``; returns False if any channel dropped it."""
+        if frames.ndim != 2 or frames.shape[1] != len(self.channels):
+            raise ValueError(f"Expected audio shaped (samples, {len(self.channels)}), got {frames.shape}")
+        accepted = True
+        for i, name in enumerate(self.channels):
+            accepted &= self.transcribers[name].add_audio(np.ascontiguousarray(frames[:, i]))
+        return accepted
+
+    def add_channel_audio(self, channel, audio):
+        """Queue mono audio for one channel, e.g. from a media stream that sends each track separately."""
+        return self.transcribers[channel].add_audio(audio)
+
+    @property
+    def ready(self):
+        return all(t.ready.is_set() for t in self.transcribers.values())
+
+    @property
+    def running(self):
+        return all(t.running for t in self.transcribers.values())
+
+    @property
+    def congested(self):
+        return any(t.congested for t in self.transcribers.values())
+
+    @property
+    def idle(self):
+        """True once every channel's queued audio has been taken for decoding."""
+        return all(t.audio_queue.empty() for t in self.transcribers.values())
+
+    def dialogue(self):
+        return self.merger.turns()
+
+    def publish(self, event):
+        # Called by each channel's transcriber in place of a TranscriptBus
+        self.merger.add(event)
+        if self.bus is not None:
+            self.bus.publish(event)
+
+
+def load_stereo_wav(path):
+    """Return ``(samples, sample_rate)`` for a 16-bit WAV, samples as float32 shaped ``(n, channels)``."""
+    with wave.open(path, "rb") as f:
+        if f.getsampwidth() != 2:
+            raise ValueError("Expected a 16-bit WAV file")
+        frames = np.frombuffer(f.readframes(f.getnframes()), dtype="<i2").reshape(-1, f.getnchannels())
+        return frames.astype(np.float32) / 32768.0, f.getframerate()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("path", help="16-bit WAV with one speaker per channel")
+    parser.add_argument("--model-size", default=MODEL_SIZE)
+    parser.add_argument("--backend", default=TRANSCRIBER_BACKEND, choices=["thread", "process"])
+    parser.add_argument("--streaming", action="store_true")
+    parser.add_argument("--channels", nargs="+", default=list(STEREO_CHANNELS), help="speaker name per channel")
+    args = parser.parse_args()
+
+    audio, rate = load_stereo_wav(args.path)
+    if audio.shape[1] != len(args.channels):
+        parser.error(f"{args.path} has {audio.shape[1]} channels but {len(args.channels)} names were given")
+    if rate != SAMPLE_RATE:
+        resampled = [PolyphaseResampler(rate, SAMPLE_RATE).process(audio[:, i]) for i in range(audio.shape[1])]
+        audio = np.stack(resampled, axis=1)
+
+    call = StereoCallTranscriber(args.model_size, streaming=args.streaming, backend=args.backend,
+                                 channels=args.channels)
+    call.start()
+    for offset in range(0, len(audio), CHUNK_SIZE):
+        # Faster than real time; wait for the decoders rather than let the queues shed audio
+        while call.congested and call.running:
+            time.sleep(0.05)
+        call.add_audio(audio[offset:offset + CHUNK_SIZE])
+    while call.running and not call.idle:
+        time.sleep(0.05)
+    call.stop()
+
+    for turn in call.dialogue():
+        confidence = f"{turn.confidence:.2f}" if turn.confidence is not None else "-"
+        print(f"[{turn.start:7.2f} - {turn.end:7.2f}] {turn.speaker} ({confidence}): {turn.text}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+"""LocalAgreement-n commit policy for streaming Whisper decoding."""
+
+import bisect
+import string
+from collections import deque
+
+_PUNCTUATION = str.maketrans("", "", string.punctuation)
+
+
+def _normalize(word):
+    return word.translate(_PUNCTUATION).strip().lower()
+
+
+class TranscriptEvent:
+    """A partial or final piece of transcript.
+
+    ``latency`` is the time from the newest audio it covers arriving to the
+    event being emitted; ``arrival`` is that audio's ``time.monotonic()``
+    arrival time, so consumers can measure end-to-end latency themselves.
+    ``words`` holds ``(start, end, text, probability)`` tuples on the
+    stream's timeline when the decode had word timestamps, and ``channel``
+    names the speaker's channel of a stereo call.
+    """
+
+    PARTIAL = "partial"
+    FINAL = "final"
+    __slots__ = ("kind", "text", "start", "end", "latency", "arrival", "words", "channel")
+
+    def __init__(self, kind, text, start, end, latency=None, arrival=None, words=None, channel=None):
+        self.kind = kind
+        self.text = text
+        self.start = start
+        self.end = end
+        self.latency = latency
+        self.arrival = arrival
+        self.words = words
+        self.channel = channel
+
+    @property
+    def is_final(self):
+        return self.kind == self.FINAL
+
+    @property
+    def confidence(self):
+        """Mean word probability, or None without word timestamps."""
+        probabilities = [w[3] for w in self.words or () if len(w) > 3 and w[3] is not None]
+        return sum(probabilities) / len(probabilities) if probabilities else None
+
+    def __repr__(self):
+        return f"TranscriptEvent({self.kind!r}, {self.text!r}, start={self.start:.2f}, end={self.end:.2f})"
+
+
+class LocalAgreement:
+    def __init__(self, n=2):
+        """Commit the word prefix that agrees across the last ``n`` hypotheses.
+
+        Words are ``(start, end, text)`` tuples with times in seconds on the
+        stream's absolute timeline; anything after the text, such as the
+        word's probability, is carried along untouched.
+
+        Args:
+            n: Number of consecutive hypotheses that must agree before a word is committed
+        """
+        if n < 2:
+            raise ValueError("LocalAgreement needs at least two hypotheses to compare")
+        self.n = n
+        self.history = deque(maxlen=n)
+        self.committed = []
+        self.last_committed_end = 0.0
+
+    def insert(self, words):
+        """Add a new hypothesis and return the words it newly commits."""
+        words = [w for w in words if w[0] > self.last_committed_end - 0.1]
+        words = self._drop_committed_overlap(words)
+        self.history.append(words)
+        if len(self.history) < self.n:
+            return []
+
+        new_words = []
+        for group in zip(*self.history):
+            if len({_normalize(w[2]) for w in group}) != 1:
+                break
+            new_words.append(group[-1])
+
+        if new_words:
+            self.committed.extend(new_words)
+            self.last_committed_end = new_words[-1][1]
+            trimmed = [h[len(new_words):] for h in self.history]
+            self.history = deque(trimmed, maxlen=self.n)
+        return new_words
+
+    def _drop_committed_overlap(self, words):
+        # Whisper often repeats the last committed words at the window edge.
+        if not words or not self.committed or abs(words[0][0] - self.last_committed_end) > 1.0:
+            return words
+        for k in range(min(len(self.committed), len(words), 5), 0, -1):
+            tail = [_normalize(w[2]) for w in self.committed[-k:]]
+            head = [_normalize(w[2]) for w in words[:k]]
+            if tail == head:
+                return words[k:]
+        return words
+
+    def unstable(self):
+        """Return the uncommitted tail of the newest hypothesis."""
+        return list(self.history[-1]) if self.history else []
+
+    def flush(self):
+        """Commit whatever the newest hypothesis still holds, e.g. at end of stream."""
+        words = self.unstable()
+        if words:
+            self.committed.extend(words)
+            self.last_committed_end = words[-1][1]
+        self.history.clear()
+        return words
+
+    def committed_text(self, before=None):
+        """Return committed text, optionally only words ending before ``before`` seconds."""
+        words = self.committed if before is None else [w for w in self.committed if w[1] <= before]
+        return "".join(w[2] for w in words).strip()
+
+
+class ArrivalClock:
+    def __init__(self):
+        """Map absolute sample positions to the wall-clock time they arrived."""
+        self._ends = []
+        self._times = []
+
+    def record(self, end_sample, arrival_time):
+        self._ends.append(end_sample)
+        self._times.append(arrival_time)
+
+    def arrival(self, sample):
+        i = bisect.bisect_left(self._ends, sample)
+        if i >= len(self._times):
+            i = len(self._times) - 1
+        return self._times[i] if i >= 0 else None
+
+    def prune(self, before_sample):
+        i = bisect.bisect_left(self._ends, before_sample)
+        if i > 0:
+            del self._ends[:i]
+            del self._times[:i]
+
+
+class StreamTimeline:
+    def __init__(self):
+        """Map sample positions in the decoded audio back to positions in the input stream.
+
+        The decoder only sees audio that got past the queues and the VAD, so
+        without this its clock falls behind the stream's by every pause,
+        skipped chunk and dropped chunk. Each contiguous run is recorded by
+        where it ends on both timelines.
+        """
+        self._ends = []
+        self._stream_ends = []
+
+    def record(self, end_sample, stream_end):
+        if self._ends and stream_end - end_sample == self._stream_ends[-1] - self._ends[-1]:
+            # Continues the last run
+            self._ends[-1] = end_sample
+            self._stream_ends[-1] = stream_end
+            return
+        self._ends.append(end_sample)
+        self._stream_ends.append(stream_end)
+
+    def position(self, sample, starting=False):
+        """Return the stream position of ``sample``.
+
+        Where two runs meet, the sample ends the earlier run, or starts the
+        later one with ``starting``.
+        """
+        if not self._ends:
+            return sample
+        find = bisect.bisect_right if starting else bisect.bisect_left
+        i = min(find(self._ends, sample), len(self._ends) - 1)
+        return self._stream_ends[i] - (self._ends[i] - sample)
+
+    def prune(self, before_sample):
+        i = bisect.bisect_left(self._ends, before_sample)
+        if i > 0:
+            del self._ends[:i]
+            del self._stream_ends[:i]
@@ -1,105 +1,509 @@
-from faster_whisper import WhisperModel
 import numpy as np
 import queue
+import itertools
 import threading
 import time
-from config import MODEL_SIZE, SAMPLE_RATE
+from collections import deque
+from config import (
+    MODEL_SIZE, SAMPLE_RATE, MAX_WINDOW_SECONDS, TRANSCRIBER_BACKEND,
+    STREAMING_AGREEMENT, STREAMING_WINDOW_SECONDS, STREAMING_PROMPT_CHARS, VAD_ENABLED, ADAPTIVE_DECODE,
+    AUDIO_QUEUE_SECONDS, AUDIO_QUEUE_POLICY, AUDIO_QUEUE_BLOCK_TIMEOUT, TEXT_QUEUE_SIZE, TEXT_QUEUE_POLICY,
+    WORD_TIMESTAMPS,
+)
+from ring_buffer import AudioRingBuffer
+from executor import create_backend
+from streaming import LocalAgreement, ArrivalClock, StreamTimeline, TranscriptEvent
+from vad import StreamingVAD
+from decode_policy import DecodeController, TIERS, fallback_model
+from flow_control import BoundedQueue
+from metrics import get_metrics, RTF_BUCKETS
+
+_session_ids = itertools.count(1)
+
+
+def _merge_audio(older, newer):
+    # One chunk for the backlog, timed from its first arrival so latency isn't understated
+    if older[2] + len(older[1]) != newer[2]:
+        return None  # a skipped chunk lies between them
+    return older[0], np.concatenate((older[1], newer[1])), older[2]
+
+
+def _merge_results(older, newer):
+    # An unread partial is superseded by whatever follows it; finals are never merged away
+    if isinstance(older, TranscriptEvent) and not older.is_final:
+        return newer
+    return None
+
+
+def _words(segments, offset):
+    # Word timings and probabilities, moved from the decode window onto the decoder's running timeline
+    return [
+        (offset + word.start, offset + word.end, word.word, word.probability)
+        for segment in segments
+        for word in (segment.words or [])
+    ]
+
 
 class RealtimeTranscriber:
-    def __init__(self, model_size=MODEL_SIZE, sample_rate=SAMPLE_RATE):
+    def __init__(self, model_size=MODEL_SIZE, sample_rate=SAMPLE_RATE, streaming=False, backend=TRANSCRIBER_BACKEND,
+                 vad=VAD_ENABLED, bus=None, adaptive=ADAPTIVE_DECODE, audio_policy=AUDIO_QUEUE_POLICY,
+                 text_policy=TEXT_QUEUE_POLICY, word_timestamps=WORD_TIMESTAMPS, channel=None):
+        """Transcribe queued audio on a background thread.
+
+        ``backend`` is "thread", "process", or any object with a
+        ``transcribe(audio, **options)`` method such as a shared BatchScheduler;
+        backends passed in as objects are owned by the caller. Owned backends
+        are created on the processing thread, so audio added while the model
+        loads is queued rather than lost. With ``vad`` on,
+        a StreamingVAD stage passes only speech segments on, each closed segment
+        is decoded once, and Whisper's own VAD filter is switched off.
+
+        Results go to ``text_queue`` for get_transcription and, when a
+        TranscriptBus is given as ``bus``, are published to it as
+        TranscriptEvents so subscribers wake as soon as text is ready.
+
+        With ``adaptive`` on, a DecodeController watches the queued audio and
+        the measured real-time factor. Under load it lowers the beam size, then
+        skips Whisper's VAD filter, then decodes with the next smaller model.
+        It steps back up once the backlog clears. Only owned backends fall back
+        to a smaller model, which is loaded in the background as the
+        controller nears that tier.
+
+        ``audio_queue`` holds at most AUDIO_QUEUE_SECONDS of audio and
+        ``text_queue`` at most TEXT_QUEUE_SIZE results. ``audio_policy`` and
+        ``text_policy`` decide what happens when they are full; see
+        BoundedQueue. ``add_audio`` returns False for audio that was dropped,
+        and ``congested`` tells producers to ease off before that happens.
+
+        Published TranscriptEvents carry their words with timestamps and
+        probabilities, and a ``confidence`` derived from them. Streaming
+        always decodes with word timestamps. Batch mode does only when
+        ``word_timestamps`` is on, since such windows are decoded one by one
+        rather than in a shared BatchScheduler's batched decode. Event and word times are seconds
+        since the first audio added, with pauses the VAD removed and chunks
+        that were skipped or dropped counted in. ``channel`` is stamped on
+        every event, so transcribers for the two sides of a call can share a
+        bus and still be lined up against each other.
+        """
         print(f"Initializing transcriber with model size: {model_size}, sample rate: {sample_rate}")
-        self.model = WhisperModel(model_size, device="cpu", compute_type="int8")
-        self.audio_queue = queue.Queue()
-        self.text_queue = queue.Queue()
+        self.model_size = model_size
+        self._owns_backend = isinstance(backend, str)
+        self._backend_kind = backend if self._owns_backend else None
+        self.backend = None if self._owns_backend else backend
+        self.ready = threading.Event()
+        # Orders stop() against the processing thread handing over a backend it has just loaded
+        self._lifecycle = threading.Lock()
+        self.audio_queue = BoundedQueue(
+            int(AUDIO_QUEUE_SECONDS * sample_rate), audio_policy, name="audio",
+            cost=lambda item: len(item[1]), merge=_merge_audio, block_timeout=AUDIO_QUEUE_BLOCK_TIMEOUT,
+        )
+        self.text_queue = BoundedQueue(TEXT_QUEUE_SIZE, text_policy, name="text", merge=_merge_results)
         self.running = False
         self.sample_rate = sample_rate
-        self.buffer = np.array([], dtype=np.float32)
+        self.buffer = AudioRingBuffer(int(MAX_WINDOW_SECONDS * sample_rate))
         self.min_audio_length = 0.5
-        
+        self.streaming = streaming
+        self.word_timestamps = word_timestamps
+        self.channel = channel
+        self.agreement = LocalAgreement(STREAMING_AGREEMENT)
+        self.arrivals = ArrivalClock()
+        self.samples_seen = 0
+        self.stream_samples = 0
+        self.timeline = StreamTimeline()
+        self.latencies = {"first_partial": deque(maxlen=1000), "final": deque(maxlen=1000)}
+        self._awaiting_first_partial = True
+        self.vad = StreamingVAD(sample_rate) if vad else None
+        self._vad_input = StreamTimeline()
+        self._vad_samples = 0
+        self._segment_end = None
+        self._decoded_at = 0
+        # Samples taken off the audio queue in the current batch but not yet appended or run through the VAD
+        self._pending_samples = 0
+        self.bus = bus
+        self.controller = None
+        if adaptive:
+            can_swap = self._owns_backend and fallback_model(model_size) is not None
+            self.controller = DecodeController(max_tier=len(TIERS) - (1 if can_swap else 2))
+        self._fallback = None
+        self._fallback_loader = None
+        self.session_id = next(_session_ids)
+        self._sampled_metrics = []
+        metrics = get_metrics()
+        self._latency_metrics = {
+            kind: metrics.histogram("pipeline_latency_seconds", "Audio arrival to text out", kind=kind)
+            for kind in self.latencies
+        }
+        self._rtf = metrics.histogram("pipeline_decode_rtf", "Decode time over audio duration per decode",
+                                      buckets=RTF_BUCKETS)
+        self._audio_seconds = metrics.counter("pipeline_audio_seconds_total", "Audio queued for transcription")
+        self._transcript_counts = {
+            kind: metrics.counter("pipeline_transcripts_total", "Transcripts emitted", kind=kind)
+            for kind in (TranscriptEvent.PARTIAL, TranscriptEvent.FINAL)
+        }
+
     def start(self):
         print("Starting transcriber thread")
         self.running = True
+        metrics = get_metrics()
+        metrics.counter("pipeline_sessions_total", "Transcription sessions started").inc()
+        self._sampled_metrics = [
+            metrics.sampled("pipeline_queue_depth", pending.qsize, help="Items waiting between pipeline stages",
+                            queue=name, session=self.session_id)
+            for name, pending in (("audio", self.audio_queue), ("text", self.text_queue))
+        ]
+        if self.controller is not None:
+            self._sampled_metrics.append(metrics.sampled(
+                "pipeline_decode_tier", lambda: self.controller.tier,
+                help="Adaptive decode tier, 0 is full accuracy: " + ", ".join(t.name for t in TIERS),
+                session=self.session_id,
+            ))
         self.thread = threading.Thread(target=self._process_audio)
         self.thread.daemon = True
         self.thread.start()
-        
+
     def stop(self):
         print("Stopping transcriber")
-        self.running = False
+        with self._lifecycle:
+            self.running = False
         if hasattr(self, 'thread'):
-            self.thread.join(timeout=2.0)
-            
+            # The processing thread decodes the open segment on its way out; no timeout, or
+            # the backend could be closed under that decode
+            self.thread.join()
+        for key in self._sampled_metrics:
+            get_metrics().remove(key)
+        self._sampled_metrics = []
+        if self.backend is not None and self._owns_backend:
+            self.backend.close()
+            self.backend = None
+        if self._fallback_loader is not None:
+            # A load still running after this closes its own model once it finishes
+            self._fallback_loader.join(timeout=2.0)
+            with self._lifecycle:
+                if self._fallback is not None:
+                    self._fallback.close()
+                    self._fallback = None
+
     def add_audio(self, audio_chunk):
         if audio_chunk.dtype == np.int16:
             audio_chunk = audio_chunk.astype(np.float32) / 32768.0
-        
-        if np.abs(audio_chunk).mean() > 0.001:
-            self.audio_queue.put(audio_chunk)
-        
+
+        position = self.stream_samples
+        self.stream_samples += len(audio_chunk)
+        # Without the VAD stage, near-silent chunks are skipped with a cheap level check
+        if self.vad is not None or np.abs(audio_chunk).mean() > 0.001:
+            self._audio_seconds.inc(len(audio_chunk) / self.sample_rate)
+            return self.audio_queue.put((time.monotonic(), audio_chunk, position))
+        return True
+
+    @property
+    def congested(self):
+        """True while the audio queue is nearly full; producers should slow down or shed load themselves."""
+        return self.audio_queue.congested.is_set()
+
+    def get_dropped_audio_seconds(self):
+        return self.audio_queue.dropped_cost / self.sample_rate
+
     def get_transcription(self):
         if not self.text_queue.empty():
             return self.text_queue.get()
         return None
-        
+
+    def get_latency_stats(self):
+        """Return p50/p95 time-to-first-partial and time-to-final latency in milliseconds."""
+        stats = {}
+        for name, values in self.latencies.items():
+            if values:
+                p50, p95 = np.percentile(np.fromiter(values, dtype=np.float64), [50, 95])
+                stats[name] = {"p50_ms": p50 * 1000, "p95_ms": p95 * 1000, "count": len(values)}
+        return stats
+
+    def get_vad_stats(self):
+        """Return the speech-to-total audio ratio seen by the VAD stage, or None without one."""
+        return self.vad.stats() if self.vad is not None else None
+
     def _process_audio(self):
         print("Audio processing thread started")
-        
+        if self.backend is None:
+            try:
+                backend = create_backend(self._backend_kind, self.model_size)
+            except Exception as e:
+                print(f"Error loading model: {e}")
+                self.running = False
+                return
+            with self._lifecycle:
+                if not self.running:
+                    # stop() ran while the model loaded and found no backend to close
+                    backend.close()
+                    return
+                self.backend = backend
+        self.ready.set()
+
         while self.running:
+            # Block until audio arrives instead of sleeping between checks
+            try:
+                pending = [self.audio_queue.get(timeout=0.1)]
+            except queue.Empty:
+                continue
             while not self.audio_queue.empty():
-                chunk = self.audio_queue.get()
-                self.buffer = np.append(self.buffer, chunk)
-            
+                pending.append(self.audio_queue.get())
+            self._pending_samples = sum(len(chunk) for _, chunk, _ in pending)
+            for arrival_time, chunk, position in pending:
+                self._pending_samples -= len(chunk)
+                if self.vad is None:
+                    self._append(chunk, arrival_time, position + len(chunk))
+                    continue
+                self._vad_samples += len(chunk)
+                self._vad_input.record(self._vad_samples, position + len(chunk))
+                self._append_speech(self.vad.process(chunk), arrival_time)
+
+            # With the VAD, batch mode decodes only when a segment closes
             buffer_duration = len(self.buffer) / self.sample_rate
-            if buffer_duration >= self.min_audio_length:
-                try:
-                    segments, _ = self.model.transcribe(
-                        self.buffer, 
-                        beam_size=5,
-                        language="en",
-                        vad_filter=True,
-                        vad_parameters=dict(min_silence_duration_ms=500)
-                    )
-                    
-                    text = ""
-                    for segment in segments:
-                        text += segment.text
-                    
-                    if text.strip():
-                        self.text_queue.put(text.strip())
-                        print(f"Transcribed: '{text.strip()}'")
-                    
+            has_new_audio = self.samples_seen > self._decoded_at
+            if buffer_duration >= self.min_audio_length and has_new_audio:
+                if self.streaming:
+                    self._process_streaming(buffer_duration)
+                elif self.vad is None:
+                    self._process_batch()
                     keep_duration = 0.5
                     if buffer_duration > keep_duration:
-                        self.buffer = self.buffer[-int(keep_duration * self.sample_rate):]
-                    
-                except Exception as e:
-                    print(f"Error during transcription: {e}")
-            
-            time.sleep(0.1)
+                        self.buffer.keep_last(int(keep_duration * self.sample_rate))
+                    self._prune(self.samples_seen - len(self.buffer))
+
+        # Flushed here rather than in stop(), so it never runs alongside a decode on this thread
+        if self.vad is not None:
+            self._append_speech(self.vad.flush(), time.monotonic())
+            self._finish_segment()
+        elif self.streaming:
+            self._emit_final(self.agreement.flush())
+
+    def _append_speech(self, events, arrival_time):
+        # A segment's speech is contiguous in the VAD's input, starting where the segment began
+        starts = list(self.vad.last_segment_starts)
+        for speech, segment_ended in events:
+            start = starts.pop(0) if segment_ended else self.vad.segment_start
+            if self._segment_end is None:
+                self._segment_end = start
+            self._segment_end += len(speech)
+            self._append(speech, arrival_time, self._vad_input.position(self._segment_end))
+            if segment_ended:
+                self._finish_segment()
+
+    def _append(self, audio, arrival_time, stream_end):
+        if len(audio) == 0:
+            return
+        self.buffer.write(audio)
+        self.samples_seen += len(audio)
+        self.arrivals.record(self.samples_seen, arrival_time)
+        self.timeline.record(self.samples_seen, stream_end)
+
+    def _prune(self, before_sample):
+        self.arrivals.prune(before_sample)
+        self.timeline.prune(before_sample)
+
+    def _on_stream(self, seconds, starting=False):
+        return self.timeline.position(round(seconds * self.sample_rate), starting) / self.sample_rate
+
+    def _stream_words(self, words):
+        return [(self._on_stream(w[0], starting=True), self._on_stream(w[1])) + tuple(w[2:]) for w in words]
+
+    def _finish_segment(self):
+        """Decode a segment the VAD has closed, then start the next one from an empty window."""
+        if self.streaming:
+            if self.samples_seen > self._decoded_at:
+                self._process_streaming(len(self.buffer) / self.sample_rate)
+            self._emit_final(self.agreement.flush())
+        elif len(self.buffer):
+            self._process_batch()
+        self.buffer.clear()
+        self._prune(self.samples_seen)
+        if self.vad is not None:
+            # Later segments can start no earlier than the VAD's pre-roll
+            self._segment_end = None
+            self._vad_input.prune(self.vad.total_samples - self.vad.pad_frames * self.vad.frame_size)
+
+    def _vad_options(self):
+        if self.vad is not None:
+            return dict(vad_filter=False)
+        return dict(vad_filter=True, vad_parameters=dict(min_silence_duration_ms=500))
+
+    def backlog_seconds(self):
+        """Audio not yet decoded: still queued, taken but not yet buffered, or buffered since the last decode."""
+        undecoded = self.samples_seen - self._decoded_at
+        return (self.audio_queue.level + self._pending_samples + undecoded) / self.sample_rate
+
+    def decode_tier(self):
+        """Name of the decode tier in use, "full" without adaptive decoding."""
+        return self.controller.current.name if self.controller is not None else TIERS[0].name
+
+    def _transcribe(self, audio, **options):
+        backend = self.backend
+        if self.controller is not None:
+            tier = self.controller.update(self.backlog_seconds())
+            options["beam_size"] = min(options.get("beam_size", tier.beam_size), tier.beam_size)
+            if not tier.whisper_vad:
+                options["vad_filter"] = False
+                options.pop("vad_parameters", None)
+            if TIERS[min(self.controller.tier + 1, self.controller.max_tier)].fallback_model:
+                self._load_fallback()
+            if tier.fallback_model and self._fallback is not None:
+                backend = self._fallback
+        # Audio the stream advanced by since the last decode; the window re-decodes older audio too
+        advanced = self.samples_seen - self._decoded_at
+        self._decoded_at = self.samples_seen
+        start = time.perf_counter()
+        segments = backend.transcribe(audio, **options)
+        elapsed = time.perf_counter() - start
+        if len(audio):
+            self._rtf.observe(elapsed * self.sample_rate / len(audio))
+            if self.controller is not None:
+                # Keeping up means decoding faster than new audio arrives, not faster than the window length
+                self.controller.record_decode(advanced / self.sample_rate, elapsed)
+        return segments
+
+    def _load_fallback(self):
+        # One tier before it's needed, so the switch doesn't stall decoding on a model load
+        if self._fallback_loader is not None:
+            return
+
+        def load():
+            try:
+                fallback = create_backend(self._backend_kind, fallback_model(self.model_size))
+            except Exception as e:
+                print(f"Error loading fallback model: {e}")
+                return
+            with self._lifecycle:
+                if not self.running:
+                    fallback.close()
+                    return
+                self._fallback = fallback
+
+        self._fallback_loader = threading.Thread(target=load, daemon=True)
+        self._fallback_loader.start()
+
+    def _record_latency(self, kind, latency):
+        self.latencies[kind].append(latency)
+        self._latency_metrics[kind].observe(latency)
+
+    def _publish(self, item, event=None):
+        self._transcript_counts[(event or item).kind].inc()
+        self.text_queue.put(item)
+        if self.bus is not None:
+            self.bus.publish(event or item)
+
+    def _process_batch(self):
+        buffer_end = self.samples_seen / self.sample_rate
+        buffer_start = buffer_end - len(self.buffer) / self.sample_rate
+        try:
+            options = dict(word_timestamps=True) if self.word_timestamps else {}
+            segments = self._transcribe(
+                self.buffer.view(),
+                beam_size=5,
+                language="en",
+                **options,
+                **self._vad_options()
+            )
+
+            text = ""
+            for segment in segments:
+                text += segment.text
+
+            if text.strip():
+                arrival = self.arrivals.arrival(self.samples_seen)
+                latency = time.monotonic() - arrival if arrival is not None else None
+                if latency is not None:
+                    self._record_latency("final", latency)
+                start = self._on_stream(buffer_start + segments[0].start, starting=True)
+                end = self._on_stream(buffer_start + segments[-1].end)
+                words = self._stream_words(_words(segments, buffer_start))
+                event = TranscriptEvent(TranscriptEvent.FINAL, text.strip(), start, end, latency, arrival,
+                                        words=words or None, channel=self.channel)
+                self._publish(text.strip(), event)
+                print(f"Transcribed: '{text.strip()}'")
+
+        except Exception as e:
+            print(f"Error during transcription: {e}")
+
+    def _process_streaming(self, buffer_duration):
+        """Decode the sliding window and commit the prefix that LocalAgreement deems stable."""
+        buffer_start = (self.samples_seen - len(self.buffer)) / self.sample_rate
+        prompt = self.agreement.committed_text(before=buffer_start)[-STREAMING_PROMPT_CHARS:]
+        try:
+            segments = self._transcribe(
+                self.buffer.view(),
+                beam_size=5,
+                language="en",
+                initial_prompt=prompt or None,
+                condition_on_previous_text=False,
+                word_timestamps=True,
+                **self._vad_options()
+            )
+            words = _words(segments, buffer_start)
+        except Exception as e:
+            print(f"Error during transcription: {e}")
+            return
+
+        self._emit_final(self.agreement.insert(words))
+        self._emit_partial(self.agreement.unstable())
+
+        # Slide the window forward past committed audio once it grows too long.
+        if buffer_duration > STREAMING_WINDOW_SECONDS and self.agreement.committed:
+            trim_to = self.agreement.last_committed_end
+            self.buffer.consume(int((trim_to - buffer_start) * self.sample_rate))
+        self._prune(self.samples_seen - len(self.buffer))
+
+    def _arrival(self, words):
+        arrival = self.arrivals.arrival(int(words[-1][1] * self.sample_rate))
+        return arrival, (time.monotonic() - arrival if arrival is not None else None)
+
+    def _emit_partial(self, words):
+        if not words:
+            return
+        arrival, latency = self._arrival(words)
+        if self._awaiting_first_partial and latency is not None:
+            self._record_latency("first_partial", latency)
+            self._awaiting_first_partial = False
+        text = "".join(w[2] for w in words).strip()
+        words = self._stream_words(words)
+        self._publish(TranscriptEvent(TranscriptEvent.PARTIAL, text, words[0][0], words[-1][1], latency, arrival,
+                                      words=words, channel=self.channel))
+
+    def _emit_final(self, words):
+        if not words:
+            return
+        arrival, latency = self._arrival(words)
+        if latency is not None:
+            self._record_latency("final", latency)
+        self._awaiting_first_partial = True
+        text = "".join(w[2] for w in words).strip()
+        words = self._stream_words(words)
+        self._publish(TranscriptEvent(TranscriptEvent.FINAL, text, words[0][0], words[-1][1], latency, arrival,
+                                      words=words, channel=self.channel))
+        print(f"Committed: '{text}'")
 
 def simple_test():
     from mic_capture import MicrophoneCapture
-    
+
     transcriber = RealtimeTranscriber()
     transcriber.start()
-    
+
     mic = MicrophoneCapture()
     mic.start_stream()
-    
+
     try:
         print("Speak into your microphone for 10 seconds...")
         for _ in range(100):
             audio_chunk = mic.get_audio_chunk()
-            transcriber.add_audio(audio_chunk)
-            
+            if audio_chunk is not None:
+                transcriber.add_audio(audio_chunk)
+
             text = transcriber.get_transcription()
             if text:
                 print(f"Transcription: {text}")
-            
+
             time.sleep(0.1)
     finally:
         mic.close()
         transcriber.stop()
 
 if __name__ == "__main__":
-    simple_test()
\ No newline at end of file
+    simple_test()
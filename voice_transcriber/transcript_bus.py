@@ -0,0 +1,78 @@
+"""Publish/subscribe delivery of transcript events without polling."""
+
+import threading
+import time
+from collections import deque
+
+
+class TranscriptBus:
+    def __init__(self, history=1000):
+        """Fan transcript events out to any number of subscribers.
+
+        Published items go into one bounded log tagged with a sequence number.
+        Subscribers keep a cursor into it and block on a condition variable
+        until something newer arrives, so nobody sleeps between checks.
+
+        Args:
+            history: Items kept for subscribers that fall behind
+        """
+        self._cond = threading.Condition()
+        self._log = deque(maxlen=history)
+        self._next_seq = 0
+        self.closed = False
+
+    def publish(self, item):
+        """Append an item and wake every waiting subscriber."""
+        with self._cond:
+            self._log.append((self._next_seq, time.monotonic(), item))
+            self._next_seq += 1
+            self._cond.notify_all()
+
+    def close(self):
+        """Mark the end of the stream; waiting subscribers return immediately."""
+        with self._cond:
+            self.closed = True
+            self._cond.notify_all()
+
+    def subscribe(self, from_start=False):
+        """Return a Subscription that sees items published from now on (or all retained ones)."""
+        with self._cond:
+            if from_start and self._log:
+                start = self._log[0][0]
+            else:
+                start = self._next_seq
+        return Subscription(self, start)
+
+    def _wait(self, cursor, timeout):
+        with self._cond:
+            self._cond.wait_for(lambda: self._next_seq > cursor or self.closed, timeout)
+            if not self._log or self._next_seq <= cursor:
+                return cursor, [], 0
+            first = self._log[0][0]
+            # Items that rolled out of the log before this subscriber got to them
+            missed = max(0, first - cursor)
+            items = [entry for entry in self._log if entry[0] >= cursor]
+            return self._next_seq, items, missed
+
+
+class Subscription:
+    """One reader's position in a TranscriptBus."""
+
+    def __init__(self, bus, cursor):
+        self.bus = bus
+        self.cursor = cursor
+        self.missed = 0
+
+    def get(self, timeout=None):
+        """Block until new items are published, then return ``[(published_at, item), ...]``.
+
+        Returns an empty list when ``timeout`` passes or the bus is closed with
+        nothing new.
+        """
+        self.cursor, entries, missed = self.bus._wait(self.cursor, timeout)
+        self.missed += missed
+        return [(published_at, item) for _, published_at, item in entries]
+
+    @property
+    def finished(self):
+        return self.bus.closed and self.cursor >= self.bus._next_seq
@@ -0,0 +1,245 @@
+"""Streaming voice activity detection that gates audio before it reaches Whisper."""
+
+from collections import deque
+import numpy as np
+from config import (
+    SAMPLE_RATE, VAD_BACKEND, VAD_THRESHOLD, VAD_FRAME_MS, VAD_HANGOVER_MS,
+    VAD_PAD_MS, VAD_MIN_SPEECH_MS, VAD_MAX_SEGMENT_SECONDS,
+)
+
+
+class EnergySpeechScorer:
+    def __init__(self, margin_db=10.0, slope_db=2.0, silence_db=-55.0):
+        """Score frames by their energy above a tracked noise floor.
+
+        The floor follows quiet frames quickly and loud frames slowly, so it
+        settles on background noise rather than on speech.
+
+        Args:
+            margin_db: Energy above the floor that maps to probability 0.5
+            slope_db: Width of the logistic ramp around the margin
+            silence_db: Frames below this level are always silence
+        """
+        self.margin_db = margin_db
+        self.slope_db = slope_db
+        self.silence_db = silence_db
+        self.reset()
+
+    def reset(self):
+        self.noise_floor = None
+
+    def __call__(self, frames):
+        energy = 10 * np.log10(np.mean(np.square(frames, dtype=np.float64), axis=1) + 1e-10)
+        floors = np.empty_like(energy)
+        floor = energy[0] if self.noise_floor is None and len(energy) else self.noise_floor
+        for i, e in enumerate(energy):
+            floor += (0.2 if e < floor else 0.002) * (e - floor)
+            floors[i] = floor
+        self.noise_floor = floor
+        probs = 1 / (1 + np.exp(-(energy - floors - self.margin_db) / self.slope_db))
+        probs[energy < self.silence_db] = 0.0
+        return probs
+
+
+class SileroSpeechScorer:
+    def __init__(self, sample_rate=SAMPLE_RATE):
+        """Score frames with the Silero VAD model from the ``silero-vad`` package."""
+        import torch
+        from silero_vad import load_silero_vad
+        self._torch = torch
+        self.sample_rate = sample_rate
+        self.model = load_silero_vad(onnx=True)
+
+    def reset(self):
+        self.model.reset_states()
+
+    def __call__(self, frames):
+        # The model carries its recurrent state between calls.
+        return np.array([
+            self.model(self._torch.from_numpy(np.ascontiguousarray(frame)), self.sample_rate).item()
+            for frame in frames
+        ])
+
+
+def make_scorer(backend=VAD_BACKEND, sample_rate=SAMPLE_RATE):
+    if backend == "silero":
+        return SileroSpeechScorer(sample_rate)
+    if backend == "energy":
+        return EnergySpeechScorer()
+    raise ValueError(f"Unknown VAD backend: {backend}")
+
+
+class StreamingVAD:
+    def __init__(self, sample_rate=SAMPLE_RATE, backend=VAD_BACKEND, threshold=VAD_THRESHOLD,
+                 hangover_ms=VAD_HANGOVER_MS, pad_ms=VAD_PAD_MS, min_speech_ms=VAD_MIN_SPEECH_MS,
+                 max_segment_seconds=VAD_MAX_SEGMENT_SECONDS):
+        """Split a live stream into speech segments, scanning every sample once.
+
+        Audio is scored in fixed frames; the partial frame at the end of a
+        chunk, the pre-roll and the open segment carry over to the next chunk.
+
+        Args:
+            sample_rate: Sample rate of the incoming audio
+            backend: Frame scorer, "energy" or "silero"
+            threshold: Speech probability that opens a segment
+            hangover_ms: Silence that has to pass before a segment is closed
+            pad_ms: Audio kept before speech starts and after it ends
+            min_speech_ms: Shorter segments are discarded as clicks or noise
+            max_segment_seconds: Segments are cut at this length so a window fits Whisper
+        """
+        self.sample_rate = sample_rate
+        self.frame_size = int(sample_rate * VAD_FRAME_MS / 1000)
+        self.scorer = make_scorer(backend, sample_rate)
+        self.threshold = threshold
+        # Hysteresis: once in speech, stay there until the probability drops clearly below threshold
+        self.release_threshold = max(0.0, threshold - 0.15)
+        frame_ms = 1000 * self.frame_size / sample_rate
+        self.hangover_frames = max(1, int(hangover_ms / frame_ms))
+        self.pad_frames = int(pad_ms / frame_ms)
+        self.min_speech_frames = max(1, int(min_speech_ms / frame_ms))
+        self.max_segment_frames = int(max_segment_seconds * 1000 / frame_ms)
+
+        self.total_samples = 0
+        self.speech_samples = 0
+        self.segments = 0
+        self.last_probabilities = np.zeros(0)
+        # Stream offset in samples where each segment closed by the last call began
+        self.last_segment_starts = []
+        self.reset()
+
+    def reset(self):
+        self.scorer.reset()
+        self._pending = np.zeros(0, dtype=np.float32)
+        self._preroll = deque(maxlen=max(1, self.pad_frames))
+        self._in_speech = False
+        self._held = []
+        self._silence = []
+        self._voiced_frames = 0
+        self._emitted_frames = 0
+        self._segment_start = 0
+
+    @property
+    def in_speech(self):
+        return self._in_speech
+
+    @property
+    def segment_start(self):
+        """Stream offset in samples where the open (or last) segment began."""
+        return self._segment_start
+
+    def speech_ratio(self):
+        """Fraction of the audio seen so far that was passed on as speech."""
+        return self.speech_samples / self.total_samples if self.total_samples else 0.0
+
+    def stats(self):
+        return {
+            "speech_ratio": self.speech_ratio(),
+            "speech_seconds": self.speech_samples / self.sample_rate,
+            "total_seconds": self.total_samples / self.sample_rate,
+            "segments": self.segments,
+        }
+
+    def process(self, audio):
+        """Feed a chunk and return ``[(speech_audio, segment_ended), ...]``.
+
+        ``speech_audio`` continues the current segment; ``segment_ended`` marks
+        that the segment closed after it, so the caller can decode it once.
+        The start of every closed segment is left in ``last_segment_starts``.
+        """
+        audio = np.concatenate((self._pending, np.asarray(audio, dtype=np.float32)))
+        num_frames = len(audio) // self.frame_size
+        self._pending = audio[num_frames * self.frame_size:].copy()
+        self.last_segment_starts = []
+        if num_frames == 0:
+            return []
+        first_frame = self.total_samples // self.frame_size
+
+        frames = audio[:num_frames * self.frame_size].reshape(num_frames, self.frame_size)
+        probs = self.scorer(frames)
+        self.last_probabilities = probs
+        self.total_samples += num_frames * self.frame_size
+
+        out = []
+        events = []
+        for index, (frame, prob) in enumerate(zip(frames, probs), first_frame):
+            if not self._in_speech:
+                if prob >= self.threshold:
+                    self._in_speech = True
+                    self._segment_start = (index - len(self._preroll)) * self.frame_size
+                    self._held = list(self._preroll)
+                    self._preroll.clear()
+                    self._voice(frame, out)
+                elif self.pad_frames:
+                    self._preroll.append(frame)
+                continue
+
+            if prob >= self.release_threshold:
+                for silent in self._silence:
+                    self._keep(silent, out)
+                self._silence = []
+                self._voice(frame, out)
+            else:
+                self._silence.append(frame)
+                if len(self._silence) >= self.hangover_frames:
+                    self._close_segment(out, events)
+                    continue
+
+            if self._emitted_frames + len(self._held) >= self.max_segment_frames:
+                self._cut_segment(out, events)
+                self._segment_start = (index + 1) * self.frame_size
+
+        if out:
+            events.append((np.concatenate(out), False))
+        return events
+
+    def flush(self):
+        """Close any open segment, e.g. when the stream ends."""
+        out = []
+        events = []
+        self.last_segment_starts = []
+        if self._in_speech:
+            self._close_segment(out, events)
+        return events
+
+    def _voice(self, frame, out):
+        self._voiced_frames += 1
+        self._keep(frame, out)
+
+    def _keep(self, frame, out):
+        # Frames are held back until the segment is long enough to count as speech.
+        self._held.append(frame)
+        if self._voiced_frames >= self.min_speech_frames:
+            out.extend(self._held)
+            self._emitted_frames += len(self._held)
+            self.speech_samples += len(self._held) * self.frame_size
+            self._held = []
+
+    def _close_segment(self, out, events):
+        trailing = self._silence[:self.pad_frames]
+        if self._voiced_frames >= self.min_speech_frames:
+            out.extend(self._held + trailing)
+            self.speech_samples += (len(self._held) + len(trailing)) * self.frame_size
+            events.append((np.concatenate(out) if out else np.zeros(0, dtype=np.float32), True))
+            self.last_segment_starts.append(self._segment_start)
+            self.segments += 1
+        elif out:
+            events.append((np.concatenate(out), False))
+        out.clear()
+        self._preroll.extend(self._silence[-self.pad_frames:] if self.pad_frames else [])
+        self._in_speech = False
+        self._held = []
+        self._silence = []
+        self._voiced_frames = 0
+        self._emitted_frames = 0
+
+    def _cut_segment(self, out, events):
+        # Long monologue: end the segment here and keep going in a fresh one.
+        if self._held:
+            out.extend(self._held)
+            self.speech_samples += len(self._held) * self.frame_size
+        events.append((np.concatenate(out), True))
+        self.last_segment_starts.append(self._segment_start)
+        self.segments += 1
+        out.clear()
+        self._held = []
+        self._emitted_frames = 0